@@ -1,5 +1,5 @@
-from lutil import luCommand
-holddownFactorSet = luCommand('r1','vtysh -c "show running"','rfp holddown-factor','none','Holddown factor set')
+from lutil import luCommand, luRunningConfig
+holddownFactorSet = luRunningConfig('r1','rfp holddown-factor','router bgp','Holddown factor set')
 if not holddownFactorSet:
     to = "-1"
     cost = ""
@@ -1,5 +1,5 @@
-from lutil import luCommand
-holddownFactorSet = luCommand('r1','vtysh -c "show running"','rfp holddown-factor','none','Holddown factor set')
+from lutil import luCommand, luRunningConfig
+holddownFactorSet = luRunningConfig('r1','rfp holddown-factor','router bgp','Holddown factor set')
 luCommand('r1','vtysh -c "show vnc registrations"','.','none')
 luCommand('r3','vtysh -c "show vnc registrations"','.','none')
 luCommand('r4','vtysh -c "show vnc registrations"','.','none')
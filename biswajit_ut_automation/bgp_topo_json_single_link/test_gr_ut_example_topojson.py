@@ -102,7 +102,7 @@ def setup_module(mod):
    tgen.start_topology()
 
    # Starting deamons and routers
-   start_deamons_and_routers(tgen, CWD)
+   start_deamons_and_routers(tgen, CWD, topo)
 
    # Creating configuration from JSON
    build_config_from_json(tgen, topo, CWD)
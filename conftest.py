@@ -2,9 +2,20 @@
 Topotest conftest.py file.
 """
 
+import os
+import re
+import json
+import warnings
+
 from lib.topogen import get_topogen, diagnose_env
-from lib.topotest import json_cmp_result
+from lib.topotest import json_cmp_result, get_topotests_dir
 from lib.topolog import logger
+from lib import topotrace
+from lib import apistats
+from lib import topoprofile
+from lib import cmdbudget
+from lib import frrstats
+from lib.coreanalysis import get_analyzer
 import pytest
 
 def pytest_addoption(parser):
@@ -14,6 +25,19 @@ def pytest_addoption(parser):
     """
     parser.addoption('--topology-only', action='store_true',
                      help='Only set up this topology, don\'t run tests')
+    parser.addoption('--api-stats-json', metavar='PATH', default=None,
+                     help='Save the lib API latency statistics to PATH')
+    parser.addoption('--topotest-profile', action='store_true',
+                     help='Profile the test functions, setup_module() and '
+                     'teardown_module(), see --topotest-profiler')
+    parser.addoption('--topotest-profiler', metavar='NAME', default='cprofile',
+                     choices=topoprofile.PROFILERS,
+                     help='Profiler used by --topotest-profile: {} '
+                     '(default: cprofile)'.format(
+                         ' or '.join(topoprofile.PROFILERS)))
+    parser.addoption('--topotest-profile-show', action='store_true',
+                     help='Show the profile top functions of every test, '
+                     'not only of the failed ones')
 
 def pytest_runtest_call():
     """
@@ -30,6 +54,191 @@ def pytest_runtest_call():
 
         pytest.exit('the topology executed successfully')
 
+def routers_have_failure(request, tgen):
+    """
+    Returns tgen.routers_have_failure(), only checked once per test by the
+    fixtures needing it.
+    """
+    node = request.node
+    if not hasattr(node, 'topotest_routers_failure'):
+        node.topotest_routers_failure = tgen.routers_have_failure()
+    return node.topotest_routers_failure
+
+@pytest.fixture(autouse=True)
+def config_rollback(request):
+    """
+    When enabled (`config_rollback` in `pytest.ini` or the environment variable
+    TOPOTESTS_CONFIG_ROLLBACK), saves the routers configuration before the
+    first test of the module and rolls it back after every test, so tests
+    don't depend on the configuration changes made by the previous ones.
+    """
+    tgen = get_topogen()
+    if tgen is None or not tgen.is_config_rollback_enabled():
+        yield
+        return
+    if routers_have_failure(request, tgen):
+        yield
+        return
+
+    if 'module' not in tgen.checkpoints:
+        tgen.config_checkpoint('module')
+    yield
+    errors = tgen.config_rollback('module')
+    assert errors == '', errors
+
+@pytest.fixture(autouse=True)
+def frr_stats(request):
+    """
+    When enabled (`frr_stats` in `pytest.ini` or the environment variable
+    TOPOTESTS_FRR_STATS), snapshots the daemons `show thread cpu` and
+    `show memory` before and after every test and saves their differences
+    in the module log directory (frrstats/<test>.json).
+    """
+    tgen = get_topogen()
+    if tgen is None or not tgen.is_frr_stats_enabled():
+        yield
+        return
+    if routers_have_failure(request, tgen):
+        yield
+        return
+
+    before = tgen.get_frr_stats()
+    yield
+    after = tgen.get_frr_stats()
+
+    delta = dict((rname, frrstats.stats_delta(before.get(rname, {}), stats))
+                 for rname, stats in after.items())
+    statsdir = os.path.join(tgen.logdir, 'frrstats')
+    if not os.path.isdir(statsdir):
+        os.makedirs(statsdir)
+    path = os.path.join(statsdir, '{}.json'.format(
+        re.sub(r'[^\w.-]', '_', request.node.name)))
+    with open(path, 'w') as statsfile:
+        json.dump(delta, statsfile, indent=2, sort_keys=True)
+    logger.info('daemons statistics of "{}" saved to {}'.format(
+        request.node.name, path))
+
+# Modules whose setup_module() was already profiled
+profiled_modules = set()
+
+def _profile_start(item):
+    "Starts profiling a test phase when enabled, see --topotest-profile."
+    if not item.config.getoption('--topotest-profile'):
+        return None
+    profiler = topoprofile.new_profiler(
+        item.config.getoption('--topotest-profiler'))
+    profiler.start()
+    return profiler
+
+def _profile_stop(item, profiler, when, name, outcome):
+    """
+    Stops profiling a test phase, saves the profile in the module log
+    directory and shows the top functions when the phase failed.
+    """
+    if profiler is None:
+        return
+    profiler.stop()
+
+    profiledir = os.path.join(get_topotests_dir(), item.module.__name__,
+                              'profile')
+    if not os.path.isdir(profiledir):
+        os.makedirs(profiledir)
+    path = os.path.join(profiledir, '{}.{}'.format(
+        re.sub(r'[^\w.-]', '_', name), profiler.extension))
+    profiler.save(path)
+    logger.info('profile of "{}" saved to {}'.format(name, path))
+
+    if (outcome.excinfo is not None or
+            item.config.getoption('--topotest-profile-show')):
+        item.add_report_section(when, 'profile', '{}\n{}'.format(
+            path, profiler.top()))
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    "Profile setup_module(): it runs in the module first test setup."
+    profiler = None
+    if item.module.__name__ not in profiled_modules:
+        profiled_modules.add(item.module.__name__)
+        profiler = _profile_start(item)
+    outcome = yield
+    _profile_stop(item, profiler, 'setup', 'setup_module', outcome)
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    "Profile teardown_module(): it runs in the module last test teardown."
+    profiler = None
+    if nextitem is None or nextitem.module is not item.module:
+        profiler = _profile_start(item)
+    outcome = yield
+    _profile_stop(item, profiler, 'teardown', 'teardown_module', outcome)
+
+def _perf_record_start(item):
+    """
+    Starts recording the routers selected by the test `perf_record` marker
+    and returns the list of recordings.
+    """
+    marker = item.get_closest_marker('perf_record')
+    tgen = get_topogen()
+    if marker is None or tgen is None:
+        return []
+
+    routers = marker.args or sorted(tgen.routers().keys())
+    recordings = []
+    for rname in routers:
+        recording = tgen.gears[rname].profile(
+            marker.kwargs.get('daemons'),
+            name='perf-{}'.format(re.sub(r'[^\w.-]', '_', item.name)))
+        recording.start()
+        recordings.append(recording)
+    return recordings
+
+def _check_vtysh_budget(item, account):
+    """
+    Checks the test commands `account` against the test budget: the
+    `pytest.ini` budget updated with the `vtysh_budget` marker arguments.
+    """
+    tgen = get_topogen()
+    values = {}
+    if tgen is not None:
+        values.update(tgen.get_vtysh_budget())
+    marker = item.get_closest_marker('vtysh_budget')
+    if marker is not None:
+        values.update(marker.kwargs)
+    budget = cmdbudget.parse_budget(values)
+
+    exceeded = cmdbudget.check_budget(account, budget)
+    if not exceeded:
+        return
+
+    message = '"{}" exceeded its vtysh budget: {}'.format(
+        item.name, '; '.join(exceeded))
+    logger.warning(message)
+    if budget['action'] == 'fail':
+        pytest.fail('{}\n{}'.format(message, account), pytrace=False)
+    warnings.warn(cmdbudget.VtyshBudgetWarning(message))
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """
+    Record the test function execution in the lifecycle trace, profile it,
+    attach perf to the daemons (`perf_record` marker) and account the
+    commands it runs.
+    """
+    profiler = _profile_start(pyfuncitem)
+    recordings = _perf_record_start(pyfuncitem)
+    cmdbudget.start_account(pyfuncitem.name)
+    with topotrace.span(pyfuncitem.name, module=pyfuncitem.module.__name__):
+        outcome = yield
+    account = cmdbudget.stop_account()
+    for recording in recordings:
+        recording.stop()
+    _profile_stop(pyfuncitem, profiler, 'call', pyfuncitem.name, outcome)
+
+    logger.info('commands accounting of {}'.format(account))
+    pyfuncitem.add_report_section('call', 'commands', str(account))
+    if outcome.excinfo is None:
+        _check_vtysh_budget(pyfuncitem, account)
+
 def pytest_assertrepr_compare(op, left, right):
     """
     Show proper assertion error message for json_cmp results.
@@ -42,11 +251,63 @@ def pytest_assertrepr_compare(op, left, right):
 
     return json_result.errors
 
+def pytest_cmdline_main(config):
+    """
+    Topologies are built in setup_module() and shared by all tests of the
+    module, so when running with pytest-xdist (`pytest -n <num>`) a module
+    must never be split between workers: use file distribution.
+    """
+    if getattr(config.option, 'dist', 'no') == 'load':
+        logger.info('pytest-xdist: using "--dist=loadfile" to keep topology '
+                    'modules on a single worker')
+        config.option.dist = 'loadfile'
+
 def pytest_configure(config):
     "Assert that the environment is correctly configured."
     if not diagnose_env():
         pytest.exit('enviroment has errors, please read the logs')
 
+# Core dump analysis report of the session
+core_report = ''
+
+def pytest_sessionfinish(session):
+    """
+    Wait for the core dumps analysis (see lib/coreanalysis.py) and save its
+    report in the topotests directory.
+    """
+    # pylint: disable=W0603
+    global core_report
+    core_report = get_analyzer().report()
+    if core_report == '':
+        return
+
+    path = os.path.join(get_topotests_dir(), 'core_analysis.txt')
+    with open(path, 'w') as reportfile:
+        reportfile.write(core_report + '\n')
+    logger.error('core dumps found, analysis saved to {}'.format(path))
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Show the core dumps analysis and the lib API latency statistics (see
+    lib/apistats.py). When running with pytest-xdist the routers and APIs
+    run in the workers, so there is nothing to show.
+    """
+    if core_report != '':
+        terminalreporter.write_sep('=', 'core dump analysis')
+        terminalreporter.write_line(core_report)
+
+    table = apistats.report()
+    if table == '':
+        return
+
+    terminalreporter.write_sep('=', 'lib API latency statistics')
+    terminalreporter.write_line(table)
+
+    path = terminalreporter.config.getoption('--api-stats-json')
+    if path is not None:
+        apistats.dump(path)
+        terminalreporter.write_line('lib API statistics saved to {}'.format(path))
+
 def pytest_runtest_makereport(item, call):
     "Log all assert messages to default logger with error level"
     # Nothing happened
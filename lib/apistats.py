@@ -0,0 +1,211 @@
+#
+# apistats.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Library API latency statistics.
+
+The instrument_api() decorator measures every call of the decorated
+function and aggregates the call count, total time and the p50/p95/max
+latencies per API and per router. The statistics are printed at the end
+of the pytest session (see conftest.py) and can be saved as JSON.
+
+Usage example:
+
+    @instrument_api()
+    def verify_rib(ADDR_TYPE, dut, tgen, input_dict):
+        ...
+"""
+
+import json
+import time
+import inspect
+import threading
+import functools
+
+# Argument names holding the router a call applies to
+ROUTER_ARGS = ['router', 'routerName', 'rname', 'dut']
+
+# Router name used for calls that don't apply to a single router
+ANY_ROUTER = '*'
+
+# (api, router) -> list of call durations
+samples = {}
+samples_lock = threading.Lock()
+
+
+def record(api, router, duration):
+    "Records a call of `api` for `router` that lasted `duration` seconds."
+    key = (api, router or ANY_ROUTER)
+    with samples_lock:
+        samples.setdefault(key, []).append(duration)
+
+
+def reset():
+    "Forgets all the recorded calls."
+    with samples_lock:
+        samples.clear()
+
+
+def _router_getter(func):
+    """
+    Returns a function that extracts the router name from the `func` call
+    arguments, or `None` when `func` has no router argument.
+    """
+    getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+    try:
+        argnames = getargspec(func).args
+    except (TypeError, ValueError):
+        return None
+
+    for argname in ROUTER_ARGS:
+        if argname not in argnames:
+            continue
+        position = argnames.index(argname)
+
+        def getter(args, kwargs, argname=argname, position=position):
+            if argname in kwargs:
+                return kwargs[argname]
+            if position < len(args):
+                return args[position]
+            return None
+        return getter
+    return None
+
+
+def instrument_api(name=None, router=None):
+    """
+    Function decorator measuring the function calls:
+    * `name`: the API name, defaults to the function name
+    * `router`: optional function receiving the call arguments and returning
+      the router name. By default the arguments named like ROUTER_ARGS are
+      used.
+    """
+    def decorator(func):
+        api = name or func.__name__
+        getter = None
+        if router is None:
+            getter = _router_getter(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.time() - start
+                if router is not None:
+                    rname = router(*args, **kwargs)
+                elif getter is not None:
+                    rname = getter(args, kwargs)
+                else:
+                    rname = None
+                if rname is not None and not isinstance(rname, str):
+                    rname = getattr(rname, 'name', str(rname))
+                record(api, rname, duration)
+        return wrapper
+    return decorator
+
+
+def _percentile(values, percent):
+    "Returns the `percent` percentile of the sorted `values` (nearest rank)."
+    rank = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+def _summary(durations):
+    "Returns the statistics dictionary of the `durations` list."
+    values = sorted(durations)
+    return {
+        'calls': len(values),
+        'total': sum(values),
+        'p50': _percentile(values, 50),
+        'p95': _percentile(values, 95),
+        'max': values[-1],
+    }
+
+
+def get_stats():
+    """
+    Returns the statistics as a dictionary with the keys:
+    * 'apis': dictionary of API name to its statistics
+    * 'routers': dictionary of API name to a dictionary of router name to
+      its statistics (only calls that apply to a single router)
+    """
+    with samples_lock:
+        items = [(key, list(values)) for key, values in samples.items()]
+
+    per_api = {}
+    per_router = {}
+    for (api, rname), values in items:
+        per_api.setdefault(api, []).extend(values)
+        if rname != ANY_ROUTER:
+            per_router.setdefault(api, {})[rname] = _summary(values)
+
+    return {
+        'apis': dict((api, _summary(values)) for api, values in per_api.items()),
+        'routers': per_router,
+    }
+
+
+def _header(label):
+    return '{:<48} {:>7} {:>10} {:>9} {:>9} {:>9}'.format(
+        label, 'calls', 'total(s)', 'p50(s)', 'p95(s)', 'max(s)')
+
+
+def _row(label, stats):
+    return '{:<48} {:>7} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+        label[:48], stats['calls'], stats['total'], stats['p50'],
+        stats['p95'], stats['max'])
+
+
+def report(limit=30):
+    """
+    Returns the statistics table sorted by total time, showing at most
+    `limit` APIs (and `limit` API/router pairs), or an empty string when
+    nothing was recorded.
+    """
+    stats = get_stats()
+    if not stats['apis']:
+        return ''
+
+    lines = [_header('API')]
+    apis = sorted(stats['apis'].items(), key=lambda item: -item[1]['total'])
+    for api, api_stats in apis[:limit]:
+        lines.append(_row(api, api_stats))
+
+    pairs = []
+    for api, routers in stats['routers'].items():
+        for rname, router_stats in routers.items():
+            pairs.append(('{} [{}]'.format(api, rname), router_stats))
+    if pairs:
+        lines.append('')
+        lines.append(_header('API [router]'))
+        pairs.sort(key=lambda item: -item[1]['total'])
+        for label, router_stats in pairs[:limit]:
+            lines.append(_row(label, router_stats))
+    return '\n'.join(lines)
+
+
+def dump(path):
+    "Saves the statistics as JSON in `path`."
+    with open(path, 'w') as statsfile:
+        json.dump(get_stats(), statsfile, indent=2, sort_keys=True)
@@ -22,6 +22,8 @@ import ipaddress
 import traceback
 from time import sleep
 from lib.topolog import logger, logger_config
+from lib.topotrace import traced
+from lib.apistats import instrument_api
 
 # Import common_config to use commomnly used APIs
 from lib.common_config import *
@@ -35,7 +37,7 @@ class BGPRoutingPB:
 
     def __init__(self, router_id):
         self.bgp_config = None
-        self.community_lists = []
+        self.community_lists = CommunityLists()
         self.redistribute_static = None
 	self.redistribute_static_route_map = None
         self.redistribute_connected = None
@@ -193,6 +195,23 @@ def create_bgp_cfg(router, topo):
 
     return bgp
 
+def reset_bgp_cfg():
+    """
+    Forget the routers BGP configuration saved in `bgp_cfg`, see
+    reset_frr_cfg().
+    """
+    bgp_cfg.clear()
+
+# BGPConfig state saved by configuration checkpoints, see
+# FRRCFG_CHECKPOINT_ATTRS.
+BGPCFG_CHECKPOINT_ATTRS = ['routing_pb', 'is_bgp_configured', 'is_standby',
+                           '_community_list_regex_index']
+
+register_checkpoint_hook(
+    'bgp_cfg',
+    lambda: save_cfg_state(bgp_cfg, BGPCFG_CHECKPOINT_ATTRS, 'bgpcfg_file'),
+    lambda state: restore_cfg_state(bgp_cfg, state))
+
 def create_bgp_configuration(ADDR_TYPE, tgen, CWD, topo, router):
     """
     It will create bgp.conf file, in which all the routers common configuration
@@ -540,21 +559,6 @@ def redist_cfg(bgp_cfg, ADDR_TYPE):
 
     return True
 
-# Helper class for Community list configuration
-class Community:
-    def __init__(self, community, community_type, community_action, community_number):
-        self.community = community
-        self.community_type = community_type
-        self.community_action = community_action
-        self.community_number = community_number
-
-class CommunityList:
-    def __init__(self, name):
-        self.comm_list_uuid_name = name
-        self.community = []
-    def add_community(self, community):
-        self.community.append(community)
-
 class Expression:
     def __init__(self, match_community_sg_condition, regular_expression, community_list):
         self.regular_expression = regular_expression
@@ -564,17 +568,8 @@ class Expression:
 def community_list_cfg(bgp_cfg):
     if bgp_cfg.routing_pb.community_lists == None:
         return
-    for communities in bgp_cfg.routing_pb.community_lists:
-        name = communities.comm_list_uuid_name
-        for community in communities.community:
-            # Community action
-            if community.community_action == 'PERMIT':
-                action = 'permit'
-            else:
-                action = 'deny'
-
-            bgp_cfg.community_list.write(' '.join([
-                'bgp', str(community.community) , str(community.community_type), name, action, str(community.community_number), '\n']))
+    write_chunked(bgp_cfg.community_list,
+                  bgp_cfg.routing_pb.community_lists.lines())
 
 # These APIs will used by testcases
 def find_ibgp_and_ebgp_peers_in_topology(peer_type, topo):
@@ -614,6 +609,7 @@ def find_ibgp_and_ebgp_peers_in_topology(peer_type, topo):
 
     return peers
 
+@instrument_api()
 def modify_delete_router_id(action, input_dict, CWD, tgen, topo):
     """
     Modify or delete router-id for a given router
@@ -663,6 +659,7 @@ def modify_delete_router_id(action, input_dict, CWD, tgen, topo):
     logger.info("Exiting lib API: modify_delete_router_id()")
     return True
 
+@instrument_api()
 def modify_bgp_timers(ADDR_TYPE, input_dict, CWD, tgen, topo):
     """
     Modify admin distance for given static route/s
@@ -724,6 +721,7 @@ def modify_bgp_timers(ADDR_TYPE, input_dict, CWD, tgen, topo):
     logger.info("Exiting lib API: modify_bgp_timers()")
     return True
 
+@instrument_api()
 def advertise_networks_using_network_command(ADDR_TYPE, input_dict, tgen, CWD,
                                              topo):
     """
@@ -752,9 +750,7 @@ def advertise_networks_using_network_command(ADDR_TYPE, input_dict, tgen, CWD,
                 else:
                     no_of_network = 0
 
-                network_list = generate_ips(ADDR_TYPE, start_ip, no_of_network)
-                for ip in network_list:
-                    ip = str(ipaddress.ip_network(unicode(ip)))
+                for ip in generate_prefixes(start_ip, no_of_network):
                     if ADDR_TYPE == "ipv4":
                         addr = Address(ADDR_TYPE_IPv4, ip, None)
                         # IPv4
@@ -781,6 +777,7 @@ def advertise_networks_using_network_command(ADDR_TYPE, input_dict, tgen, CWD,
 
 
 
+@instrument_api()
 def configure_graceful_restart(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     configure_graceful_restart
@@ -847,6 +844,7 @@ def configure_graceful_restart(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API:  configure_graceful_restart()")
     return True
 
+@instrument_api()
 def modify_AS_number(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Modify existing AS number
@@ -913,6 +911,7 @@ def modify_AS_number(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: modify_AS_number()")
     return True
 
+@instrument_api()
 def redistribute_static_routes(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     redistribute static or connected routes or networks
@@ -967,6 +966,7 @@ def redistribute_static_routes(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: redistribute_static_routes_to_bgp()")
     return True
 
+@instrument_api()
 def configure_bgp_neighbors(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     configure bgp neighbors prefix lists
@@ -1103,6 +1103,7 @@ def configure_bgp_neighbors(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: configure_bgp_neighbors()")
     return True
 
+@instrument_api()
 def create_community_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Create community lists
@@ -1128,23 +1129,20 @@ def create_community_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
                         for comm_name in input_dict[router][comm_list][comm_type].\
                             keys():
                                 
-			    for comm in bgp_cfg[router].routing_pb.community_lists:
-                                if comm.comm_list_uuid_name == comm_name:
-                                    errormsg = ("Community list is already exists")
-                                    return errormsg
-                            
-			    for comm_dict in input_dict[router][comm_list][comm_type]\
+                            community_lists = bgp_cfg[router].routing_pb.\
+                                community_lists
+                            if comm_name in community_lists:
+                                errormsg = ("Community list is already exists")
+                                return errormsg
+
+                            for comm_dict in input_dict[router][comm_list][comm_type]\
                                 [comm_name]:
 
                                 comm_action = comm_dict["action"]
                                 comm_attribute = comm_dict["attribute"]
 
-                                comm = CommunityList(comm_name)
-                                community = Community(comm_list, comm_type, comm_action,\
-                                                               comm_attribute)
-                                comm.add_community(community)
-
-                                bgp_cfg[router].routing_pb.community_lists.append(comm)
+                                community_lists.add(comm_name, comm_list, comm_type,
+                                                    comm_action, comm_attribute)
 
                 Bgp_cfg(bgp_cfg[router])
                 redist_cfg(bgp_cfg[router], ADDR_TYPE)
@@ -1162,6 +1160,7 @@ def create_community_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     return True
 
 ## Verification APIs
+@instrument_api()
 def verify_router_id(input_dict, tgen, topo):
     """
     This API is to verify router-id for any router.
@@ -1225,6 +1224,7 @@ def verify_router_id(input_dict, tgen, topo):
 
 
 ## Verification API for graceful restart
+@instrument_api()
 def verify_graceful_restart(ADDR_TYPE, input_dict, tgen, topo, dut):
     """
     This API is to verify verify_graceful_restart for any router.
@@ -1344,6 +1344,7 @@ def verify_graceful_restart(ADDR_TYPE, input_dict, tgen, topo, dut):
 
 
 ## Verification API for r-bit
+@instrument_api()
 def verify_r_bit(ADDR_TYPE, input_dict, tgen, topo, dut):
     """
     This API is to verify verify_r_bit for any router.
@@ -1406,6 +1407,7 @@ def verify_r_bit(ADDR_TYPE, input_dict, tgen, topo, dut):
     return True
 
 ## Verification API for f-bit
+@instrument_api()
 def verify_f_bit(ADDR_TYPE, input_dict, tgen, topo, dut):
     """
     This API is to verify verify_f_bit for any router.
@@ -1478,6 +1480,8 @@ def verify_f_bit(ADDR_TYPE, input_dict, tgen, topo, dut):
     return False
 
 
+@traced()
+@instrument_api()
 def verify_bgp_convergence(ADDR_TYPE, tgen, topo):
     """
     This API is to verify BGP-Convergence on any router.
@@ -1558,6 +1562,7 @@ def verify_bgp_convergence(ADDR_TYPE, tgen, topo):
     logger.info("Exiting API: verify_bgp_confergence()")
     return True
 
+@instrument_api()
 def clear_bgp_and_verify(ADDR_TYPE, tgen, dut, topo):
     """
     This API is to clear bgp neighborship and verify.
@@ -1758,6 +1763,7 @@ def clear_bgp_and_verify(ADDR_TYPE, tgen, dut, topo):
     logger.info("Exiting lib API: clear_bgp()")
     return True
 
+@instrument_api()
 def verify_bgp_timers_and_functionality(ADDR_TYPE, tgen, input_dict, topo):
     """
     This API is to verify bgp timers and functionality.
@@ -1910,6 +1916,7 @@ def verify_bgp_timers_and_functionality(ADDR_TYPE, tgen, input_dict, topo):
 
 
 
+@instrument_api()
 def verify_GR_status(ADDR_TYPE, tgen, input_dict, topo):
     """
     This API is to verify AS numbers
@@ -2000,6 +2007,7 @@ def verify_GR_status(ADDR_TYPE, tgen, input_dict, topo):
 
 
 
+@instrument_api()
 def verify_AS_numbers(ADDR_TYPE, tgen, input_dict, topo):
     """
     This API is to verify AS numbers
@@ -2079,6 +2087,7 @@ def verify_AS_numbers(ADDR_TYPE, tgen, input_dict, topo):
     return True
 
 
+@instrument_api()
 def verify_bgp_attributes(ADDR_TYPE, dut, tgen, static_routes, rmap_name,
                           input_dict):
     """
@@ -2139,6 +2148,7 @@ def verify_bgp_attributes(ADDR_TYPE, dut, tgen, static_routes, rmap_name,
     logger.info("Exiting lib API: verify_bgp_attributes()")
     return True
 
+@instrument_api()
 def verify_best_path_as_per_bgp_attribute(ADDR_TYPE, dut, input_dict, tgen, attribute):
     """ 
     This API is to find and verify best path according to BGP attributes.
@@ -2253,6 +2263,7 @@ def verify_best_path_as_per_bgp_attribute(ADDR_TYPE, dut, input_dict, tgen, attr
         logger.info("Exiting lib API: verify_best_path_as_per_bgp_attribute()")
     return True
 
+@instrument_api()
 def verify_best_path_as_per_admin_distance(ADDR_TYPE, dut, input_dict, tgen, attribute):
     """ 
     This API is to find and verify best path as per admin distance
@@ -2336,6 +2347,7 @@ def verify_best_path_as_per_admin_distance(ADDR_TYPE, dut, input_dict, tgen, att
         return True
 
 
+@instrument_api()
 def verify_bgp_community(addr_type, dut, tgen, network, input_dict = None):
     """
     This API is to BGP communitiess
@@ -2395,6 +2407,7 @@ def verify_bgp_community(addr_type, dut, tgen, network, input_dict = None):
         return True
 
 
+@instrument_api()
 def verify_bgp_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol = None):
     """
        This API is to verify RIB  BGP routes.
@@ -2441,9 +2454,7 @@ def verify_bgp_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol =
                         no_of_ip = 0
 
                     # Generating IPs for verification
-                    ip_list = generate_ips(ADDR_TYPE, network, no_of_ip)
-                    for st_rt in ip_list:
-                        st_rt = str(ipaddress.ip_network(unicode(st_rt)))
+                    for st_rt in generate_prefixes(network, no_of_ip):
 
                         st_found = False
                         nh_found = False
@@ -2487,9 +2498,7 @@ def verify_bgp_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol =
                         no_of_network = 0
 
                     # Generating IPs for verification
-                    ip_list = generate_ips(ADDR_TYPE, start_ip, no_of_network)
-                    for st_rt in ip_list:
-                        st_rt = str(ipaddress.ip_network(unicode(st_rt)))
+                    for st_rt in generate_prefixes(start_ip, no_of_network):
 
                         found = False
                         if st_rt in rib_routes_json:
@@ -0,0 +1,218 @@
+#
+# capabilities.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Environment capability registry.
+
+Probing the environment (binary versions, daemon command line options,
+kernel modules) means running external commands. The registry runs each
+probe once and keeps the results on disk, so the following test sessions
+(and the other pytest-xdist workers) reuse them:
+
+* binary probes are keyed by the binary path, size and modification time,
+  so they are computed again when the binary is reinstalled
+* kernel module probes are only valid for the current boot
+* the whole cache is dropped when the kernel release changes
+
+Usage example:
+
+    caps = get_capabilities()
+    if caps.has_option('/usr/lib/frr/zebra', '--vrfwnetns'):
+        ...
+"""
+
+import os
+import json
+import platform
+import subprocess
+import tempfile
+
+from lib.topolog import logger
+
+# The cache is shared by all pytest-xdist workers.
+CACHE_FILE = '/tmp/topotests/capabilities.json'
+CACHE_VERSION = 1
+
+
+def _boot_id():
+    "Returns the current boot identifier."
+    try:
+        with open('/proc/sys/kernel/random/boot_id', 'r') as bootfile:
+            return bootfile.read().strip()
+    except IOError:
+        return None
+
+
+def _binary_key(path):
+    """
+    Returns the cache key fragment of the binary in `path` or `None` if the
+    binary does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return '{}:{}:{}'.format(path, stat.st_size, int(stat.st_mtime))
+
+
+def _run(args):
+    "Runs a command and returns its output or `None` on failure."
+    try:
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+    except OSError:
+        return None
+    output = proc.communicate()[0]
+    if not isinstance(output, str):
+        output = output.decode('utf-8', 'replace')
+    return output
+
+
+class CapabilityRegistry(object):
+    "Environment capabilities cached on disk."
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.kernel = platform.release()
+        self.boot_id = _boot_id()
+        self.entries = {}
+        self.modules = {}
+        self._load()
+
+    def _load(self):
+        "Loads the cache file, dropping the stale entries."
+        try:
+            with open(self.path, 'r') as cachefile:
+                data = json.load(cachefile)
+        except (IOError, ValueError):
+            return
+
+        if (data.get('version') != CACHE_VERSION or
+                data.get('kernel') != self.kernel):
+            return
+        self.entries = data.get('entries', {})
+        if data.get('boot_id') == self.boot_id:
+            self.modules = data.get('modules', {})
+
+    def _save(self):
+        """
+        Writes the cache file atomically. The entries found by other
+        processes in the meantime are kept.
+        """
+        entries = self.entries
+        modules = self.modules
+        self.entries = {}
+        self.modules = {}
+        self._load()
+        self.entries.update(entries)
+        self.modules.update(modules)
+
+        data = {
+            'version': CACHE_VERSION,
+            'kernel': self.kernel,
+            'boot_id': self.boot_id,
+            'entries': self.entries,
+            'modules': self.modules,
+        }
+        dirname = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fde, tmpname = tempfile.mkstemp(dir=dirname)
+            with os.fdopen(fde, 'w') as cachefile:
+                json.dump(data, cachefile, indent=2, sort_keys=True)
+            os.rename(tmpname, self.path)
+        except (IOError, OSError) as err:
+            logger.warning('failed to save capabilities cache: {}'.format(err))
+
+    def _binary_output(self, path, flag):
+        """
+        Returns the output of the binary in `path` when called with `flag`,
+        or `None` if the binary does not exist.
+        """
+        key = _binary_key(path) if path is not None else None
+        if key is None:
+            return None
+        key = '{}:{}'.format(key, flag)
+        if key not in self.entries:
+            output = _run([path, flag])
+            if output is None:
+                return None
+            self.entries[key] = output
+            self._save()
+        return self.entries[key]
+
+    def which(self, name):
+        """
+        Returns the full path of the `name` binary found in `PATH` or `None`
+        if it was not found.
+        """
+        for dirname in os.environ.get('PATH', os.defpath).split(os.pathsep):
+            path = os.path.join(dirname, name)
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
+        return None
+
+    def version(self, path):
+        "Returns the `path -v` output or `None` if `path` does not exist."
+        return self._binary_output(path, '-v')
+
+    def help_text(self, path):
+        "Returns the `path -h` output or `None` if `path` does not exist."
+        return self._binary_output(path, '-h')
+
+    def has_option(self, path, option):
+        "Returns whether the `path` binary help text mentions `option`."
+        output = self.help_text(path)
+        if output is None:
+            return False
+        return option.replace('-', '') in output
+
+    def module_present(self, module, load=True):
+        """
+        Returns whether the kernel `module` is present.
+
+        If `load` is true, it will try to load it via modprobe.
+        """
+        key = '{}:{}'.format(module, 'load' if load else 'probe')
+        if key not in self.modules:
+            with open('/proc/modules', 'r') as modules_file:
+                present = module.replace('-', '_') in modules_file.read()
+            if not present:
+                cmd = '/sbin/modprobe {}{}'.format('' if load else '-n ', module)
+                present = os.system(cmd) == 0
+            self.modules[key] = present
+            self._save()
+        return self.modules[key]
+
+
+# The registry used by the test session
+registry = None
+
+
+def get_capabilities():
+    "Returns the session capability registry."
+    # pylint: disable=W0603
+    global registry
+    if registry is None:
+        registry = CapabilityRegistry()
+    return registry
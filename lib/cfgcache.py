@@ -0,0 +1,236 @@
+#
+# cfgcache.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Content-addressed cache of configuration builds and deltas.
+
+Building the routers configuration from the same topology with the same
+test library gives the same result, and going back to a previous
+configuration state asks for deltas that were already computed. Values are
+stored by a hash of everything they depend on (the key parts and the test
+library sources), in memory and on disk so other runs can use them. Files
+are written atomically, concurrent runs may share the cache directory.
+
+Values are stored as JSON when they can be (deltas are lists of strings),
+otherwise pickled (configuration builds). The tests run as root, so the disk
+cache is only used when its directory belongs to the user running the tests
+and isn't writable by anyone else, and only files owned by that user and
+not writable by others are loaded. Otherwise the values are only cached in
+memory.
+
+Usage example:
+
+    cache = get_cache()
+    key = content_key('delta', current, target)
+    delta = cache.load('delta', key)
+    if delta is None:
+        delta = compute_delta(current, target)
+        cache.store('delta', key, delta)
+"""
+
+import os
+import stat
+import glob
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+
+# Default cache directory, shared by the test runs of the user
+CACHE_DIR = '/tmp/topotests/cache-{}'.format(os.getuid())
+
+# Serialized value formats, by their first byte
+JSON_FORMAT = b'j'
+PICKLE_FORMAT = b'p'
+
+# Hash of the test library sources, see lib_version()
+_lib_version = None
+
+
+def lib_version():
+    "Returns a hash of the test library (lib/*.py) sources."
+    # pylint: disable=W0603
+    global _lib_version
+    if _lib_version is None:
+        digest = hashlib.sha1()
+        libdir = os.path.dirname(os.path.realpath(__file__))
+        for path in sorted(glob.glob(os.path.join(libdir, '*.py'))):
+            with open(path, 'rb') as source:
+                digest.update(os.path.basename(path).encode('utf-8'))
+                digest.update(source.read())
+        _lib_version = digest.hexdigest()
+    return _lib_version
+
+
+def content_key(*parts):
+    """
+    Returns the cache key of a value computed from `parts` (JSON
+    serializable values) by the current test library.
+    """
+    text = json.dumps([lib_version()] + list(parts), sort_keys=True,
+                      default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def file_key(path):
+    "Returns a key part identifying the file `path` content version."
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return [path, None]
+    return [path, stat.st_size, int(stat.st_mtime)]
+
+
+def _trusted(stats):
+    """
+    Returns whether the file of `stats` (os.stat() result) belongs to the
+    current user and isn't writable by the group or others.
+    """
+    return (stats.st_uid == os.getuid() and
+            not stats.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+def secure_directory(directory):
+    """
+    Creates the `directory` (only accessible by the current user) if it
+    doesn't exist. Returns whether it is a trusted directory.
+    """
+    parent = os.path.dirname(directory)
+    try:
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        os.mkdir(directory, 0o700)
+    except OSError:
+        # Already existing or not creatable, see below.
+        pass
+    try:
+        stats = os.lstat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(stats.st_mode) and _trusted(stats)
+
+
+def serialize(value):
+    "Returns the JSON or, if it can't be, pickle serialization of `value`."
+    try:
+        return JSON_FORMAT + json.dumps(value).encode('utf-8')
+    except (TypeError, ValueError):
+        return PICKLE_FORMAT + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize(data):
+    "Returns the value serialized by serialize()."
+    if data[:1] == JSON_FORMAT:
+        return json.loads(data[1:].decode('utf-8'))
+    if data[:1] == PICKLE_FORMAT:
+        return pickle.loads(data[1:])
+    raise ValueError('unknown cached value format')
+
+
+class ConfigCache(object):
+    """
+    Cache of JSON serializable or picklable values by kind and content key.
+    The disk cache is disabled (`directory` is `None`) when the directory
+    can't be trusted.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory if secure_directory(directory) else None
+        self.memory = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, kind, key[:2], key)
+
+    def load(self, kind, key):
+        "Returns the `kind` value stored with `key` or `None`."
+        with self.lock:
+            if (kind, key) in self.memory:
+                self.hits += 1
+                return deserialize(self.memory[(kind, key)])
+            if self.directory is None:
+                self.misses += 1
+                return None
+
+        try:
+            with open(self._path(kind, key), 'rb') as cached:
+                if not _trusted(os.fstat(cached.fileno())):
+                    raise IOError('untrusted cache file')
+                data = cached.read()
+            value = deserialize(data)
+        except (IOError, OSError, EOFError, ValueError, pickle.PickleError,
+                AttributeError, ImportError, TypeError):
+            # Missing, untrusted, partial or from an incompatible library:
+            # a miss.
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.memory[(kind, key)] = data
+            self.hits += 1
+        return value
+
+    def store(self, kind, key, value):
+        "Stores the `kind` `value` with `key`."
+        data = serialize(value)
+        with self.lock:
+            self.memory[(kind, key)] = data
+        if self.directory is None:
+            return
+
+        path = self._path(kind, key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError:
+            # Created by another run or not writable, see below.
+            pass
+
+        try:
+            fd, tmppath = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        except (IOError, OSError):
+            # The value is still cached in memory.
+            return
+        try:
+            with os.fdopen(fd, 'wb') as cached:
+                cached.write(data)
+            os.rename(tmppath, path)
+        except (IOError, OSError):
+            if os.path.exists(tmppath):
+                os.unlink(tmppath)
+
+
+# The cache of the test session
+cache = None
+
+
+def get_cache():
+    "Returns the session configuration cache."
+    # pylint: disable=W0603
+    global cache
+    if cache is None:
+        cache = ConfigCache()
+    return cache
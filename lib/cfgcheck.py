@@ -0,0 +1,99 @@
+#
+# cfgcheck.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+
+"""
+Offline configuration validation.
+
+Invalid commands in the configurations built by the test library are
+otherwise only found after they were pushed to running routers. vtysh can
+check a configuration file without any daemon running (`vtysh -C -f`):
+the configurations of all routers are concatenated in one file, checked by
+one vtysh invocation, and the failures are mapped back to their router and
+configuration line.
+
+Only the CLI syntax is checked, errors found by the daemons themselves
+(e.g. '% Malformed community-list value') still need a push.
+
+Usage example:
+
+    errors = check_configs({'r1': r1_config, 'r2': r2_config})
+    for rname, lineno, command, message in errors:
+        ...
+"""
+
+import os
+import subprocess
+import tempfile
+
+from lib.cfgpush import parse_errors
+
+VTYSH = 'vtysh'
+
+
+def check_file_lines(configs):
+    """
+    Returns the lines of the file checking the `configs` (dictionary of
+    router name to configuration text): a list of ((router name, line
+    number), stripped line) tuples. Every configuration ends with a '!' line, vtysh
+    goes back to the top level for the next router commands as they are
+    not found in the last context of the previous router.
+    """
+    lines = []
+    for rname in sorted(configs):
+        for lineno, line in enumerate(configs[rname].splitlines(), 1):
+            lines.append(((rname, lineno), line.strip()))
+        lines.append(((rname, None), '!'))
+    return lines
+
+
+def check_configs(configs, vtysh=VTYSH):
+    """
+    Checks the `configs` (dictionary of router name to configuration text)
+    with one `vtysh -C -f` invocation. Returns the list of failures:
+    (router name, line number, command, message) tuples. Error messages
+    that can't be related to a router have no router name, line number and
+    command (`None`).
+
+    Raises OSError when `vtysh` can't be run.
+    """
+    lines = check_file_lines(configs)
+    fde, fname = tempfile.mkstemp(prefix='cfgcheck-', suffix='.conf')
+    try:
+        with os.fdopen(fde, 'w') as cfg:
+            cfg.write(''.join('{}\n'.format(line) for _, line in lines))
+        proc = subprocess.Popen([vtysh, '-C', '-f', fname],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        output = proc.communicate()[0]
+    finally:
+        os.unlink(fname)
+    if not isinstance(output, str):
+        output = output.decode('utf-8', 'replace')
+
+    failures = []
+    for source, command, message in parse_errors(output, lines):
+        if source is None:
+            failures.append((None, None, None, message))
+        else:
+            failures.append(source + (command, message))
+    return failures
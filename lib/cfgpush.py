@@ -0,0 +1,136 @@
+#
+# cfgpush.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+
+"""
+Throughput oriented configuration push.
+
+`vtysh < file` echoes every command back: pushing a 100k lines configuration
+returns (and logs) 100k lines of output. The push path of this module runs
+`vtysh -f` instead, which only prints the failures, and splits the commands
+in bounded chunks so the progress can be reported:
+
+* every chunk starts with the context (and sub-context) lines the commands
+  of the previous chunk left open, so a chunk can be applied on its own
+* vtysh failure lines ('line N: ...') are mapped back to the line number of
+  the command in the pushed configuration, the daemon messages printed
+  before a failure line (e.g. '% Malformed community-list value') are
+  attached to it
+
+Usage example:
+
+    for chunk in split_chunks(delta):
+        fname = topotest.get_file(chunk_text(chunk))
+        output = router.run('vtysh -f {} 2>&1'.format(fname))
+        errors.extend(parse_errors(output, chunk))
+"""
+
+import re
+
+from lib.frrconfig import (CONTEXT_KEYWORDS, SUB_CONTEXT_KEYWORDS,
+                           SUB_CONTEXT_EXITS, CONTEXT_EXITS)
+
+# Maximum number of commands per `vtysh -f` invocation
+CHUNK_LINES = 5000
+
+# Configuration deltas with more lines than this are pushed with `vtysh -f`
+THROUGHPUT_LINES = 1000
+
+FAILURE_LINE = re.compile(r'^line (\d+): (.*)$')
+
+
+def split_chunks(lines, chunk_lines=CHUNK_LINES):
+    """
+    Splits the configuration `lines` (commands to run in the configuration
+    mode) in chunks of at most `chunk_lines` commands, plus the repeated
+    context lines. Returns a list of chunks, each chunk a list of
+    (source line number, command) tuples. Line numbers start at 1.
+    """
+    chunks = []
+    chunk = []
+    context = []
+    count = 0
+    for lineno, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith('!'):
+            continue
+
+        if count == chunk_lines:
+            chunks.append(chunk)
+            chunk = list(context)
+            count = 0
+        chunk.append((lineno, command))
+        count += 1
+
+        if command.startswith(CONTEXT_KEYWORDS):
+            context = [(lineno, command)]
+        elif command.startswith(SUB_CONTEXT_KEYWORDS) and context:
+            context = context[:1] + [(lineno, command)]
+        elif command in SUB_CONTEXT_EXITS:
+            context = context[:1]
+        elif (command in CONTEXT_EXITS or
+              (command.startswith('no ') and
+               command[3:].startswith(CONTEXT_KEYWORDS))):
+            context = []
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def chunk_text(chunk):
+    "Returns the `vtysh -f` file content of `chunk`."
+    return '\n'.join(command for _, command in chunk) + '\n'
+
+
+def parse_errors(output, chunk):
+    """
+    Parses the `vtysh -f` `output` of `chunk` and returns the list of
+    failures: (source line number, command, message) tuples. Error messages
+    ('%' lines) that can't be related to a command have no line number and
+    command (`None`), other output is ignored.
+    """
+    errors = []
+    messages = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = FAILURE_LINE.match(line)
+        if match is None:
+            if line.startswith('%'):
+                messages.append(line)
+            continue
+
+        index = int(match.group(1)) - 1
+        message = match.group(2)
+        if messages:
+            message = '{} ({})'.format(' '.join(messages), message)
+            messages = []
+        if 0 <= index < len(chunk):
+            errors.append((chunk[index][0], chunk[index][1], message))
+        else:
+            errors.append((None, None, message))
+
+    for message in messages:
+        errors.append((None, None, message))
+    return errors
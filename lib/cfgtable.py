@@ -0,0 +1,229 @@
+#
+# cfgtable.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Compact configuration tables.
+
+The configuration APIs keep static routes, prefix lists and community lists
+of scale tests (hundreds of thousands of entries per router). Instead of one
+object per entry, the entries are stored in tables with one list per field
+(columns), and they are rendered as configuration lines by generators
+written out in chunks.
+
+Usage example:
+
+    routes = StaticRouteTable()
+    routes.extend('ip', prefix_range('10.0.0.0/32', 100000), '192.168.0.2')
+    write_chunked(output, routes.lines())
+"""
+
+from collections import OrderedDict
+
+try:
+    from itertools import izip as zip
+except ImportError:
+    pass
+
+# Number of lines joined in a single write by write_chunked()
+CHUNK_LINES = 4096
+
+
+def write_chunked(output, lines, chunk_lines=CHUNK_LINES):
+    """
+    Writes the `lines` iterable (lines ending with a new line) to the
+    `output` file object, `chunk_lines` lines per write.
+    """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_lines:
+            output.write(''.join(chunk))
+            chunk = []
+    if chunk:
+        output.write(''.join(chunk))
+
+
+class ColumnTable(object):
+    "Table rows stored as one list per field of FIELDS."
+
+    FIELDS = ()
+
+    def __init__(self):
+        self.columns = dict((field, []) for field in self.FIELDS)
+
+    def __len__(self):
+        return len(self.columns[self.FIELDS[0]])
+
+    def add(self, *values):
+        "Adds a row with the `values` of FIELDS."
+        for field, value in zip(self.FIELDS, values):
+            self.columns[field].append(value)
+
+    def get(self, index, field):
+        "Returns the `field` value of the row `index`."
+        return self.columns[field][index]
+
+    def set(self, index, field, value):
+        "Sets the `field` value of the row `index`."
+        self.columns[field][index] = value
+
+    def find(self, **values):
+        "Returns the indexes of the rows with the field `values`."
+        fields = list(values.items())
+        return [index for index in range(len(self))
+                if all(self.columns[field][index] == value
+                       for field, value in fields)]
+
+    def remove(self, indexes):
+        "Removes the rows `indexes`."
+        removed = set(indexes)
+        for field in self.FIELDS:
+            column = self.columns[field]
+            self.columns[field] = [value for index, value in enumerate(column)
+                                   if index not in removed]
+
+    def rows(self):
+        "Returns an iterator on the rows tuples."
+        return zip(*[self.columns[field] for field in self.FIELDS])
+
+
+class StaticRouteTable(ColumnTable):
+    "Static routes, `ip_cmd` is 'ip' or 'ipv6'."
+
+    FIELDS = ('ip_cmd', 'prefix', 'next_hop', 'admin_distance', 'if_name',
+              'tag')
+
+    def extend(self, ip_cmd, prefixes, next_hop, admin_distance=1,
+               if_name=None, tag=None):
+        "Adds a route to each prefix of the `prefixes` iterable."
+        start = len(self)
+        self.columns['prefix'].extend(prefixes)
+        count = len(self.columns['prefix']) - start
+        for field, value in (('ip_cmd', ip_cmd), ('next_hop', next_hop),
+                             ('admin_distance', admin_distance),
+                             ('if_name', if_name), ('tag', tag)):
+            self.columns[field].extend([value] * count)
+
+    def lines(self):
+        "Yields the static routes configuration lines."
+        for ip_cmd, prefix, next_hop, distance, if_name, tag in self.rows():
+            if if_name is not None:
+                next_hop = '{} {}'.format(next_hop, if_name)
+            distance = str(distance) if distance > 0 else '1'
+            if tag is None:
+                yield ' '.join([ip_cmd, 'route', prefix, next_hop, distance,
+                                '\n'])
+            else:
+                yield ' '.join([ip_cmd, 'route', prefix, next_hop, 'tag',
+                                str(tag), distance, '\n'])
+
+
+class PrefixListEntries(ColumnTable):
+    """
+    Entries of a prefix list. `network` is the prefix or 'any' and `ip_cmd`
+    is 'ip', 'ipv6' or `None` (address family of the configuration).
+    """
+
+    FIELDS = ('seq', 'action', 'ip_cmd', 'network', 'le', 'ge')
+
+
+class NamedTables(object):
+    "Tables of entries by name, in their creation order."
+
+    TABLE = ColumnTable
+
+    def __init__(self):
+        self.tables = OrderedDict()
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def __len__(self):
+        return len(self.tables)
+
+    def names(self):
+        "Returns the list of names."
+        return list(self.tables.keys())
+
+    def add(self, name, *values):
+        "Adds an entry with the `values` to the table `name`."
+        if name not in self.tables:
+            self.tables[name] = self.TABLE()
+        self.tables[name].add(*values)
+
+    def get(self, name):
+        "Returns the table `name`."
+        return self.tables[name]
+
+    def remove(self, name):
+        "Removes the table `name`."
+        del self.tables[name]
+
+
+class PrefixLists(NamedTables):
+    "Prefix lists by name."
+
+    TABLE = PrefixListEntries
+
+    def lines(self, ip_cmd):
+        """
+        Yields the prefix lists configuration lines, `ip_cmd` ('ip' or
+        'ipv6') is used by the entries without address family.
+        """
+        for name, entries in self.tables.items():
+            for seq, action, eip_cmd, network, le, ge in entries.rows():
+                if network == 'any':
+                    yield ' '.join([eip_cmd or ip_cmd, 'prefix-list', name,
+                                    'seq', str(seq), action, network, '\n'])
+                    continue
+
+                length = int(network.split('/')[1])
+                le_ge = ''
+                if le and length <= le:
+                    le_ge = ' '.join([le_ge, 'le', str(le)])
+                if ge and ge >= length:
+                    le_ge = ' '.join([le_ge, 'ge', str(ge)])
+                yield ' '.join([eip_cmd, 'prefix-list', name, 'seq', str(seq),
+                                action, network, le_ge, '\n'])
+
+
+class CommunityListEntries(ColumnTable):
+    """
+    Entries of a community list, `kind` is 'community-list' or
+    'large-community-list' and `type` 'standard' or 'expanded'.
+    """
+
+    FIELDS = ('kind', 'type', 'action', 'attribute')
+
+
+class CommunityLists(NamedTables):
+    "Community lists by name."
+
+    TABLE = CommunityListEntries
+
+    def lines(self):
+        "Yields the community lists configuration lines."
+        for name, entries in self.tables.items():
+            for kind, ctype, action, attribute in entries.rows():
+                action = 'permit' if action == 'PERMIT' else 'deny'
+                yield ' '.join(['bgp', str(kind), str(ctype), name, action,
+                                str(attribute), '\n'])
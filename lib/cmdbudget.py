@@ -0,0 +1,167 @@
+#
+# cmdbudget.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Per-test accounting of the commands run in the topology nodes.
+
+Every shell command (vtysh included) run through the topogen API is
+accounted to the running test: number of commands, vtysh invocations,
+routers and daemons they were sent to, output bytes and time spent.
+
+Tests can be given budgets, in `pytest.ini` or with the `vtysh_budget`
+marker, e.g.:
+
+    @pytest.mark.vtysh_budget(vtysh=200, time=60, action='fail')
+    def test_bgp_convergence():
+        ...
+
+Budget keys:
+* `commands`: maximum number of shell commands (vtysh included)
+* `vtysh`: maximum number of vtysh invocations
+* `bytes`: maximum number of output bytes
+* `time`: maximum time (in seconds) spent waiting for commands
+* `action`: 'warn' (default) or 'fail' when a budget is exceeded
+"""
+
+import threading
+
+BUDGET_KEYS = ['commands', 'vtysh', 'bytes', 'time']
+BUDGET_ACTIONS = ['warn', 'fail']
+
+
+class VtyshBudgetWarning(UserWarning):
+    "Warning issued when a test exceeds its command budget."
+
+
+class CommandAccount(object):
+    "Commands accounting of a test."
+
+    def __init__(self, name):
+        self.name = name
+        self.commands = 0
+        self.vtysh = 0
+        self.bytes = 0
+        self.time = 0.0
+        self.routers = {}
+        self.daemons = {}
+        self.lock = threading.Lock()
+
+    def add_command(self, router, output, duration):
+        "Accounts a shell command run in `router`."
+        with self.lock:
+            self.commands += 1
+            self.bytes += len(output or '')
+            self.time += duration
+            self.routers[router] = self.routers.get(router, 0) + 1
+
+    def add_vtysh(self, router, daemon):
+        """
+        Accounts a vtysh invocation in `router`. The shell command running
+        vtysh is accounted separately with add_command().
+        """
+        daemon = daemon or 'all'
+        with self.lock:
+            self.vtysh += 1
+            self.daemons[daemon] = self.daemons.get(daemon, 0) + 1
+
+    def values(self):
+        "Returns the accounted values of the budget keys."
+        return {
+            'commands': self.commands,
+            'vtysh': self.vtysh,
+            'bytes': self.bytes,
+            'time': self.time,
+        }
+
+    def __str__(self):
+        routers = ', '.join('{}={}'.format(router, count)
+                            for router, count in sorted(self.routers.items()))
+        daemons = ', '.join('{}={}'.format(daemon, count)
+                            for daemon, count in sorted(self.daemons.items()))
+        return ('{}: {} commands ({} vtysh), {} bytes, {:.2f} seconds\n'
+                '  routers: {}\n'
+                '  vtysh daemons: {}'.format(
+                    self.name, self.commands, self.vtysh, self.bytes,
+                    self.time, routers or '-', daemons or '-'))
+
+
+# The account of the running test
+account = None
+
+
+def start_account(name):
+    "Starts accounting the commands of test `name`."
+    # pylint: disable=W0603
+    global account
+    account = CommandAccount(name)
+    return account
+
+
+def stop_account():
+    "Stops accounting and returns the test account (or `None`)."
+    # pylint: disable=W0603
+    global account
+    current = account
+    account = None
+    return current
+
+
+def record_command(router, output, duration):
+    "Accounts a shell command when a test is running."
+    if account is not None:
+        account.add_command(router, output, duration)
+
+
+def record_vtysh(router, daemon):
+    "Accounts a vtysh invocation when a test is running."
+    if account is not None:
+        account.add_vtysh(router, daemon)
+
+
+def parse_budget(values):
+    """
+    Returns the budget dictionary of the `values` mapping (e.g. marker
+    keyword arguments or configuration options), ignoring unset keys.
+    Raises `ValueError` on invalid values.
+    """
+    budget = {}
+    for key in BUDGET_KEYS:
+        value = values.get(key)
+        if value is None or value == '':
+            continue
+        budget[key] = float(value)
+    action = values.get('action') or 'warn'
+    if action not in BUDGET_ACTIONS:
+        raise ValueError('invalid vtysh budget action "{}"'.format(action))
+    budget['action'] = action
+    return budget
+
+
+def check_budget(current, budget):
+    "Returns the list of budgets the `current` account exceeded."
+    exceeded = []
+    values = current.values()
+    for key in BUDGET_KEYS:
+        if key in budget and values[key] > budget[key]:
+            exceeded.append('{} {:g} exceeds the budget of {:g}'.format(
+                key, values[key], budget[key]))
+    return exceeded
@@ -22,15 +22,27 @@ import os
 import sys
 import StringIO
 import traceback
+import threading
 import ipaddress
 import ConfigParser
+from copy import deepcopy
+from contextlib import contextmanager
 from time import sleep
 from datetime import datetime
 
 # Import topogen and topotest helpers 
 from lib import topotest
-from lib.topogen import Topogen, TopoRouter, get_topogen
+from lib.topogen import (Topogen, TopoRouter, get_topogen,
+                         register_checkpoint_hook)
 from lib.topolog import logger, logger_config
+from lib.topotrace import traced
+from lib.apistats import instrument_api
+from lib import frrconfig
+from lib import cfgpush
+from lib import cfgcheck
+from lib.prefixgen import prefix_ints, prefix_range
+from lib.cfgtable import (StaticRouteTable, PrefixLists, CommunityLists,
+                          write_chunked)
 
 if sys.version_info >= (3,):
     import io
@@ -47,6 +59,9 @@ IPv6_UNICAST = 3
 FRRCFG_FILE = 'frr_json.conf'
 frr_cfg = {}
 
+# Routers whose configuration load is deferred, see deferred_config_load()
+deferred_loads = None
+
 ####
 CD = os.path.dirname(os.path.realpath(__file__))
 pytestini_path = os.path.join(CD, '../pytest.ini')
@@ -77,7 +92,7 @@ if config.has_option('topogen', 'frrtest_log_dir'):
     print "Logs will be sent to logfile: {}".format(frrtest_log_file)
 
 if config.has_option('topogen', 'show_router_config'):
-    show_router_config = config.get('topogen', 'show_router_config')
+    show_router_config = config.getboolean('topogen', 'show_router_config')
 else:
     show_router_config = False
 
@@ -86,8 +101,8 @@ class RoutingPB:
 
     def __init__(self):
         self.interfaces_cfg = None
-        self.static_route = []
-        self.prefix_lists = []
+        self.static_route = StaticRouteTable()
+        self.prefix_lists = PrefixLists()
         self.route_maps = []
 
 
@@ -174,6 +189,68 @@ class FRRConfig:
         self.prefix_lists.close()
         self.route_maps.close()
 
+def reset_frr_cfg():
+    """
+    Forget the routers configuration saved in `frr_cfg`. It is a module
+    global, so a process running several topologies in a row (e.g. a
+    pytest-xdist worker) would otherwise carry routers from the previous
+    topology over.
+    """
+    frr_cfg.clear()
+
+def save_cfg_state(cfgs, attrs, file_attr):
+    """
+    Returns a copy of the routers configuration objects state for a
+    configuration checkpoint: the `attrs` attributes and the contents of the
+    configuration file named by the `file_attr` attribute.
+
+    * `cfgs` : dictionary of router name to configuration object
+    """
+    state = {}
+    for router, cfg in cfgs.iteritems():
+        attributes = dict((attr, deepcopy(getattr(cfg, attr)))
+                          for attr in attrs if hasattr(cfg, attr))
+        content = None
+        fname = getattr(cfg, file_attr)
+        if os.path.isfile(fname):
+            with open(fname, 'r') as cfgfile:
+                content = cfgfile.read()
+        state[router] = (attributes, fname, content)
+    return state
+
+def restore_cfg_state(cfgs, state, create=None):
+    """
+    Restores the routers configuration objects state saved by
+    save_cfg_state(). Routers created after the checkpoint are forgotten.
+
+    * `create` : optional function creating the configuration object of a
+                 missing router, called with the router name and the file
+                 name. Missing routers are skipped otherwise.
+    """
+    for router in cfgs.keys():
+        if router not in state:
+            del cfgs[router]
+
+    for router, (attributes, fname, content) in state.iteritems():
+        if router not in cfgs:
+            if create is None:
+                continue
+            cfgs[router] = create(router, fname)
+        for attr, value in attributes.iteritems():
+            setattr(cfgs[router], attr, deepcopy(value))
+        if content is not None:
+            with open(fname, 'w') as cfgfile:
+                cfgfile.write(content)
+
+# FRRConfig state saved by configuration checkpoints. The configuration
+# buffers are rendered again from `routing_pb` on the next change.
+FRRCFG_CHECKPOINT_ATTRS = ['routing_pb', '_route_map_seq_id']
+
+register_checkpoint_hook(
+    'frr_cfg',
+    lambda: save_cfg_state(frr_cfg, FRRCFG_CHECKPOINT_ATTRS, 'frrcfg_file'),
+    lambda state: restore_cfg_state(frr_cfg, state))
+
 def create_common_configuration(ADDR_TYPE, tgen, CWD, topo, router):
     """
     It will save routers common configuration to frr.conf file
@@ -249,15 +326,17 @@ class Interfaces:
 
     def __init__(self):
         self.interfaces = []
+        self.index = {}
 
     def add_interface(self, interface_name, interface_ip_addresses):
-        for n in self.interfaces:
-            if n.interface_name == interface_name:
-                n.interface_ip_address.append(interface_ip_addresses)
-                return
+        if interface_name in self.index:
+            self.index[interface_name].interface_ip_addresses.extend(
+                interface_ip_addresses)
+            return
 
         interface = Interface(interface_name, interface_ip_addresses)
         self.interfaces.append(interface)
+        self.index[interface_name] = interface
         return interface
 
 
@@ -277,64 +356,10 @@ def interfaces_cfg(frr_cfg):
     for interface in ifaces.interfaces:
         _print_interfaces_cfg(frr_cfg, interface)
 
-# Helper class for Static route nexthop configuration
-class Nexthop:
-
-    def __init__(self, ip, blackhole = False, admin_distance = 1,
-                 if_name = None, tag = None):
-        self.ip = ip
-        self.blackhole = blackhole
-        self.admin_distance = admin_distance
-        self.if_name = if_name
-        self.tag = tag
-
-# Helper class for Static route ip-prefix  configuration
-class Route:
-
-    def __init__(self, prefix):
-        self.prefix = prefix
-        self.nexthops = []
-
-    def add_nexthop(self, ip, blackhole, admin_distance, if_name, tag):
-        nhop = Nexthop(ip, blackhole, admin_distance, if_name, tag)
-        self.nexthops.append(nhop)
-
-
-def static_rt_nh(nh):
-    rc = 0
-    nexthop = ''
-    admin_dist = '1'
-    tag = None
-    if nh.ip:
-        nexthop = IpAddressMsg_to_str(nh.ip)
-    elif nh.blackhole:
-        nexthop = 'blackhole'
-    if nh.if_name != None:
-        nexthop = nexthop + ' ' + nh.if_name
-    if nh.admin_distance > 0:
-        admin_dist = str(nh.admin_distance)
-    if nh.tag != None:
-        tag = nh.tag
-    return (rc, nexthop, admin_dist, tag)
-
 def static_rt_cfg(frr_cfg):
     if frr_cfg.routing_pb.static_route == None:
         return
-    for st in frr_cfg.routing_pb.static_route:
-        prefix = IpAddressMsg_to_str(st.prefix)
-        addr_type = st.prefix.afi
-        ip_cmd = get_ip_cmd(addr_type)
-        for nh in st.nexthops:
-            rc, nexthop, admin_dist, tag = static_rt_nh(nh)
-            if rc == 0:
-                if tag == None:
-                    frr_cfg.static_routes.write(' '.join([ip_cmd,
-                     'route', prefix, nexthop, admin_dist, '\n']))
-                else:
-                    frr_cfg.static_routes.write(' '.join([ip_cmd,
-                     'route', prefix, nexthop, 'tag', str(tag), admin_dist, '\n']))
-            else:
-                frr_cfg.errors.append('Static Route: ' + prefix + 'with Nexthop: ' + str(nh))
+    write_chunked(frr_cfg.static_routes, frr_cfg.routing_pb.static_route.lines())
 
 # Helper class for general Network configuration
 class Network:
@@ -354,22 +379,6 @@ class Address:
         self.ipv4 = ipv4
         self.ipv6 = ipv6
 
-# Helper class for IP Prefix list configuration
-class Pfx:
-    def __init__(self, less_or_equal_bits, greater_or_equal_bits, action, network, seqid):
-        self.less_or_equal_bits = less_or_equal_bits
-        self.greater_or_equal_bits = greater_or_equal_bits
-        self.action = action
-        self.network = network
-        self.seq_id = seqid
-
-class PrefixList:
-    def __init__(self, name):
-        self.prefix_list_uuid_name = name
-        self.prefix = []
-    def add_pfx(self, pfx):
-        self.prefix.append(pfx)
-
 def get_action_from_route_map_seq(route_map_seq):
     if route_map_seq.action == PERMIT:
         return 'permit'
@@ -379,35 +388,9 @@ def get_action_from_route_map_seq(route_map_seq):
 def prefixlist_cfg(frr_cfg, ADDR_TYPE):
     if frr_cfg.routing_pb.prefix_lists == None:
         return
-    for prefixlist in frr_cfg.routing_pb.prefix_lists:
-        name = prefixlist.prefix_list_uuid_name
-        for prefix in prefixlist.prefix:
-            le_ge = ""
-
-            if prefix.network != None:
-                if (prefix.less_or_equal_bits and
-                    prefix.network.prefix_length <= prefix.less_or_equal_bits):
-                    le_ge = " ".join([le_ge, "le", str(prefix.less_or_equal_bits)])
-
-                if (prefix.greater_or_equal_bits and
-                    prefix.greater_or_equal_bits >= prefix.network.prefix_length):
-                    le_ge = " ".join([le_ge, "ge", str(prefix.greater_or_equal_bits)])
-
-                network = IpPrefixMsg_to_str(prefix.network)
-                ip_cmd = get_ip_cmd(prefix.network.afi)
-                frr_cfg.prefix_lists.write(' '.join([
-                    ip_cmd, 'prefix-list', name, 'seq', str(prefix.seq_id),
-                    prefix.action, network, le_ge, '\n']))
-            else:
-                network = 'any'
-                if ADDR_TYPE == "ipv4":
-                    frr_cfg.prefix_lists.write(' '.join([
-                        'ip', 'prefix-list', name, 'seq', str(prefix.seq_id),
-                        prefix.action, network, '\n']))
-                else:
-                    frr_cfg.prefix_lists.write(' '.join([
-                        'ipv6', 'prefix-list', name, 'seq', str(prefix.seq_id),
-                        prefix.action, network, '\n']))
+    ip_cmd = 'ip' if ADDR_TYPE == 'ipv4' else 'ipv6'
+    write_chunked(frr_cfg.prefix_lists,
+                  frr_cfg.routing_pb.prefix_lists.lines(ip_cmd))
 
 # Helper class for Route-Maps configuration
 class RouteMapMatch:
@@ -520,8 +503,7 @@ def handle_match_prefix_list(frr_cfg, routemap, route_map_seq, ADDR_TYPE):
         # MATCH
         for prefix_list in route_map_seq.match.prefix_list:
             frr_cfg.route_maps.write(' '.join([
-                'match', 'ip', 'address', 'prefix-list',
-                prefix_list.prefix_list_uuid_name, '\n']))
+                'match', 'ip', 'address', 'prefix-list', prefix_list, '\n']))
         # SET
         handle_route_map_seq_set(frr_cfg, route_map_seq)
         frr_cfg.route_maps.write("! END of " + name + " - " + str(seq_id) + "\n")
@@ -534,8 +516,7 @@ def handle_match_prefix_list(frr_cfg, routemap, route_map_seq, ADDR_TYPE):
         # MATCH
         for prefix_list in route_map_seq.match.prefix_list:
             frr_cfg.route_maps.write(' '.join([
-                'match', 'ipv6', 'address', 'prefix-list',
-                prefix_list.prefix_list_uuid_name, '\n']))
+                'match', 'ipv6', 'address', 'prefix-list', prefix_list, '\n']))
         # SET
         handle_route_map_seq_set(frr_cfg, route_map_seq)
         frr_cfg.route_maps.write("! END of " + name + " - " + str(seq_id) + "\n")
@@ -711,7 +692,8 @@ def generate_ips(ADDR_TYPE, start_ip, no_of_ips):
                     first ip
     * `no_of_ips` : these many IPs will be generated
 
-    Limitation: It will generate IPs only for ip_mask 32
+    Limitation: It will generate IPs only for ip_mask 32, see
+    generate_prefixes() for other prefix lengths
 
     """
 
@@ -719,18 +701,23 @@ def generate_ips(ADDR_TYPE, start_ip, no_of_ips):
         start_ip = start_ip.split("/")[0]
 
     if ADDR_TYPE == 'ipv4':
-        start_ip = ipaddress.IPv4Address(unicode(start_ip))
+        address = ipaddress.IPv4Address
     else:
-        start_ip = ipaddress.IPv6Address(unicode(start_ip))
-    ipaddress_list = [start_ip]
-    next_ip = start_ip
-    count = 1
-    while count <= no_of_ips:
-        next_ip += 1
-        ipaddress_list.append(next_ip)
-        count += 1
+        address = ipaddress.IPv6Address
+    return [address(value) for value in prefix_ints(start_ip, no_of_ips + 1)]
 
-    return ipaddress_list
+def generate_prefixes(start_ip, no_of_ips, step=1):
+    """
+    Returns an iterator on the prefixes (strings like "10.0.20.1/32")
+    starting at start_ip, see lib/prefixgen.py
+
+    * `start_ip`  : first prefix, a prefix length (default: 32 or 128)
+                    gives the length of all the prefixes
+    * `no_of_ips` : these many prefixes will be generated after start_ip
+    * `step` : number of prefixes between two generated prefixes
+    """
+
+    return prefix_range(start_ip, no_of_ips + 1, step)
 
 def find_interface_with_greater_ip(ADDR_TYPE, topo, router):
     """
@@ -764,13 +751,17 @@ def find_interface_with_greater_ip(ADDR_TYPE, topo, router):
 
     return sorted(interfaces_list)[-1]
 
-def start_deamons_and_routers(tgen, CWD):
+@traced()
+def start_deamons_and_routers(tgen, CWD, topo=None):
     """
     It will create temporary folders and files to start 
     deamons and routers.
 
     * `tgen`  : topogen object
     * `CWD` : Caller's current working directory
+    * `topo` : json file data, when given and "startup_config" is enabled in
+      "pytest.ini" the deamons are started with the configuration rendered
+      from it (see topojson.build_startup_config_from_json())
     """
 
     router_list = tgen.routers()
@@ -803,6 +794,11 @@ def start_deamons_and_routers(tgen, CWD):
             #os.path.join(CWD, '{}/bgpd.conf'.format(rname))
         )
 
+    if topo is not None and tgen.is_startup_config_enabled():
+        # topojson imports this module
+        from lib.topojson import build_startup_config_from_json
+        build_startup_config_from_json(tgen, topo, CWD)
+
     # Starting routers, once deamons started
     logger.info("Starting all routers once topology is created")
     tgen.start_router()
@@ -824,6 +820,26 @@ def remove_temp_files(tgen, CWD):
         except IOError as (errno, strerror):
             logger.error("I/O error({0}): {1}".format(errno, strerror))
 
+def router_config_text(CWD, rname):
+    """
+    Returns the complete configuration of the router built by the
+    configuration APIs and saves it to its frr.conf file.
+
+    * `CWD`  : caller's current working directory
+    * `rname` : router name
+    """
+
+    text = StringIO.StringIO()
+    for f_name in ['bgp_json.conf', 'frr_json.conf']:
+        if os.path.exists('{}/{}/{}'.format(CWD, rname, f_name)):
+            with open('{}/{}/{}'.format(CWD, rname, f_name), 'r') as infile:
+                text.write(infile.read())
+    with open('{}/{}/frr.conf'.format(CWD, rname), 'w') as cfg:
+        cfg.write(text.getvalue())
+    return text.getvalue()
+
+@traced(track=lambda tgen, CWD, routerName: routerName)
+@instrument_api()
 def load_config_to_router(tgen, CWD, routerName):
     """
     This API is to create a delta of running config and user defined config,
@@ -834,6 +850,10 @@ def load_config_to_router(tgen, CWD, routerName):
     * `routerName` : router for which delta config should be generated and uploaded
     """
 
+    if deferred_loads is not None:
+        deferred_loads.add(routerName)
+        return True
+
     logger.info('Entering API: load_common_config_to_router')
 
     try:
@@ -841,84 +861,68 @@ def load_config_to_router(tgen, CWD, routerName):
         for rname, router in router_list.iteritems():
             if rname == routerName:
 
-                cfg = router.run("vtysh -c 'show running'")
-                fname = '{}/{}/frr.sav'.format(CWD, rname)
-                dname = '{}/{}/delta.conf'.format(CWD, rname)
-                f = open(fname, 'w')
-                for line in cfg.split('\n'):
-                    line = line.strip()
-
-                    if (line == 'Building configuration...' or
-                       line == 'Current configuration:' or
-                            not line):
-                       continue
-                    f.write(line)
-                    f.write('\n')
-
-                f.close()
-
                 try:
-                    filenames = ['bgp_json.conf', 'frr_json.conf']
-                    with open('{}/{}/frr.conf'.format(CWD, rname), 'w') as cfg:
-                        for f_name in filenames:
-                            if os.path.exists('{}/{}/{}'.format(CWD, rname, f_name)):
-                                with open('{}/{}/{}'.format(CWD, rname, f_name),
-                                          'r') as infile:
-                                    for line in infile:
-                                        cfg.write(line)
+                    target = StringIO.StringIO(router_config_text(CWD, rname))
                 except IOError as err:
                    logger.warning('Unable to open config File. error(%s): %s' %
                                   (err.errno, err.strerror))
                    return False
 
-                command = '/usr/lib/frr/frr-reload.py  --input {}/{}/frr.sav' \
-                          ' --test {}/{}/frr.conf > {}'.format(CWD, rname, CWD,
-                                                               rname, dname)
-                result = os.system(command)
-
-                # Assert if command fail
-                if result != 0:
-                    command_output = False
-                    assert command_output, ('Command:{} is failed due to '
-                                            'non-zero exit code'.format(
-                        command))
-
-                f = open(dname, 'r')
-                delta = StringIO.StringIO()
-                delta.write('configure terminal\n')
-                t_delta = f.read()
-                for line in t_delta.split('\n'):
-                    line = line.strip()
-                    if (line == 'Lines To Delete' or
-                        line == '===============' or
-                        line == 'Lines To Add' or
-                        line == '============' or
-                            not line):
-                        continue
-                    delta.write(line)
-                    delta.write('\n')
-
-                delta.write('end\n')
-                output = router.vtysh_multicmd(delta.getvalue())
-                #output = router.vtysh_multicmd(delta.getvalue(), pretty_output=False)
-                for out_err in error_list:
-                    if out_err in output:
-                        raise Exception('InvalidCliError: %s' % out_err)
+                # The in-process engine diffs against the last known running
+                # configuration, frr-reload.py always reads it.
+                engine = tgen.get_config_engine()
+                if engine == 'python':
+                    delta = frrconfig.config_delta(
+                        router.get_running_config_tree(),
+                        frrconfig.Config(target.getvalue()))
+                else:
+                    running = router.get_running_config(refresh=True)
+                    delta = topotest.get_config_deltas(
+                        {rname: (running, target.getvalue())},
+                        engine=engine, cache=tgen.get_config_cache())[rname]
+
+                dname = '{}/{}/delta.conf'.format(CWD, rname)
+                with open(dname, 'w') as dfile:
+                    dfile.write('\n'.join(delta) + '\n')
+
+                if len(delta) > cfgpush.THROUGHPUT_LINES:
+                    # Huge deltas: vtysh -f only reports the failures.
+                    result = router.vtysh_push(delta)
+                    logger.info('{}: pushed {} lines in {:.1f} seconds '
+                                '({:.0f} lines/s)'.format(
+                                    rname, result['lines'], result['seconds'],
+                                    result['rate']))
+                    for out_err in error_list:
+                        for lineno, command, message in result['errors']:
+                            if out_err in message:
+                                raise Exception('InvalidCliError: %s (line %s: %s)' %
+                                                (out_err, lineno, command))
+                    if not result['errors']:
+                        router.running_config = frrconfig.Config(
+                            target.getvalue())
+                elif delta:
+                    router.running_config = None
+                    output = router.vtysh_multicmd(
+                        'configure terminal\n{}\nend\n'.format('\n'.join(delta)))
+                    for out_err in error_list:
+                        if out_err in output:
+                            raise Exception('InvalidCliError: %s' % out_err)
+                    # Rejected commands: read the running configuration again
+                    # next time.
+                    if not any(line.startswith('%')
+                               for line in output.splitlines()):
+                        router.running_config = frrconfig.Config(
+                            target.getvalue())
+                target.close()
 
                 logger.info('New configuration for router {}:'.format(rname))
-                delta.close()
-                delta = StringIO.StringIO()
-                cfg = router.run("vtysh -c 'show running'")
-                for line in cfg.split('\n'):
-                    line = line.strip()
-                    delta.write(line)
-                    delta.write('\n')
 
                 # Router current configuration to log file or console if
-                # "show_router_config" is defined in "pytest.ini"
+                # "show_router_config" is defined in "pytest.ini". The
+                # configuration kept up to date by the push is logged, it is
+                # only read again when the push left it unknown.
                 if show_router_config:
-                    logger.info(delta.getvalue())
-                delta.close()
+                    logger.info(router.get_running_config())
     except Exception as e:
         logger.error(traceback.format_exc())
         return False
@@ -926,6 +930,119 @@ def load_config_to_router(tgen, CWD, routerName):
     logger.info('Exting API: load_common_config_to_router')
     return True
 
+
+def load_config_to_routers(tgen, CWD, routers):
+    """
+    Loads the configuration of several routers at once, each router
+    configuration is pushed by its own thread (see load_config_to_router()).
+    Returns `True` on success, otherwise an error message.
+
+    * `tgen` : Topogen object
+    * `CWD`  : caller's current working directory
+    * `routers` : list of router names
+    """
+
+    results = {}
+
+    def load(rname):
+        results[rname] = load_config_to_router(tgen, CWD, rname)
+
+    threads = []
+    for rname in sorted(routers):
+        thread = threading.Thread(target=load, args=(rname,),
+                                  name='load-config-{}'.format(rname))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    failed = [rname for rname in sorted(routers)
+              if results.get(rname) is not True]
+    if failed:
+        return 'Failed to load the configuration of: {}'.format(
+            ', '.join(failed))
+    return True
+
+
+def check_config_of_routers(CWD, routers):
+    """
+    Checks the configuration built for the routers with `vtysh -C`, without
+    the routers running (see lib/cfgcheck.py). Returns `True` when the
+    configurations are valid or vtysh can't be run, otherwise an error
+    message listing the invalid commands by router.
+
+    * `CWD`  : caller's current working directory
+    * `routers` : list of router names
+    """
+
+    configs = dict((rname, router_config_text(CWD, rname))
+                   for rname in routers)
+    try:
+        failures = cfgcheck.check_configs(configs)
+    except OSError as err:
+        logger.warning('Unable to check the configuration: {}'.format(err))
+        return True
+
+    if not failures:
+        return True
+    errors = []
+    for rname, lineno, command, message in failures:
+        if rname is None:
+            errors.append(message)
+        else:
+            errors.append('{} line {}: {}: {}'.format(
+                rname, lineno, command, message))
+    return 'InvalidCliError:\n{}'.format('\n'.join(errors))
+
+
+@contextmanager
+def deferred_config_load(tgen, CWD, push=True, check=None):
+    """
+    Defers the configuration loads: inside the context load_config_to_router()
+    only records the router, the configuration files are still written. When
+    the context exits, every recorded router configuration is pushed once,
+    all routers concurrently. Nested contexts are part of the outermost one.
+
+    * `tgen` : Topogen object
+    * `CWD`  : caller's current working directory
+    * `push` : `False` to only build the configuration files (the routers
+      are not running yet)
+    * `check` : check the configurations with `vtysh -C` before pushing
+      them, see check_config_of_routers(). Defaults to the `config_check`
+      option of `pytest.ini`.
+
+    Usage example:
+
+        with deferred_config_load(tgen, CWD):
+            create_common_configuration('ipv4', tgen, CWD, topo, 'r1')
+            create_bgp_configuration('ipv4', tgen, CWD, topo, 'r1')
+    """
+    # pylint: disable=W0603
+    global deferred_loads
+    if deferred_loads is not None:
+        yield
+        return
+
+    deferred_loads = set()
+    try:
+        yield
+        routers = deferred_loads
+    finally:
+        deferred_loads = None
+
+    if check is None:
+        check = tgen.is_config_check_enabled()
+    if check and routers:
+        result = check_config_of_routers(CWD, routers)
+        assert result is True, result
+
+    if not push:
+        return
+    logger.info('Loading the configuration of: {}'.format(
+        ', '.join(sorted(routers))))
+    result = load_config_to_routers(tgen, CWD, routers)
+    assert result is True, result
+
 #############################################
 # These APIs,  will used by testcase
 #############################################
@@ -1005,7 +1122,7 @@ def create_static_routes(ADDR_TYPE, input_dict, tgen, CWD, topo):
         global frr_cfg
         for router in input_dict.keys():
             if "static_routes" in input_dict[router]:
-                static_routes_list = []
+                static_routes_list = StaticRouteTable()
 
                 # Reset config for routers
                 frr_cfg[router].reset_it()
@@ -1036,21 +1153,11 @@ def create_static_routes(ADDR_TYPE, input_dict, tgen, CWD, topo):
 
                     next_hop = static_route["next_hop"]
 
-                    ip_list = generate_ips(ADDR_TYPE, network, no_of_ip)
-                    for ip in ip_list:
-                        ip = str(ipaddress.ip_network(unicode(ip)))
-                        if ADDR_TYPE == "ipv4":
-                            addr = Address(ADDR_TYPE_IPv4, ip, None)
-                            route = Route(addr)
-                            nh = Address(ADDR_TYPE_IPv4, next_hop, None)
-                        else:
-                            addr = Address(ADDR_TYPE_IPv6, None, ip)
-                            route = Route(addr)
-                            nh = Address(ADDR_TYPE_IPv6, None, next_hop)
-                        route.add_nexthop(nh, None, admin_distance, if_name, tag)
-
-                        static_routes_list.append(route)
-                        frr_cfg[router].routing_pb.static_route = static_routes_list
+                    ip_cmd = 'ip' if ADDR_TYPE == "ipv4" else 'ipv6'
+                    static_routes_list.extend(
+                        ip_cmd, generate_prefixes(network, no_of_ip), next_hop,
+                        admin_distance, if_name, tag)
+                    frr_cfg[router].routing_pb.static_route = static_routes_list
 
                 interfaces_cfg(frr_cfg[router])
                 static_rt_cfg(frr_cfg[router])
@@ -1065,6 +1172,7 @@ def create_static_routes(ADDR_TYPE, input_dict, tgen, CWD, topo):
 
     return True
 
+@instrument_api()
 def modify_admin_distance_for_static_routes(input_dict, CWD, tgen, topo):
     """
     Modify admin distance for given static route/s
@@ -1085,12 +1193,10 @@ def modify_admin_distance_for_static_routes(input_dict, CWD, tgen, topo):
                 next_hop = input_dict[router][static_route]['next_hop']
                 admin_distance = input_dict[router][static_route]['admin_distance']
 
-                for st in frr_cfg[router].routing_pb.static_route:
-                    st_ip_prefix = IpAddressMsg_to_str(st.prefix)
-                    for nh in st.nexthops:
-                        if st_ip_prefix == static_route and \
-                                IpAddressMsg_to_str(nh.ip) == next_hop:
-                            nh.admin_distance = admin_distance
+                static_routes = frr_cfg[router].routing_pb.static_route
+                for index in static_routes.find(prefix=static_route,
+                                                next_hop=next_hop):
+                    static_routes.set(index, 'admin_distance', admin_distance)
 
             interfaces_cfg(frr_cfg[router])
             static_rt_cfg(frr_cfg[router])
@@ -1106,6 +1212,7 @@ def modify_admin_distance_for_static_routes(input_dict, CWD, tgen, topo):
     logger.info("Exiting lib API: modify_admin_distance_for_static_routes")
     return True
 
+@instrument_api()
 def create_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Create ip prefix lists
@@ -1145,25 +1252,13 @@ def create_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
                             seqid = None
 
                         if network_addr != 'any':
-                            # IP from network, removing mask
-                            ip = network_addr.split("/")[0]
-                            mask = network_addr.split("/")[1]
+                            ip_cmd = 'ip' if ADDR_TYPE == 'ipv4' else 'ipv6'
                         else:
-                            ip = 'any'
-                            mask = None
+                            ip_cmd = None
 
-                        if ip != 'any':
-                            if ADDR_TYPE == 'ipv4':
-                                net = Network(ADDR_TYPE_IPv4, ip, None, int(mask))
-                            else:
-                                net = Network(ADDR_TYPE_IPv6, None, ip, int(mask))
-                        else:
-                            net = None
-
-                        pfx = Pfx(le, ge, action, net, seqid)
-                        pfx_l = PrefixList(prefix_list)
-                        pfx_l.add_pfx(pfx)
-                        frr_cfg[router].routing_pb.prefix_lists.append(pfx_l)
+                        frr_cfg[router].routing_pb.prefix_lists.add(
+                            prefix_list, seqid, action, ip_cmd, network_addr,
+                            le, ge)
 
                 interfaces_cfg(frr_cfg[router])
                 static_rt_cfg(frr_cfg[router])
@@ -1179,6 +1274,7 @@ def create_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: create_prefix_lists()")
     return True
 
+@instrument_api()
 def delete_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Delete ip prefix lists
@@ -1201,30 +1297,16 @@ def delete_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
                 # Reset config for routers
                 frr_cfg[router].reset_it()
 
-                seq_id = []
-                for pfx_l in frr_cfg[router].routing_pb.prefix_lists:
-                    for pfx in pfx_l.prefix:
-
-                        seq_id.append(pfx.seq_id)
-
-                prefix_lists = input_dict[router]["prefix_lists"]
-                for seqid in seq_id:
-                    found = False
-                    for pfx_list_name in prefix_lists:
-                        for pfx_l in frr_cfg[router].routing_pb.prefix_lists:
-                            if pfx_l.prefix_list_uuid_name == pfx_list_name:
-                                found = True
-                                for pfx in pfx_l.prefix:
-                                    if pfx.seq_id == seqid:
-                                        pfx_l.prefix.remove(pfx)
-                                        if len(pfx_l.prefix) == 0:
-                                            frr_cfg[router].routing_pb.prefix_lists.remove(pfx_l)
-            if not found:
-                errormsg = ("Prefix list {} not found in router {}".
-                            format(pfx_list_name, router))
-                return errormsg
+                prefix_lists = frr_cfg[router].routing_pb.prefix_lists
+                for pfx_list_name in input_dict[router]["prefix_lists"]:
+                    if pfx_list_name not in prefix_lists:
+                        errormsg = ("Prefix list {} not found in router {}".
+                                    format(pfx_list_name, router))
+                        return errormsg
+                    prefix_lists.remove(pfx_list_name)
 
                 interfaces_cfg(frr_cfg[router])
+                static_rt_cfg(frr_cfg[router])
                 prefixlist_cfg(frr_cfg[router], ADDR_TYPE)
                 frr_cfg[router].print_common_config_to_file(topo)
                 # Load config to router
@@ -1237,6 +1319,7 @@ def delete_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: delete_prefix_lists()")
     return True
 
+@instrument_api()
 def modify_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Modify prefix lists
@@ -1274,31 +1357,19 @@ def modify_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
                         seqid = None
 
                     if network_addr != 'any':
-                        # IP from network, removing mask
-                        ip = network_addr.split("/")[0]
-                        mask = network_addr.split("/")[1]
-                    else:
-                        ip = 'any'
-                        mask = None
-
-                    if ip != 'any':
-                        if ADDR_TYPE == 'ipv4':
-                            net = Network(ADDR_TYPE_IPv4, ip, None, int(mask))
-                        else:
-                            net = Network(ADDR_TYPE_IPv6, None, ip, int(mask))
+                        ip_cmd = 'ip' if ADDR_TYPE == 'ipv4' else 'ipv6'
                     else:
-                        net = None
-
-                    for pfx_l in frr_cfg[router].routing_pb.prefix_lists:
-                        if pfx_l.prefix_list_uuid_name == prefix_list:
-                            for pfx in pfx_l.prefix:
-                                if seqid != None:
-                                    if pfx.seq_id == seqid:
-                                        pfx.network = net
-                                        pfx.less_or_equal_bits = le
-                                        pfx.greater_or_equal_bits = ge
-                                        pfx.action = action
-                                        pfx.seqid = seqid
+                        ip_cmd = None
+
+                    prefix_lists = frr_cfg[router].routing_pb.prefix_lists
+                    if prefix_list in prefix_lists and seqid != None:
+                        entries = prefix_lists.get(prefix_list)
+                        for index in entries.find(seq=seqid):
+                            for field, value in (('action', action),
+                                                 ('ip_cmd', ip_cmd),
+                                                 ('network', network_addr),
+                                                 ('le', le), ('ge', ge)):
+                                entries.set(index, field, value)
 
             interfaces_cfg(frr_cfg[router])
             static_rt_cfg(frr_cfg[router])
@@ -1315,6 +1386,7 @@ def modify_prefix_lists(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: modify_prefix_lists()")
     return True
 
+@instrument_api()
 def create_route_maps(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Create route mapss
@@ -1400,13 +1472,10 @@ def create_route_maps(ADDR_TYPE, input_dict, tgen, CWD, topo):
                             for match_criteria in rmap_dict["match"].keys():
                                 if match_criteria == 'prefix_list':
                                     pfx_list = rmap_dict["match"][match_criteria]
-                                    for prefix_list in frr_cfg[router].routing_pb.\
+                                    if pfx_list in frr_cfg[router].routing_pb.\
                                             prefix_lists:
-                                        prefix_lists = []
-                                        if prefix_list.prefix_list_uuid_name == pfx_list:
-                                            prefix_lists.append(prefix_list)
-                                            match.prefix_list = prefix_lists
-                                            rmap.add_seq(match, rmap_action, set_criteria)
+                                        match.prefix_list = [pfx_list]
+                                        rmap.add_seq(match, rmap_action, set_criteria)
                                 elif match_criteria == 'community-list':
 				    community_lists = []
                                     communities = rmap_dict["match"][match_criteria]
@@ -1444,6 +1513,7 @@ def create_route_maps(ADDR_TYPE, input_dict, tgen, CWD, topo):
     logger.info("Exiting lib API: create_route_maps()")
     return True
 
+@instrument_api()
 def delete_route_maps(ADDR_TYPE, input_dict, tgen, CWD, topo):
     """
     Delete ip route maps
@@ -1493,6 +1563,7 @@ def delete_route_maps(ADDR_TYPE, input_dict, tgen, CWD, topo):
 #############################################
 ## Verification APIs
 #############################################
+@instrument_api()
 def verify_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol = None):
     """
     This API is to verify RIB  BGP routes.
@@ -1547,9 +1618,7 @@ def verify_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol = Non
                         no_of_ip = 0
 
                     # Generating IPs for verification
-                    ip_list = generate_ips(ADDR_TYPE, network, no_of_ip)
-                    for st_rt in ip_list:
-                        st_rt = str(ipaddress.ip_network(unicode(st_rt)))
+                    for st_rt in generate_prefixes(network, no_of_ip):
 
                         st_found = False
                         nh_found = False
@@ -1593,9 +1662,7 @@ def verify_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol = Non
                         no_of_network = 0
 
                     # Generating IPs for verification
-                    ip_list = generate_ips(ADDR_TYPE, start_ip, no_of_network)
-                    for st_rt in ip_list:
-                        st_rt = str(ipaddress.ip_network(unicode(st_rt)))
+                    for st_rt in generate_prefixes(start_ip, no_of_network):
 
                         found = False
                         if st_rt in rib_routes_json:
@@ -1615,6 +1682,7 @@ def verify_rib(ADDR_TYPE, dut, tgen, input_dict, next_hop = None, protocol = Non
     logger.info("Exiting lib API: verify_rib()")
     return True
 
+@instrument_api()
 def verify_admin_distance_for_static_routes(input_dict, tgen):
     """
     This API is to verify admin distance for static routes.
@@ -1666,6 +1734,7 @@ def verify_admin_distance_for_static_routes(input_dict, tgen):
     logger.info("Exiting lib API: verify_admin_distance_for_static_routes()")
     return True
 
+@instrument_api()
 def verify_prefix_lists(ADDR_TYPE, input_dict, tgen):
     """
     This API is to verify prefix lists.
@@ -1701,6 +1770,7 @@ def verify_prefix_lists(ADDR_TYPE, input_dict, tgen):
     return True
 
 
+@instrument_api()
 def verify_route_maps(ADDR_TYPE, input_dict, tgen):
     """
     This API is to verify route maps.
@@ -1736,6 +1806,7 @@ def verify_route_maps(ADDR_TYPE, input_dict, tgen):
     return True
 
 
+@instrument_api()
 def stop_router(tgen, CWD, router):
     """
     Router's current config would be saved to /etc/frr/ for each deamon
@@ -1759,6 +1830,7 @@ def stop_router(tgen, CWD, router):
 
     logger.info("Exiting lib API: stop_router()")
 
+@instrument_api()
 def send_SigTerm(tgen, CWD, router):
     """
     Router's current config would be saved to /etc/frr/ for each deamon
@@ -1783,6 +1855,7 @@ def send_SigTerm(tgen, CWD, router):
     logger.info("Exiting lib API: send_SigTerm()")
 
  
+@instrument_api()
 def start_router(tgen, CWD, router):
     """
     Router will started and config would be loaded from /etc/frr/ for each
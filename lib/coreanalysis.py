@@ -0,0 +1,279 @@
+#
+# coreanalysis.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Background core dump analysis.
+
+Core dumps found when the routers stop are analysed by gdb in a process
+pool, out of the topology teardown path:
+
+* every core gets a quick backtrace, gdb symbol indexes are kept in a cache
+  directory (gdb `index-cache`) so each binary is only indexed once
+* crashes are grouped by their stack signature (daemon and top functions)
+* only one core of each crash gets the full analysis (all threads with
+  their local variables)
+
+Submitted cores are hard linked (or copied) in a directory of the session,
+so they survive the routers restarts removing the old core files, until the
+full analysis is done. Cores whose backtrace has no function (gdb missing
+or failing) can't be grouped, each of them is a crash of its own.
+
+The report, showing each crash once with the number of times it was seen,
+is printed at the end of the test session.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import multiprocessing
+
+from lib.topolog import logger
+
+# gdb symbol index cache, shared by all test sessions
+INDEX_CACHE_DIR = '/tmp/topotests/gdb-index-cache'
+
+# Maximum number of gdb processes
+MAX_PROCESSES = 4
+
+# Number of frames identifying a crash
+SIGNATURE_FRAMES = 8
+
+# Seconds the crash reports wait for a core backtrace
+BACKTRACE_TIMEOUT = 10
+
+STACK_FRAME = re.compile(r'^#\d+\s+(?:0x[0-9a-fA-F]+ in )?(\S+) \(')
+SIGNAL_FRAME = '<signal handler called>'
+
+# Crash handling functions ignored in the signatures
+IGNORED_FUNCTIONS = set([
+    'raise', '__GI_raise', 'abort', '__GI_abort', '__assert_fail',
+    '__assert_fail_base', '_zlog_assert_failed', 'zlog_backtrace',
+    'zlog_backtrace_sigsafe', 'core_handler',
+])
+
+
+def gdb_command(binary, corefile, commands):
+    "Returns the gdb command line running `commands` on `corefile`."
+    args = ['gdb', '-nx', '--batch',
+            '-iex', 'set index-cache on',
+            '-iex', 'set index-cache directory {}'.format(INDEX_CACHE_DIR)]
+    for command in commands:
+        args += ['-ex', command]
+    return args + [binary, corefile]
+
+
+def run_gdb(args):
+    "Runs gdb and returns its output (pool worker)."
+    try:
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                    stderr=devnull)
+            output = proc.communicate()[0]
+    except OSError as err:
+        return 'failed to run gdb: {}'.format(err)
+    if not isinstance(output, str):
+        output = output.decode('utf-8', 'replace')
+    return output
+
+
+def stack_functions(backtrace):
+    """
+    Returns the function names of the `backtrace` frames, without the crash
+    handling frames.
+    """
+    functions = []
+    for line in backtrace.splitlines():
+        if SIGNAL_FRAME in line:
+            # Frames above the signal handler are the crash handling code.
+            functions = []
+            continue
+        match = STACK_FRAME.match(line)
+        if match and match.group(1) not in IGNORED_FUNCTIONS:
+            functions.append(match.group(1))
+    return functions
+
+
+def stack_signature(daemon, backtrace):
+    """
+    Returns the signature identifying the crash of `backtrace` or `None`
+    when the backtrace has no function to identify it.
+    """
+    functions = stack_functions(backtrace)[:SIGNATURE_FRAMES]
+    if not functions:
+        return None
+    digest = hashlib.sha1('|'.join(functions).encode('utf-8')).hexdigest()
+    return '{}-{}'.format(daemon, digest[:12])
+
+
+class CoreAnalyzer(object):
+    "Analyses core dumps in a background process pool."
+
+    def __init__(self, processes=None):
+        self.processes = processes or min(MAX_PROCESSES,
+                                          multiprocessing.cpu_count())
+        self.pool = None
+        self.cores = []
+        self.directory = None
+
+    def _keep(self, router, corefile):
+        """
+        Returns the path of the `corefile` copy kept in the session directory
+        until the analysis is done.
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='topotests-cores-')
+        path = os.path.join(self.directory, '{}-{}-{}'.format(
+            len(self.cores), router, os.path.basename(corefile)))
+        try:
+            os.link(corefile, path)
+        except OSError:
+            shutil.copy2(corefile, path)
+        return path
+
+    def _get_pool(self):
+        if self.pool is None:
+            if not os.path.isdir(INDEX_CACHE_DIR):
+                os.makedirs(INDEX_CACHE_DIR)
+            self.pool = multiprocessing.Pool(self.processes)
+        return self.pool
+
+    def _find(self, corefile):
+        for core in self.cores:
+            if core['corefile'] == corefile:
+                return core
+        return None
+
+    def submit(self, router, daemon, binary, corefile):
+        "Schedules the analysis of the `daemon` `corefile` of `router`."
+        if self._find(corefile) is not None:
+            return
+        logger.info('{}: scheduling {} core analysis: {}'.format(
+            router, daemon, corefile))
+        try:
+            kept = self._keep(router, corefile)
+        except (IOError, OSError) as err:
+            logger.warning('unable to keep core file {}: {}'.format(
+                corefile, err))
+            kept = corefile
+        args = gdb_command(binary, kept, ['bt'])
+        self.cores.append({
+            'router': router,
+            'daemon': daemon,
+            'binary': binary,
+            'corefile': corefile,
+            'kept': kept,
+            'result': self._get_pool().apply_async(run_gdb, (args,)),
+        })
+
+    def backtrace(self, corefile, timeout=BACKTRACE_TIMEOUT):
+        """
+        Returns the backtrace of the submitted `corefile`, waiting at most
+        `timeout` seconds for it, or `None` if it isn't available yet (it is
+        then only part of the session report).
+        """
+        core = self._find(corefile)
+        if core is None:
+            return None
+        try:
+            return core['result'].get(timeout)
+        except multiprocessing.TimeoutError:
+            return None
+
+    def analyse(self):
+        """
+        Waits for the backtraces, groups the crashes by signature and runs
+        the full analysis of one core per crash. Returns the list of crashes
+        (dictionaries with the keys 'signature', 'daemon', 'binary',
+        'backtrace', 'analysis' and 'cores', the list of (router, core file,
+        kept core file) tuples).
+        """
+        if not self.cores:
+            return []
+
+        crashes = {}
+        for index, core in enumerate(self.cores):
+            backtrace = core['result'].get()
+            signature = stack_signature(core['daemon'], backtrace)
+            if signature is None:
+                signature = '{}-unidentified-{}'.format(core['daemon'], index)
+            if signature not in crashes:
+                crashes[signature] = {
+                    'signature': signature,
+                    'daemon': core['daemon'],
+                    'binary': core['binary'],
+                    'backtrace': backtrace,
+                    'cores': [],
+                }
+            crashes[signature]['cores'].append(
+                (core['router'], core['corefile'], core['kept']))
+        self.cores = []
+
+        pool = self._get_pool()
+        for crash in crashes.values():
+            kept = crash['cores'][0][2]
+            args = gdb_command(crash['binary'], kept,
+                               ['info sharedlibrary',
+                                'thread apply all bt full'])
+            crash['result'] = pool.apply_async(run_gdb, (args,))
+        for crash in crashes.values():
+            crash['analysis'] = crash.pop('result').get()
+
+        pool.close()
+        pool.join()
+        self.pool = None
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+        return sorted(crashes.values(), key=lambda crash: -len(crash['cores']))
+
+    def report(self):
+        "Returns the analysis report or an empty string if no core was found."
+        crashes = self.analyse()
+        if not crashes:
+            return ''
+
+        total = sum(len(crash['cores']) for crash in crashes)
+        lines = ['{} core dumps, {} distinct crashes'.format(total, len(crashes))]
+        for crash in crashes:
+            lines.append('')
+            lines.append('== {} crash {}: seen {} times =='.format(
+                crash['daemon'], crash['signature'], len(crash['cores'])))
+            for router, corefile, _ in crash['cores']:
+                lines.append('  {}: {}'.format(router, corefile))
+            lines.append(crash['analysis'])
+        return '\n'.join(lines)
+
+
+# The analyzer of the test session
+analyzer = None
+
+
+def get_analyzer():
+    "Returns the session core analyzer."
+    # pylint: disable=W0603
+    global analyzer
+    if analyzer is None:
+        analyzer = CoreAnalyzer()
+    return analyzer
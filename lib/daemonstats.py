@@ -0,0 +1,234 @@
+#
+# daemonstats.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+"""
+Daemon CPU/RSS time-series sampler.
+
+A background thread periodically reads `/proc/<pid>/stat` and
+`/proc/<pid>/status` of every registered daemon and records its CPU time,
+resident memory and thread count. The routers only have their own network
+and mount namespaces, so the daemons pids (read from the router pidfiles,
+see Router.get_daemon_pids()) are valid in the test process.
+
+The samples of a test module are saved as CSV with the columns:
+time, router, daemon, pid, cpu (seconds), rss (kB), threads
+
+Usage example:
+
+    sampler = DaemonSampler(interval=0.5)
+    sampler.register('r1', router.get_daemon_pids())
+    sampler.start()
+    ...
+    sampler.stop()
+    sampler.write('/tmp/topotests/module/daemonstats.csv')
+"""
+
+import os
+import time
+import threading
+
+CSV_HEADER = 'time,router,daemon,pid,cpu,rss,threads'
+
+# Minimum number of samples needed to report a monotonic RSS growth
+GROWTH_MIN_SAMPLES = 5
+
+try:
+    CLOCK_TICKS = float(os.sysconf('SC_CLK_TCK'))
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100.0
+
+
+def parse_proc_stat(text):
+    """
+    Returns the (cpu seconds, threads) tuple from a `/proc/<pid>/stat`
+    content.
+    """
+    # The command name may contain spaces and parenthesis: the fields we
+    # want come after its last closing parenthesis.
+    fields = text.rsplit(')', 1)[1].split()
+    # fields[0] is field 3 (state) of proc(5)
+    utime = int(fields[11])
+    stime = int(fields[12])
+    threads = int(fields[17])
+    return (utime + stime) / CLOCK_TICKS, threads
+
+
+def parse_proc_status(text):
+    """
+    Returns the (rss kB, threads) tuple from a `/proc/<pid>/status` content.
+    Kernel threads have no resident memory.
+    """
+    rss = 0
+    threads = None
+    for line in text.splitlines():
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1])
+        elif line.startswith('Threads:'):
+            threads = int(line.split()[1])
+    return rss, threads
+
+
+def read_pid(pid):
+    """
+    Returns the (cpu seconds, rss kB, threads) tuple of process `pid` or
+    `None` if it doesn't exist anymore.
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid), 'r') as statfile:
+            cpu, threads = parse_proc_stat(statfile.read())
+        with open('/proc/{}/status'.format(pid), 'r') as statusfile:
+            rss, status_threads = parse_proc_status(statusfile.read())
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return cpu, rss, status_threads or threads
+
+
+def rss_growth(series, min_samples=GROWTH_MIN_SAMPLES):
+    """
+    Returns the RSS growth (in kB) of the `series` samples list when it
+    never decreased and grew, otherwise `None`.
+    """
+    if len(series) < min_samples:
+        return None
+    rss = [sample[5] for sample in series]
+    for previous, current in zip(rss, rss[1:]):
+        if current < previous:
+            return None
+    if rss[-1] <= rss[0]:
+        return None
+    return rss[-1] - rss[0]
+
+
+class DaemonSampler(object):
+    "Samples the registered daemons from a background thread."
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.pids = {}
+        self.samples = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def register(self, router, pids):
+        """
+        Samples the daemons of `router`, `pids` is a dictionary of daemon
+        name to pid. Replaces the daemons previously registered for `router`.
+        """
+        with self.lock:
+            self.pids = dict(((rname, daemon), pid)
+                             for (rname, daemon), pid in self.pids.items()
+                             if rname != router)
+            for daemon, pid in pids.items():
+                self.pids[(router, daemon)] = pid
+
+    def unregister(self, router):
+        "Stops sampling the daemons of `router`."
+        self.register(router, {})
+
+    def sample(self):
+        "Samples all registered daemons once."
+        now = time.time()
+        with self.lock:
+            pids = sorted(self.pids.items())
+
+        samples = []
+        for (router, daemon), pid in pids:
+            values = read_pid(pid)
+            if values is None:
+                continue
+            samples.append((now, router, daemon, pid) + values)
+
+        with self.lock:
+            self.samples.extend(samples)
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.sample()
+            self.stopping.wait(self.interval)
+
+    def start(self):
+        "Starts sampling."
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run,
+                                       name='topotest-daemonstats')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        "Stops sampling."
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def series(self):
+        "Returns a dictionary of (router, daemon, pid) to its samples list."
+        result = {}
+        with self.lock:
+            for sample in self.samples:
+                result.setdefault(sample[1:4], []).append(sample)
+        return result
+
+    def growing(self, min_samples=GROWTH_MIN_SAMPLES):
+        """
+        Returns the list of (router, daemon, pid, growth kB) of the daemons
+        whose RSS grew monotonically.
+        """
+        result = []
+        for key, series in sorted(self.series().items()):
+            growth = rss_growth(series, min_samples)
+            if growth is not None:
+                result.append(key + (growth,))
+        return result
+
+    def summary(self):
+        """
+        Returns a table with the CPU time, peak CPU usage and RSS of every
+        sampled daemon.
+        """
+        lines = ['{:<12} {:<8} {:>7} {:>8} {:>8} {:>10} {:>10} {:>8}'.format(
+            'router', 'daemon', 'samples', 'cpu(s)', 'peak%', 'rss(kB)',
+            'maxrss', 'threads')]
+        for (router, daemon, _), series in sorted(self.series().items()):
+            peak = 0.0
+            for previous, current in zip(series, series[1:]):
+                elapsed = current[0] - previous[0]
+                if elapsed > 0:
+                    peak = max(peak, (current[4] - previous[4]) / elapsed * 100)
+            lines.append(
+                '{:<12} {:<8} {:>7} {:>8.2f} {:>8.1f} {:>10} {:>10} {:>8}'.format(
+                    router, daemon, len(series), series[-1][4] - series[0][4],
+                    peak, series[-1][5], max(sample[5] for sample in series),
+                    series[-1][6]))
+        return '\n'.join(lines)
+
+    def write(self, path):
+        "Saves the samples as CSV in `path`."
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with self.lock:
+            samples = list(self.samples)
+        with open(path, 'w') as csvfile:
+            csvfile.write(CSV_HEADER + '\n')
+            for sample in samples:
+                csvfile.write('{:.3f},{},{},{},{:.2f},{},{}\n'.format(*sample))
@@ -0,0 +1,343 @@
+#
+# frrconfig.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+In-process FRR configuration parser and differ.
+
+Computes the vtysh commands turning a configuration into another one, like
+`frr-reload.py --test` does, without starting a new interpreter for every
+change. The configuration text is split in contexts the same way
+frr-reload.py does it:
+
+* lines starting with a context keyword ('router ', 'interface ',
+  'route-map '...) open a context, the following lines belong to it
+* 'address-family ', 'vni '... open a sub-context inside a context until
+  their 'exit-*' line
+* after a column 0 '!' line, lines starting with a one line keyword ('ip ',
+  'bgp ', 'hostname '...) are contexts by themselves
+
+Indentation is not needed, so both `show running-config` outputs and the
+configuration files built by the test library can be parsed. When present
+it is used: indented '!' lines (between the BGP address families) don't
+close the context and indented lines stay in the open context.
+
+Usage example:
+
+    delta = config_delta(Config(running), Config(target))
+    router.vtysh_multicmd('configure terminal\\n{}\\nend\\n'.format(
+        '\\n'.join(delta)))
+"""
+
+from collections import OrderedDict
+
+# Lines opening a context
+CONTEXT_KEYWORDS = (
+    'router ', 'interface ', 'vrf ', 'route-map ', 'key chain ', 'line vty',
+    'pseudowire ', 'mpls ldp', 'l2vpn ', 'rpki', 'nexthop-group ', 'bfd',
+    'segment-routing', 'ip vrf ',
+)
+
+# Lines opening a sub-context inside a context
+SUB_CONTEXT_KEYWORDS = (
+    'address-family ', 'vni ', 'vrf-policy ', 'vnc defaults',
+    'vnc nve-group ', 'vnc l2-group ', 'link-params',
+)
+
+# Lines closing a sub-context, by the sub-context first word
+SUB_CONTEXT_EXIT = {
+    'address-family': 'exit-address-family',
+    'vni': 'exit-vni',
+    'vrf-policy': 'exit-vrf-policy',
+    'vnc': 'exit-vnc',
+    'link-params': 'exit-link-params',
+}
+SUB_CONTEXT_EXITS = tuple(SUB_CONTEXT_EXIT.values())
+
+# Lines closing a context
+CONTEXT_EXITS = ('exit', 'exit-vrf', 'end')
+
+# Lines that are a context by themselves (after a '!' line)
+ONELINE_KEYWORDS = (
+    'access-list ', 'agentx', 'bgp ', 'debug ', 'dump ', 'enable ', 'frr ',
+    'hostname ', 'ip ', 'ipv6 ', 'log ', 'mpls lsp', 'mpls label', 'no ',
+    'password ', 'ptm-enable', 'router-id ', 'service ', 'table ',
+    'username ', 'zebra ', 'allow-external-route-update', 'fpm ',
+)
+
+# Lines ignored when parsing (`show running-config` banner and version)
+IGNORED_LINES = ('Building configuration...', 'Current configuration:')
+IGNORED_PREFIXES = ('frr version ', 'frr defaults ')
+
+# Contexts that can't be removed
+PERMANENT_CONTEXTS = ('line vty',)
+
+# Lines never added nor removed, like frr-reload.py
+# ignore_unconfigurable_lines() does (vtysh.conf lines echoed by `show
+# running-config`, passwords)
+UNCONFIGURABLE_PREFIXES = (
+    'service integrated-vtysh-config', 'no service integrated-vtysh-config',
+    'password ', 'username ',
+)
+
+# Daemons of the contexts, by context line prefix (first match wins).
+# 'static' contexts go to staticd when it runs, otherwise to zebra, and
+# `None` contexts go to every daemon.
+DAEMON_CONTEXTS = (
+    ('router bgp', 'bgpd'), ('bgp ', 'bgpd'), ('ip community-list', 'bgpd'),
+    ('ip extcommunity-list', 'bgpd'), ('ip large-community-list', 'bgpd'),
+    ('ip as-path', 'bgpd'), ('debug bgp', 'bgpd'),
+    ('router ospf6', 'ospf6d'), ('router ospf', 'ospfd'),
+    ('router ripng', 'ripngd'), ('router rip', 'ripd'),
+    ('router isis', 'isisd'), ('router eigrp', 'eigrpd'),
+    ('mpls ldp', 'ldpd'), ('l2vpn ', 'ldpd'),
+    ('ip route ', 'static'), ('ipv6 route ', 'static'),
+    ('hostname ', None), ('password ', None), ('enable ', None),
+    ('log ', None), ('service ', None), ('line vty', None),
+    ('route-map ', None), ('ip prefix-list ', None),
+    ('ipv6 prefix-list ', None), ('access-list ', None),
+    ('ip access-list ', None), ('ipv6 access-list ', None),
+)
+
+
+class Config(object):
+    """
+    Configuration split in contexts: an ordered dictionary of context keys
+    (a tuple with the context line and optionally the sub-context line) to
+    the list of lines in the context. One line contexts have no lines.
+    """
+
+    def __init__(self, text=''):
+        self.contexts = OrderedDict()
+        self.load(text)
+
+    def _add_context(self, keys):
+        if keys not in self.contexts:
+            self.contexts[keys] = []
+
+    def _add_line(self, keys, line):
+        lines = self.contexts[keys]
+        if line not in lines:
+            lines.append(line)
+
+    def load(self, text):
+        "Parses the configuration `text` and adds it to the contexts."
+        context = None
+        sub_context = None
+        new_context = True
+        for line in text.splitlines():
+            indented = line[:1].isspace()
+            line = line.strip()
+            if (not line or line in IGNORED_LINES or
+                    line.startswith(IGNORED_PREFIXES)):
+                continue
+
+            if line.startswith('!') or line.startswith('#'):
+                if not indented or context is None:
+                    new_context = True
+                continue
+
+            if line in SUB_CONTEXT_EXITS:
+                sub_context = None
+                continue
+
+            if line in CONTEXT_EXITS:
+                context = None
+                sub_context = None
+                new_context = True
+                continue
+
+            # ldpd has 'interface' lines inside its address families.
+            if (line.startswith(CONTEXT_KEYWORDS) and
+                    not (context == 'mpls ldp' and sub_context is not None)):
+                context = line
+                sub_context = None
+                new_context = False
+                self._add_context((context,))
+                continue
+
+            if (line.startswith(ONELINE_KEYWORDS) and
+                    (context is None or (new_context and not indented)) and
+                    not (context == 'mpls ldp' and line.startswith('router-id '))):
+                context = None
+                sub_context = None
+                self._add_context((line,))
+                continue
+
+            if context is None:
+                # Unknown top level line
+                self._add_context((line,))
+                continue
+
+            if line.startswith(SUB_CONTEXT_KEYWORDS):
+                sub_context = line
+                self._add_context((context, sub_context))
+                continue
+
+            if sub_context is not None:
+                self._add_line((context, sub_context), line)
+            else:
+                self._add_line((context,), line)
+
+    def _render(self, keyword=None):
+        "Returns the text of the contexts whose line starts with `keyword`."
+        lines = []
+        previous = None
+        for keys, klines in self.contexts.items():
+            if keyword is not None and not keys[0].startswith(keyword):
+                continue
+            if len(keys) == 1:
+                if previous is not None:
+                    lines.append('!')
+                lines.append(keys[0])
+                lines.extend(' {}'.format(line) for line in klines)
+            else:
+                if previous != keys[0]:
+                    if previous is not None:
+                        lines.append('!')
+                    lines.append(keys[0])
+                lines.append(' {}'.format(keys[1]))
+                lines.extend('  {}'.format(line) for line in klines)
+                lines.append(' {}'.format(SUB_CONTEXT_EXIT[keys[1].split()[0]]))
+            previous = keys[0]
+        if not lines:
+            return ''
+        return '\n'.join(lines + ['!']) + '\n'
+
+    def section(self, keyword):
+        """
+        Returns the text of the contexts whose first line starts with
+        `keyword` (e.g. 'router bgp', 'interface r1-eth0').
+        """
+        return self._render(keyword)
+
+    def text(self):
+        "Returns the configuration text."
+        return self._render()
+
+    def __eq__(self, other):
+        return (isinstance(other, Config) and
+                list(self.contexts.items()) == list(other.contexts.items()))
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def daemon_configs(config, daemons):
+    """
+    Splits the `config` Config in startup configurations of the `daemons`
+    (list of daemon names). Returns a dictionary of daemon name to its
+    configuration text. Contexts without a known daemon go to zebra.
+    """
+    configs = dict((daemon, Config()) for daemon in daemons)
+    for keys, lines in config.contexts.items():
+        owner = 'zebra'
+        for prefix, daemon in DAEMON_CONTEXTS:
+            if keys[0].startswith(prefix):
+                owner = daemon
+                break
+        if owner == 'static':
+            owner = 'staticd' if 'staticd' in configs else 'zebra'
+
+        for daemon in daemons if owner is None else [owner]:
+            if daemon in configs:
+                configs[daemon].contexts[keys] = list(lines)
+    return dict((daemon, dconfig.text())
+                for daemon, dconfig in configs.items())
+
+
+def negate(line):
+    "Returns the command removing `line`."
+    if line.startswith('no '):
+        return line[3:]
+    return 'no {}'.format(line)
+
+
+def _neighbor(line):
+    "Returns the neighbor of a 'neighbor X remote-as' line or `None`."
+    fields = line.split()
+    if len(fields) >= 3 and fields[0] == 'neighbor' and fields[2] == 'remote-as':
+        return fields[1]
+    return None
+
+
+def config_delta(current, target):
+    """
+    Returns the list of commands (to run in the configuration mode) that
+    turn the `current` Config into the `target` one: lines to delete first,
+    then lines to add. Context lines are repeated before their lines.
+    """
+    deletes = []
+    adds = []
+    deleted_contexts = set()
+    deleted_neighbors = {}
+
+    # Contexts and neighbors removed as a whole make their lines go away.
+    for keys in current.contexts:
+        if len(keys) == 1 and keys not in target.contexts:
+            deleted_contexts.add(keys[0])
+    for keys, lines in current.contexts.items():
+        if keys not in target.contexts or keys[0] in deleted_contexts:
+            continue
+        tlines = target.contexts[keys]
+        for line in lines:
+            neighbor = _neighbor(line)
+            if neighbor is not None and line not in tlines:
+                deleted_neighbors.setdefault(keys[0], set()).add(neighbor)
+
+    def neighbor_gone(context, line):
+        fields = line.split()
+        return (len(fields) > 1 and fields[0] == 'neighbor' and
+                _neighbor(line) is None and
+                fields[1] in deleted_neighbors.get(context, ()))
+
+    for keys, lines in current.contexts.items():
+        if keys[0].startswith(UNCONFIGURABLE_PREFIXES):
+            continue
+        if len(keys) == 1 and keys[0] in deleted_contexts:
+            if keys[0] in PERMANENT_CONTEXTS:
+                continue
+            deletes.append(negate(keys[0]))
+            continue
+        if keys[0] in deleted_contexts:
+            continue
+
+        tlines = target.contexts.get(keys, [])
+        removed = [line for line in lines if line not in tlines and
+                   not neighbor_gone(keys[0], line)]
+        if removed:
+            deletes.extend(keys)
+            deletes.extend(negate(line) for line in removed)
+
+    for keys, lines in target.contexts.items():
+        if keys[0].startswith(UNCONFIGURABLE_PREFIXES):
+            continue
+        clines = current.contexts.get(keys, [])
+        added = [line for line in lines if line not in clines]
+        if keys not in current.contexts:
+            adds.extend(keys)
+            adds.extend(added)
+            continue
+        if added:
+            adds.extend(keys)
+            adds.extend(added)
+
+    return deletes + adds
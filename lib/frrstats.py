@@ -0,0 +1,186 @@
+#
+# frrstats.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+FRR daemons thread CPU and memory statistics.
+
+Parses the `show thread cpu` and `show memory` outputs of all daemons (as
+printed by vtysh when no daemon is selected) into dictionaries and computes
+their deltas, so the event handlers that consumed CPU and the memory types
+that grew during a test can be found.
+
+Statistics format, per daemon:
+
+    {
+        'cpu': {'<pthread>/<handler>': {'runtime': <ms>, 'invoked': <n>}},
+        'memory': {'<group>/<type>': <allocations>},
+    }
+"""
+
+import re
+
+STATS_COMMAND = 'vtysh -c "show thread cpu" -c "show memory" 2>/dev/null'
+
+THREAD_HEADER = re.compile(r'^Thread statistics for (\S+):')
+MEMORY_HEADER = re.compile(r'^Memory statistics for (\S+):')
+PTHREAD_HEADER = re.compile(r'^Showing statistics for pthread (.+?)\s*$')
+MEMORY_GROUP = re.compile(r'^--- qmem (.+?) ---')
+MEMORY_TYPE = re.compile(r'^(\S.*?)\s*:\s+(\d+)(?:\s|$)')
+
+# Characters of the `show thread cpu` type column
+THREAD_TYPES = set('RWTEX')
+
+DEFAULT_PTHREAD = 'main'
+
+
+def _parse_thread_line(line):
+    """
+    Returns the (handler, runtime ms, invoked) tuple of a `show thread cpu`
+    handler line or `None` if the line is something else.
+    """
+    tokens = line.split()
+    if len(tokens) < 4:
+        return None
+    handler = tokens[-1]
+    end = len(tokens) - 1
+    while end > 0 and set(tokens[end - 1]) <= THREAD_TYPES:
+        end -= 1
+    numbers = tokens[:end]
+
+    # Runtime is the only decimal column, it may follow the 'Active' one.
+    for position, token in enumerate(numbers):
+        if '.' in token:
+            break
+    else:
+        return None
+    if position + 1 >= len(numbers):
+        return None
+    try:
+        runtime = float(numbers[position])
+        invoked = int(numbers[position + 1])
+        for token in numbers:
+            float(token)
+    except ValueError:
+        return None
+    return handler, runtime, invoked
+
+
+def parse_stats(output):
+    """
+    Parses the `show thread cpu` and `show memory` output of all daemons and
+    returns a dictionary of daemon name to its statistics.
+    """
+    stats = {}
+    daemon = None
+    section = None
+    pthread = DEFAULT_PTHREAD
+    group = None
+    for line in output.splitlines():
+        match = THREAD_HEADER.match(line)
+        if match:
+            daemon, section, pthread = match.group(1), 'cpu', DEFAULT_PTHREAD
+            stats.setdefault(daemon, {'cpu': {}, 'memory': {}})
+            continue
+        match = MEMORY_HEADER.match(line)
+        if match:
+            daemon, section, group = match.group(1), 'memory', None
+            stats.setdefault(daemon, {'cpu': {}, 'memory': {}})
+            continue
+        if daemon is None:
+            continue
+
+        if section == 'cpu':
+            match = PTHREAD_HEADER.match(line)
+            if match:
+                pthread = match.group(1)
+                continue
+            parsed = _parse_thread_line(line)
+            if parsed is None or parsed[0] == 'TOTAL':
+                continue
+            key = '{}/{}'.format(pthread, parsed[0])
+            stats[daemon]['cpu'][key] = {
+                'runtime': parsed[1],
+                'invoked': parsed[2],
+            }
+        else:
+            match = MEMORY_GROUP.match(line)
+            if match:
+                group = match.group(1)
+                continue
+            # Lines before the first group are allocator statistics.
+            if group is None:
+                continue
+            match = MEMORY_TYPE.match(line)
+            if match:
+                key = '{}/{}'.format(group, match.group(1))
+                stats[daemon]['memory'][key] = int(match.group(2))
+    return stats
+
+
+def stats_delta(before, after):
+    """
+    Returns the difference between two parse_stats() results as a dictionary
+    of daemon name to:
+    * 'cpu': list of the handlers that ran, sorted by runtime
+    * 'memory': list of the memory types whose allocations changed, sorted
+      by growth
+    Daemons with no change are omitted.
+    """
+    delta = {}
+    for daemon, stats in sorted(after.items()):
+        previous = before.get(daemon, {'cpu': {}, 'memory': {}})
+
+        cpu = []
+        for handler, values in stats['cpu'].items():
+            old = previous['cpu'].get(handler, {'runtime': 0.0, 'invoked': 0})
+            invoked = values['invoked'] - old['invoked']
+            # Counters go back when the daemon restarted.
+            if invoked < 0:
+                old = {'runtime': 0.0, 'invoked': 0}
+                invoked = values['invoked']
+            if invoked == 0:
+                continue
+            cpu.append({
+                'handler': handler,
+                'runtime': round(values['runtime'] - old['runtime'], 3),
+                'invoked': invoked,
+            })
+        cpu.sort(key=lambda item: (-item['runtime'], item['handler']))
+
+        memory = []
+        mtypes = set(stats['memory']) | set(previous['memory'])
+        for mtype in mtypes:
+            count = stats['memory'].get(mtype, 0)
+            old = previous['memory'].get(mtype, 0)
+            if count == old:
+                continue
+            memory.append({
+                'type': mtype,
+                'before': old,
+                'after': count,
+                'delta': count - old,
+            })
+        memory.sort(key=lambda item: (-item['delta'], item['type']))
+
+        if cpu or memory:
+            delta[daemon] = {'cpu': cpu, 'memory': memory}
+    return delta
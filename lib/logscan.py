@@ -0,0 +1,190 @@
+#
+# logscan.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Incremental daemon log scanner.
+
+The daemons '.err'/'.log' files are checked many times during a test module
+(AddressSanitizer errors, memory leaks...). A LogScanner remembers how much
+of its file it already read and only reads (and matches the patterns
+against) the bytes appended since the last update. Big appends are read
+with mmap. Truncated or replaced files are read again from the start.
+
+Usage example:
+
+    scanner = get_scanner('/tmp/topotests/module/r1/bgpd.err')
+    scanner.update()
+    if scanner.has('memstats'):
+        ...
+"""
+
+import os
+import re
+import mmap
+import threading
+
+# Appends bigger than this are read with mmap
+MMAP_THRESHOLD = 1024 * 1024
+
+# Patterns searched in the log lines
+PATTERNS = {
+    'asan': re.compile(r'==[0-9]+==ERROR: AddressSanitizer: '),
+    'leak': re.compile(r'==[0-9]+==ERROR: LeakSanitizer: '),
+    'memstats': re.compile(r'memstats'),
+    'crash': re.compile(r'Received signal [0-9]+'),
+}
+
+
+def _decode(data):
+    if not isinstance(data, str):
+        return data.decode('utf-8', 'replace')
+    return data
+
+
+class LogScanner(object):
+    "Incremental reader and pattern matcher of a log file."
+
+    def __init__(self, path, patterns=None):
+        self.path = path
+        self.patterns = patterns or PATTERNS
+        self.lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.offset = 0
+        self.chunks = []
+        self.partial = b''
+        self.findings = []
+        self.length = 0
+        self._text = None
+
+    def _read(self, size):
+        "Returns the file bytes between the current offset and `size`."
+        with open(self.path, 'rb') as logfile:
+            if size - self.offset < MMAP_THRESHOLD:
+                logfile.seek(self.offset)
+                return logfile.read(size - self.offset)
+            mapped = mmap.mmap(logfile.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                return mapped[self.offset:size]
+            finally:
+                mapped.close()
+
+    def _scan(self, text):
+        "Records the pattern matches of the complete lines `text`."
+        findings = []
+        for kind, pattern in self.patterns.items():
+            for match in pattern.finditer(text):
+                start = text.rfind('\n', 0, match.start()) + 1
+                end = text.find('\n', match.end())
+                findings.append((self.length + start, kind, text[start:end]))
+        findings.sort()
+        return [(kind, start, line) for start, kind, line in findings]
+
+    def update(self):
+        """
+        Reads the bytes appended to the file since the last update and
+        returns the list of new findings: (pattern name, text offset, line)
+        tuples.
+        """
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                if self.inode is not None:
+                    self._reset(None)
+                return []
+
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self._reset(stat.st_ino)
+            if stat.st_size == self.offset:
+                return []
+
+            try:
+                data = self.partial + self._read(stat.st_size)
+            except (IOError, OSError, ValueError):
+                return []
+            self.offset = stat.st_size
+            self._text = None
+
+            # Only complete lines are scanned, the partial last line waits
+            # for the next update.
+            end = data.rfind(b'\n') + 1
+            self.partial = data[end:]
+            if end == 0:
+                return []
+            text = _decode(data[:end])
+            findings = self._scan(text)
+            self.chunks.append(text)
+            self.length += len(text)
+            self.findings.extend(findings)
+            return findings
+
+    @property
+    def text(self):
+        "The file content read so far."
+        with self.lock:
+            if self._text is None:
+                self.chunks = [''.join(self.chunks)]
+                self._text = self.chunks[0] + _decode(self.partial)
+            return self._text
+
+    def read(self):
+        "Updates and returns the file content."
+        self.update()
+        return self.text
+
+    def has(self, kind):
+        "Returns whether the pattern `kind` was found."
+        return any(finding[0] == kind for finding in self.findings)
+
+    def text_from(self, kind):
+        """
+        Returns the file content starting at the first line matching the
+        pattern `kind` or an empty string if the pattern was not found.
+        """
+        for finding in self.findings:
+            if finding[0] == kind:
+                return self.text[finding[1]:]
+        return ''
+
+
+# Scanners by file path
+scanners = {}
+scanners_lock = threading.Lock()
+
+
+def get_scanner(path):
+    "Returns the scanner of the log file `path`."
+    with scanners_lock:
+        if path not in scanners:
+            scanners[path] = LogScanner(path)
+        return scanners[path]
+
+
+def forget(prefix):
+    "Drops the scanners of the files whose path starts with `prefix`."
+    with scanners_lock:
+        for path in list(scanners):
+            if path.startswith(prefix):
+                del scanners[path]
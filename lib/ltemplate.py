@@ -58,7 +58,8 @@ class LTemplate():
         self.test = test
         self.testdir = testdir
         self.scriptdir = testdir
-        self.logdir = '/tmp/topotests/{0}.test_{0}'.format(test)
+        self.logdir = '{0}/{1}.test_{1}'.format(
+            topotest.get_topotests_dir(), test)
         logger.info('LTemplate: '+test)
 
     def setup_module(self, mod):
@@ -24,6 +24,7 @@ import datetime
 import json
 from topolog import logger
 from mininet.net import Mininet
+from lib.topogen import get_topogen
 
 
 # L utility functions
@@ -286,6 +287,24 @@ def luCommand(target, command, regexp='.', op='none', result='', time=10, return
     else:
         return LUtil.wait(target, command, regexp, op, result, time, returnJson)
 
+def luRunningConfig(target, regexp='.', section=None, result='', refresh=True):
+    """
+    Searches regexp in the running configuration of the router target, or
+    only in its contexts starting with section (e.g. 'router bgp'). The
+    configuration is read from the router unless refresh is False: the
+    luCommand() configuration changes don't update the parsed running
+    configuration the router keeps, see TopoRouter.get_running_config().
+    """
+    config = get_topogen().routers()[target].get_running_config(
+        section, refresh=refresh)
+    LUtil.log('%s:%s RUNNING-CONFIG:%s:%s:%s:%s:' % \
+              (LUtil.l_filename, LUtil.l_line, target, section, regexp, result))
+    search = re.search(regexp, config)
+    if search == None:
+        return False
+    LUtil.log('found:%s:' % search.group())
+    return search.group()
+
 def luLast(usenl=False):
     if usenl:
 	if LUtil.l_last_nl != None:
@@ -0,0 +1,190 @@
+#
+# perfrecord.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Linux `perf record` attachment to the router daemons.
+
+Records the daemons call stacks during a test phase (a BGP clear, a link
+flap, a large route injection...) and saves both the `perf.data` file and
+the folded stacks ('.folded') used by flamegraph.pl and speedscope.
+
+Usage example (see also TopoRouter.profile() and the `perf_record`
+marker):
+
+    with router.profile(['bgpd', 'zebra'], name='clear-bgp'):
+        router.vtysh_cmd('clear bgp *')
+        ...
+"""
+
+import os
+import re
+import signal
+import subprocess
+
+from lib.capabilities import get_capabilities
+from lib.topolog import logger
+
+# Sampling frequency (Hz)
+DEFAULT_FREQUENCY = 99
+
+# perf script sample header: "<comm> <pid>[/<tid>] [<cpu>] <time>: ..."
+SAMPLE_HEADER = re.compile(r'^(\S.*?)\s+\d+(?:/\d+)?\s')
+SYMBOL_OFFSET = re.compile(r'\+0x[0-9a-f]+$')
+
+
+def _frame_name(line):
+    """
+    Returns the function name of a `perf script` stack line:
+    "<address> <symbol>+<offset> (<dso>)"
+    """
+    fields = line.strip().split(' ', 1)
+    if len(fields) < 2:
+        return '[unknown]'
+    symbol = fields[1]
+    dso = ''
+    if symbol.endswith(')') and ' (' in symbol:
+        symbol, dso = symbol.rsplit(' (', 1)
+        dso = dso[:-1]
+    symbol = SYMBOL_OFFSET.sub('', symbol.strip())
+    if symbol in ['', '[unknown]'] and dso:
+        return '[{}]'.format(os.path.basename(dso))
+    return symbol or '[unknown]'
+
+
+def collapse_perf_script(lines):
+    """
+    Folds the `perf script` output `lines` into a dictionary of
+    'comm;outer;...;inner' stack to its sample count.
+    """
+    stacks = {}
+    comm = None
+    frames = []
+
+    def flush():
+        if comm is not None:
+            key = ';'.join([comm] + list(reversed(frames)))
+            stacks[key] = stacks.get(key, 0) + 1
+
+    for line in lines:
+        if not line.strip():
+            flush()
+            comm = None
+            frames = []
+            continue
+        if line[0] in ' \t':
+            if comm is not None:
+                frames.append(_frame_name(line))
+            continue
+        if line.startswith('#'):
+            continue
+        match = SAMPLE_HEADER.match(line)
+        if match:
+            flush()
+            comm = match.group(1).replace(' ', '_')
+            frames = []
+    flush()
+    return stacks
+
+
+def write_folded(path, stacks):
+    "Saves the folded `stacks` dictionary in `path`."
+    with open(path, 'w') as foldedfile:
+        for stack, count in sorted(stacks.items()):
+            foldedfile.write('{} {}\n'.format(stack, count))
+
+
+class PerfRecording(object):
+    """
+    A `perf record -g` run attached to daemons. Can be used as a context
+    manager.
+    """
+
+    def __init__(self, name, pids, path, frequency=DEFAULT_FREQUENCY):
+        """
+        * `name`: recording name used in the logs
+        * `pids`: dictionary of daemon name to pid
+        * `path`: output file path without extension
+        * `frequency`: sampling frequency in Hz
+        """
+        self.name = name
+        self.pids = pids
+        self.datafile = '{}.data'.format(path)
+        self.foldedfile = '{}.folded'.format(path)
+        self.frequency = frequency
+        self.perf = None
+        self.proc = None
+        self.devnull = None
+
+    def start(self):
+        "Starts recording. Returns `False` when perf can't be run."
+        self.perf = get_capabilities().which('perf')
+        if self.perf is None:
+            logger.warning('{}: perf not found, not recording'.format(self.name))
+            return False
+        if not self.pids:
+            logger.warning('{}: no daemon running, not recording'.format(self.name))
+            return False
+
+        dirname = os.path.dirname(self.datafile)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        logger.info('{}: recording {} with perf'.format(
+            self.name, ', '.join(sorted(self.pids))))
+        self.devnull = open(os.devnull, 'w')
+        self.proc = subprocess.Popen(
+            [self.perf, 'record', '-g', '-F', str(self.frequency),
+             '-p', ','.join(str(pid) for pid in sorted(self.pids.values())),
+             '-o', self.datafile],
+            stdout=self.devnull, stderr=subprocess.STDOUT)
+        return True
+
+    def stop(self):
+        """
+        Stops recording and saves the folded stacks. Returns the folded
+        stacks file path or `None` when nothing was recorded.
+        """
+        if self.proc is None:
+            return None
+        proc = self.proc
+        self.proc = None
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGINT)
+        proc.wait()
+
+        script = subprocess.Popen([self.perf, 'script', '-i', self.datafile],
+                                  stdout=subprocess.PIPE, stderr=self.devnull)
+        output = script.communicate()[0]
+        self.devnull.close()
+        if not isinstance(output, str):
+            output = output.decode('utf-8', 'replace')
+        write_folded(self.foldedfile, collapse_perf_script(output.splitlines()))
+        logger.info('{}: perf recording saved to {} ({})'.format(
+            self.name, self.datafile, self.foldedfile))
+        return self.foldedfile
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
@@ -0,0 +1,129 @@
+#
+# prefixgen.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Prefix range generation.
+
+Ranges of prefixes (static routes, BGP networks...) are generated with
+integer arithmetic and formatted without building `ipaddress` objects, so
+big ranges are cheap to create and to verify. Every function is lazy.
+
+Usage example:
+
+    # 10.0.0.0/24, 10.0.1.0/24, 10.0.2.0/24
+    for prefix in prefix_range('10.0.0.0/24', 3):
+        ...
+    # 2001:db8::/64, 2001:db8:0:2::/64
+    for prefix in prefix_range('2001:db8::/64', 2, step=2):
+        ...
+"""
+
+import struct
+import socket
+import ipaddress
+
+IPV4_BITS = 32
+IPV6_BITS = 128
+
+_pack_ipv4 = struct.Struct('!I').pack
+_pack_ipv6 = struct.Struct('!QQ').pack
+
+
+def _unicode(text):
+    if isinstance(text, bytes):
+        return text.decode('ascii')
+    return text
+
+
+def parse_prefix(prefix):
+    """
+    Returns the (network integer, prefix length, address bits) of `prefix`,
+    a string like '10.0.0.1/32' or '2001:db8::'. Addresses without a
+    length are host prefixes and host bits are cleared.
+    """
+    network = ipaddress.ip_network(_unicode(prefix), strict=False)
+    return (int(network.network_address), network.prefixlen,
+            network.max_prefixlen)
+
+
+def prefix_ints(start, count, step=1):
+    """
+    Yields the network integers of the `count` prefixes starting at the
+    `start` prefix, `step` prefixes of the same length apart.
+    """
+    network, length, bits = parse_prefix(start)
+    increment = step << (bits - length)
+    last = network + (count - 1) * increment
+    if count > 0 and not 0 <= last < 1 << bits:
+        raise ValueError('prefix range out of the address space: {} + {} * {}'
+                         .format(start, count, step))
+    for _ in range(count):
+        yield network
+        network += increment
+
+
+def format_ipv4(value):
+    "Returns the dotted quad of the IPv4 address integer `value`."
+    return socket.inet_ntoa(_pack_ipv4(value))
+
+
+def format_ipv6(value):
+    "Returns the compressed text of the IPv6 address integer `value`."
+    # inet_ntop() writes the addresses starting with 80 zero bits with an
+    # IPv4 dotted quad, ipaddress does not.
+    if value >> 48:
+        return socket.inet_ntop(socket.AF_INET6, _pack_ipv6(
+            value >> 64, value & 0xffffffffffffffff))
+
+    hextets = ['{:x}'.format((value >> shift) & 0xffff)
+               for shift in range(112, -16, -16)]
+
+    # Longest run (the first one) of at least two zero hextets becomes '::'
+    best_start, best_len = -1, 1
+    run_start, run_len = -1, 0
+    for index, hextet in enumerate(hextets):
+        if hextet == '0':
+            if run_len == 0:
+                run_start = index
+            run_len += 1
+            if run_len > best_len:
+                best_start, best_len = run_start, run_len
+        else:
+            run_len = 0
+
+    if best_start < 0:
+        return ':'.join(hextets)
+    head = ':'.join(hextets[:best_start])
+    tail = ':'.join(hextets[best_start + best_len:])
+    return '{}::{}'.format(head, tail)
+
+
+def prefix_range(start, count, step=1):
+    """
+    Yields the `count` prefixes (strings like '10.0.0.1/32') starting at the
+    `start` prefix, `step` prefixes of the same length apart.
+    """
+    length, bits = parse_prefix(start)[1:]
+    fmt = format_ipv4 if bits == IPV4_BITS else format_ipv6
+    suffix = '/{}'.format(length)
+    for value in prefix_ints(start, count, step):
+        yield fmt(value) + suffix
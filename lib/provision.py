@@ -0,0 +1,364 @@
+#
+# provision.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Batched node provisioning: interface link state, addresses, IPv6 link-local
+addresses and sysctls.
+
+Instead of running one shell command per interface or per sysctl, the node
+state is read with a single command, the differences are computed here and
+then applied with a single command: one 'ip -batch' run for the link and
+address changes plus direct '/proc/sys' writes (read back to verify them).
+When there is nothing to change the second command is not run at all.
+
+Multiple nodes are provisioned in parallel: each step is sent to all node
+shells before waiting for their output.
+
+Usage example:
+
+    # Flush the addresses of two interfaces and enable forwarding
+    report = provision_node(node, flush=['r1-eth0', 'r1-eth1'],
+                            sysctls=[('net.ipv4.ip_forward', 1)])
+    assert report.ok, str(report)
+"""
+
+import os
+import re
+import tempfile
+
+from lib.topolog import logger
+
+# Sysctls applied to every router node when it is configured.
+ROUTER_SYSCTLS = [
+    # Enable forwarding on the router
+    ('net.ipv4.ip_forward', 1),
+    ('net.ipv6.conf.all.forwarding', 1),
+    # Enable coredumps
+    ('kernel.core_uses_pid', 1),
+    ('fs.suid_dumpable', 1),
+    # this applies to the kernel not the namespace...
+    # original on ubuntu 17.x, but apport won't save as in namespace
+    # |/usr/share/apport/apport %p %s %c %d %P
+    ('kernel.core_pattern', '%e_core-sig_%s-pid_%p.dmp'),
+]
+
+# Output section markers
+_MARKER = '@@'
+_LINKS = 'links'
+_ADDRS = 'addrs'
+_BATCH = 'batch'
+_SYSCTL = 'sysctl:'
+
+_LINK_RE = re.compile(
+    r'^\d+:\s+([^:@\s]+)(?:@\S+)?:\s+<([^>]*)>.*?link/\S+(?:\s+([0-9a-f:]{17}))?')
+_ADDR_RE = re.compile(r'^\d+:\s+([^:@\s]+)(?:@\S+)?\s+(inet6?)\s+(\S+)(.*)$')
+
+
+def sysctl_path(sysctl):
+    "Returns the '/proc/sys' file path of the `sysctl` name."
+    return os.path.join('/proc/sys', sysctl.replace('.', '/'))
+
+
+def link_local_address(mac):
+    """
+    Returns the EUI-64 IPv6 link-local address (with prefix length) derived
+    from the `mac` address (e.g. '02:00:00:00:00:01' returns
+    'fe80::ff:fe00:1/64'). The address is formatted the way iproute2 prints
+    it, so it can be compared with the 'ip address show' output.
+    """
+    octets = [int(octet, 16) for octet in mac.split(':')]
+    groups = [
+        ((octets[0] ^ 0x02) << 8) | octets[1],
+        (octets[2] << 8) | 0xff,
+        (0xfe << 8) | octets[3],
+        (octets[4] << 8) | octets[5],
+    ]
+    address = ':'.join('{:x}'.format(group) for group in groups)
+    if address.startswith('0:'):
+        # The leading zero group merges with the '::' compression.
+        address = address[2:]
+    return 'fe80::{}/64'.format(address)
+
+
+def parse_links(output):
+    """
+    Parses 'ip -o link show' output and returns a dictionary keyed by the
+    interface name with the keys 'up' (administrative state) and 'mac'.
+    """
+    links = {}
+    for line in output.splitlines():
+        match = _LINK_RE.match(line.strip())
+        if match is None:
+            continue
+        links[match.group(1)] = {
+            'up': 'UP' in match.group(2).split(','),
+            'mac': match.group(3),
+        }
+    return links
+
+
+def parse_addresses(output):
+    """
+    Parses 'ip -o address show' output and returns a dictionary keyed by the
+    interface name with the list of its addresses (with prefix length).
+    """
+    addresses = {}
+    for line in output.splitlines():
+        match = _ADDR_RE.match(line.strip())
+        if match is None:
+            continue
+        addresses.setdefault(match.group(1), []).append(match.group(3))
+    return addresses
+
+
+def _quote(value):
+    "Quotes `value` for the node shell."
+    return "'{}'".format('{}'.format(value).replace("'", "'\\''"))
+
+
+def _sections(output):
+    """
+    Splits the command output in sections delimited by marker lines and
+    returns a dictionary with the section contents.
+    """
+    sections = {}
+    current = None
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            current = line[len(_MARKER):].strip()
+            sections[current] = []
+            continue
+        if current is not None:
+            sections[current].append(line)
+    return dict((key, '\n'.join(lines)) for key, lines in sections.items())
+
+
+class ProvisionReport(object):
+    """
+    Result of a node provisioning:
+    * `name`: the node name
+    * `changes`: list of changes applied to the node
+    * `errors`: list of errors found while applying the changes
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.changes = []
+        self.errors = []
+
+    @property
+    def ok(self):
+        "Returns `True` when all the changes were applied."
+        return len(self.errors) == 0
+
+    def __str__(self):
+        lines = ['{}: {} change(s), {} error(s)'.format(
+            self.name, len(self.changes), len(self.errors))]
+        lines.extend('  changed: {}'.format(change) for change in self.changes)
+        lines.extend('  error: {}'.format(error) for error in self.errors)
+        return '\n'.join(lines)
+
+
+class _NodeProvision(object):
+    "Provisioning state machine of a single node."
+
+    def __init__(self, node, sysctls=None, flush=None, link_local=False,
+                 link_state=None):
+        self.node = node
+        self.sysctls = [(name, '{}'.format(value))
+                        for name, value in (sysctls or [])]
+        if isinstance(flush, dict):
+            flush = flush.get(node.name)
+        self.flush = flush
+        self.link_local = link_local
+        self.link_state = link_state or {}
+        self.report = ProvisionReport(node.name)
+        self.batch = []
+        self.writes = []
+        self.batchfile = None
+
+    def _needs_links(self):
+        return self.flush is not None or self.link_local or self.link_state
+
+    def query_command(self):
+        """
+        Returns the command that reads the node current state or `None` if
+        there is nothing to read.
+        """
+        commands = []
+        if self._needs_links():
+            commands.append('echo {}{}'.format(_MARKER, _LINKS))
+            commands.append('ip -o link show')
+            commands.append('echo {}{}'.format(_MARKER, _ADDRS))
+            commands.append('ip -o address show')
+        for name, _ in self.sysctls:
+            commands.append('echo {}{}{}'.format(_MARKER, _SYSCTL, name))
+            commands.append('cat {} 2>&1'.format(sysctl_path(name)))
+        return '; '.join(commands) or None
+
+    def plan(self, output):
+        "Computes the changes from the node current state `output`."
+        sections = _sections(output)
+        links = parse_links(sections.get(_LINKS, ''))
+        addresses = parse_addresses(sections.get(_ADDRS, ''))
+
+        for ifname, enabled in sorted(self.link_state.items()):
+            if ifname not in links:
+                self.report.errors.append(
+                    'interface {} does not exist'.format(ifname))
+                continue
+            if links[ifname]['up'] == enabled:
+                continue
+            operation = 'up' if enabled else 'down'
+            self.batch.append('link set dev {} {}'.format(ifname, operation))
+            self.report.changes.append('link {} {}'.format(ifname, operation))
+
+        flushed = set()
+        if self.flush is not None:
+            ifnames = self.flush
+            if ifnames is True:
+                ifnames = [ifname for ifname in links if ifname != 'lo']
+            for ifname in sorted(ifnames):
+                if not addresses.get(ifname):
+                    continue
+                flushed.add(ifname)
+                self.batch.append('address flush dev {}'.format(ifname))
+                self.report.changes.append('flushed {} from {}'.format(
+                    ', '.join(addresses[ifname]), ifname))
+
+        if self.link_local:
+            for ifname in sorted(links):
+                mac = links[ifname]['mac']
+                if mac is None:
+                    continue
+                address = link_local_address(mac)
+                if ifname not in flushed and address in addresses.get(ifname, []):
+                    continue
+                self.batch.append('address add {} dev {} scope link'.format(
+                    address, ifname))
+                self.report.changes.append('added {} to {}'.format(
+                    address, ifname))
+
+        for name, value in self.sysctls:
+            current = sections.get(_SYSCTL + name, '').strip()
+            if current == value:
+                continue
+            self.writes.append((name, value))
+            self.report.changes.append('sysctl {} = {} (was {})'.format(
+                name, value, current))
+
+    def apply_command(self):
+        """
+        Returns the command that applies the planned changes or `None` if
+        there is nothing to do.
+        """
+        if not self.batch and not self.writes:
+            return None
+
+        commands = []
+        if self.batch:
+            fde = tempfile.NamedTemporaryFile(mode='w', delete=False)
+            fde.write('\n'.join(self.batch) + '\n')
+            fde.close()
+            self.batchfile = fde.name
+            commands.append('echo {}{}'.format(_MARKER, _BATCH))
+            commands.append('ip -force -batch {} 2>&1'.format(self.batchfile))
+        for name, value in self.writes:
+            commands.append('echo {} > {} 2>/dev/null'.format(
+                _quote(value), sysctl_path(name)))
+        for name, _ in self.writes:
+            commands.append('echo {}{}{}'.format(_MARKER, _SYSCTL, name))
+            commands.append('cat {} 2>&1'.format(sysctl_path(name)))
+        return '; '.join(commands)
+
+    def verify(self, output):
+        "Checks the output of the applied changes."
+        if self.batchfile is not None:
+            os.unlink(self.batchfile)
+            self.batchfile = None
+
+        sections = _sections(output)
+        for line in sections.get(_BATCH, '').splitlines():
+            if line.strip():
+                self.report.errors.append(line.strip())
+        for name, value in self.writes:
+            current = sections.get(_SYSCTL + name, '').strip()
+            if current != value:
+                self.report.errors.append('sysctl {} is "{}", expected "{}"'.format(
+                    name, current, value))
+
+
+def _run_parallel(jobs, command):
+    """
+    Sends the command returned by `command(job)` to all job nodes and then
+    collects the outputs. Returns a list of (job, output) tuples.
+    """
+    pending = []
+    for job in jobs:
+        cmd = command(job)
+        if cmd is None:
+            continue
+        job.node.sendCmd(cmd)
+        pending.append(job)
+    return [(job, job.node.waitOutput()) for job in pending]
+
+
+def provision_nodes(nodes, sysctls=None, flush=None, link_local=False,
+                    link_state=None):
+    """
+    Provisions all `nodes` in parallel. Possible settings:
+    * `sysctls`: list of (name, value) sysctls to set
+    * `flush`: list of interfaces to remove all addresses from, `True` for
+      all the interfaces except the loopback or a dictionary of node name to
+      one of these
+    * `link_local`: whether to (re-)add the EUI-64 IPv6 link-local address of
+      every interface (flushed interfaces always get it back)
+    * `link_state`: dictionary of interface name to administrative state
+      (`True` for up, `False` for down)
+
+    Returns a dictionary of node name to ProvisionReport.
+    """
+    jobs = [_NodeProvision(node, sysctls, flush, link_local, link_state)
+            for node in nodes]
+
+    for job, output in _run_parallel(jobs, lambda job: job.query_command()):
+        job.plan(output)
+    for job, output in _run_parallel(jobs, lambda job: job.apply_command()):
+        job.verify(output)
+
+    reports = {}
+    for job in jobs:
+        report = job.report
+        if report.changes or report.errors:
+            logger.debug(str(report))
+        reports[report.name] = report
+    return reports
+
+
+def provision_node(node, sysctls=None, flush=None, link_local=False,
+                   link_state=None):
+    """
+    Provisions a single node, see provision_nodes() for the settings.
+    Returns the node ProvisionReport.
+    """
+    return provision_nodes([node], sysctls, flush, link_local,
+                           link_state)[node.name]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+#
+# test_cfgcache.py
+# Tests for library functions: configuration cache.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the configuration cache.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.cfgcache import ConfigCache, content_key
+
+
+def test_content_key():
+    "Test the cache keys only depend on the content"
+
+    assert content_key('build', {'a': 1, 'b': [1, 2]}) == \
+        content_key('build', {'b': [1, 2], 'a': 1})
+    assert content_key('build', {'a': 1}) != content_key('build', {'a': 2})
+    assert content_key('build', 'x') != content_key('delta', 'x')
+
+
+def test_cache(tmpdir):
+    "Test storing and loading values"
+
+    directory = str(tmpdir)
+    key = content_key('delta', 'current', 'target')
+    cache = ConfigCache(directory)
+    assert cache.load('delta', key) is None
+    cache.store('delta', key, ['no ip route 10.0.0.1/32 10.0.0.2'])
+
+    # Another run reads it from the disk, without temporary files left.
+    other = ConfigCache(directory)
+    assert other.load('delta', key) == ['no ip route 10.0.0.1/32 10.0.0.2']
+    assert (other.hits, cache.misses) == (1, 1)
+    files = [name for _, _, names in os.walk(directory) for name in names]
+    assert files == [key]
+
+    # Damaged files are misses.
+    path = os.path.join(directory, 'delta', key[:2], key)
+    with open(path, 'wb') as cached:
+        cached.write(b'\x80\x02garbage')
+    assert ConfigCache(directory).load('delta', key) is None
+
+    # Values are copies.
+    value = cache.load('delta', key)
+    value.append('changed')
+    assert cache.load('delta', key) == ['no ip route 10.0.0.1/32 10.0.0.2']
+
+
+def test_untrusted_cache(tmpdir):
+    "Test the cache directory and files writable by others are not used"
+
+    key = content_key('build', 'topology')
+    directory = tmpdir.join('cache')
+    cache = ConfigCache(str(directory))
+    assert cache.directory == str(directory)
+    assert directory.stat().mode & 0o777 == 0o700
+    cache.store('build', key, {'r1': object.__name__})
+
+    # Files others can write are not loaded.
+    path = os.path.join(str(directory), 'build', key[:2], key)
+    os.chmod(path, 0o666)
+    assert ConfigCache(str(directory)).load('build', key) is None
+    os.chmod(path, 0o644)
+    assert ConfigCache(str(directory)).load('build', key) == {'r1': 'object'}
+
+    # Neither are directories others can write: memory only.
+    os.chmod(str(directory), 0o777)
+    other = ConfigCache(str(directory))
+    assert other.directory is None
+    assert other.load('build', key) is None
+    other.store('build', key, ['value'])
+    assert other.load('build', key) == ['value']
+
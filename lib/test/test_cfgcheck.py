@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+#
+# test_cfgcheck.py
+# Tests for library functions: offline configuration check.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the offline configuration check.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.cfgcheck import check_file_lines, check_configs
+
+CONFIGS = {
+    'r2': 'router bgp 200\n neighbor 10.0.0.1 remote-as 100\n!\n',
+    'r1': 'hostname r1\ninterface r1-eth0\n ip adress 10.0.0.1/24\n!\n',
+}
+
+
+def test_check_file_lines():
+    "Test the routers configurations are concatenated in order."
+    lines = check_file_lines(CONFIGS)
+    assert lines[:5] == [
+        (('r1', 1), 'hostname r1'),
+        (('r1', 2), 'interface r1-eth0'),
+        (('r1', 3), 'ip adress 10.0.0.1/24'),
+        (('r1', 4), '!'),
+        (('r1', None), '!'),
+    ]
+    assert lines[5] == (('r2', 1), 'router bgp 200')
+    assert len(lines) == 9
+
+
+def test_check_configs(tmpdir):
+    "Test the vtysh failures are mapped back to the routers."
+    vtysh = tmpdir.join('vtysh')
+    vtysh.write('#!/bin/sh\n'
+                'echo "Checking $1 $2"\n'
+                'echo "line 3: % Unknown command[9]:  ip adress 10.0.0.1/24" >&2\n'
+                'echo "% Configuration file failed" >&2\n')
+    vtysh.chmod(0o755)
+    assert check_configs(CONFIGS, str(vtysh)) == [
+        ('r1', 3, 'ip adress 10.0.0.1/24',
+         '% Unknown command[9]:  ip adress 10.0.0.1/24'),
+        (None, None, None, '% Configuration file failed'),
+    ]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+#
+# test_cfgpush.py
+# Tests for library functions: configuration push chunks.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the chunked configuration push.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.cfgpush import split_chunks, chunk_text, parse_errors
+
+DELTA = [
+    'router bgp 100',
+    'neighbor 10.0.0.2 remote-as 200',
+    'address-family ipv4 unicast',
+    'network 10.1.0.0/16',
+    'network 10.2.0.0/16',
+    'exit-address-family',
+    'ip prefix-list pl seq 5 permit any',
+]
+
+
+def test_split_chunks():
+    "Test the chunks repeat the open context lines."
+    chunks = split_chunks(DELTA, 2)
+    assert [len(chunk) for chunk in chunks] == [2, 3, 4, 2]
+    assert chunk_text(chunks[2]) == (
+        'router bgp 100\naddress-family ipv4 unicast\n'
+        'network 10.2.0.0/16\nexit-address-family\n')
+    assert chunks[3] == [(1, 'router bgp 100'),
+                         (7, 'ip prefix-list pl seq 5 permit any')]
+
+    # Removed contexts are not entered again.
+    chunks = split_chunks(['router bgp 100', 'no router bgp 100',
+                           'ip prefix-list pl seq 5 permit any'], 2)
+    assert chunks[1] == [(3, 'ip prefix-list pl seq 5 permit any')]
+
+    assert split_chunks(DELTA) == [list(enumerate(DELTA, 1))]
+
+
+def test_parse_errors():
+    "Test the vtysh failures are mapped back to the source lines."
+    chunk = split_chunks(DELTA, 2)[1]
+    output = ('% Malformed community-list value\n'
+              'line 3: Warning[4]: network 10.1.0.0/16\n'
+              'line 2: % Unknown command[4]: address-family ipv4 unicast\n'
+              '% Unknown daemon\n')
+    assert parse_errors(output, chunk) == [
+        (4, 'network 10.1.0.0/16',
+         '% Malformed community-list value (Warning[4]: network 10.1.0.0/16)'),
+        (3, 'address-family ipv4 unicast',
+         '% Unknown command[4]: address-family ipv4 unicast'),
+        (None, None, '% Unknown daemon'),
+    ]
+    assert parse_errors('', chunk) == []
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+#
+# test_cfgtable.py
+# Tests for library functions: configuration tables.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the configuration tables.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.cfgtable import (StaticRouteTable, PrefixLists, CommunityLists,
+                          write_chunked)
+
+
+class Output(object):
+    "File object recording its writes."
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+def test_static_routes():
+    "Test storing and rendering static routes"
+
+    routes = StaticRouteTable()
+    routes.extend('ip', ['10.0.0.1/32', '10.0.0.2/32'], '192.168.0.2', 100,
+                  tag=4001)
+    routes.extend('ipv6', iter(['fd00::1/128']), 'fd01::2', if_name='r1-eth0')
+    assert len(routes) == 3
+
+    for index in routes.find(prefix='10.0.0.2/32', next_hop='192.168.0.2'):
+        routes.set(index, 'admin_distance', 10)
+    assert list(routes.lines()) == [
+        'ip route 10.0.0.1/32 192.168.0.2 tag 4001 100 \n',
+        'ip route 10.0.0.2/32 192.168.0.2 tag 4001 10 \n',
+        'ipv6 route fd00::1/128 fd01::2 r1-eth0 1 \n',
+    ]
+
+
+def test_prefix_lists():
+    "Test storing and rendering prefix lists"
+
+    prefix_lists = PrefixLists()
+    prefix_lists.add('pf_list_1', 10, 'deny', 'ip', '10.10.0.0/16', 24, None)
+    prefix_lists.add('pf_list_1', 11, 'permit', None, 'any', None, None)
+    prefix_lists.add('pf_list_2', 10, 'permit', 'ip', '10.0.0.0/8', None, 4)
+    assert 'pf_list_1' in prefix_lists
+    assert list(prefix_lists.lines('ipv6')) == [
+        'ip prefix-list pf_list_1 seq 10 deny 10.10.0.0/16  le 24 \n',
+        'ipv6 prefix-list pf_list_1 seq 11 permit any \n',
+        'ip prefix-list pf_list_2 seq 10 permit 10.0.0.0/8  \n',
+    ]
+
+    entries = prefix_lists.get('pf_list_1')
+    entries.remove(entries.find(seq=10))
+    prefix_lists.remove('pf_list_2')
+    assert prefix_lists.names() == ['pf_list_1']
+    assert len(entries) == 1
+
+
+def test_community_lists():
+    "Test rendering community lists"
+
+    community_lists = CommunityLists()
+    community_lists.add('comm1', 'community-list', 'standard', 'PERMIT',
+                        '100:100')
+    assert list(community_lists.lines()) == [
+        'bgp community-list standard comm1 permit 100:100 \n']
+
+
+def test_write_chunked():
+    "Test writing lines in chunks"
+
+    output = Output()
+    write_chunked(output, ('{}\n'.format(index) for index in range(10)), 4)
+    assert output.writes == ['0\n1\n2\n3\n', '4\n5\n6\n7\n', '8\n9\n']
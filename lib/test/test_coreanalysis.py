@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+#
+# test_coreanalysis.py
+# Tests for library functions: core dump stack signatures.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the core dump analysis.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.coreanalysis import stack_functions, stack_signature, CoreAnalyzer
+
+BACKTRACE = """\
+[New LWP 1234]
+Core was generated by `/usr/lib/frr/bgpd'.
+Program terminated with signal SIGABRT, Aborted.
+#0  __GI_raise (sig=sig@entry=6) at ../sysdeps/unix/sysv/linux/raise.c:51
+#1  0x00007f2a4d1d4801 in __GI_abort () at abort.c:79
+#2  0x00007f2a4d6b1b0a in core_handler (signo=6, siginfo=0x7ffd, context=0x7ffd) at lib/sigevent.c:255
+#3  <signal handler called>
+#4  __GI_raise (sig=sig@entry=6) at ../sysdeps/unix/sysv/linux/raise.c:51
+#5  0x00007f2a4d1d4801 in __GI_abort () at abort.c:79
+#6  0x00007f2a4d6a2a3d in _zlog_assert_failed (assertion=0x5625 "peer") at lib/log.c:1002
+#7  0x000056250b1c1c2d in bgp_process_main_one (bgp=0x5625, dest=0x5625) at bgpd/bgp_route.c:2400
+#8  0x00007f2a4d6c3e5c in thread_call (thread=0x7ffd) at lib/thread.c:1599
+#9  0x00007f2a4d69c2b8 in frr_run (master=0x5625) at lib/libfrr.c:1011
+#10 0x000056250b15dd3a in main (argc=9, argv=0x7ffd) at bgpd/bgp_main.c:480
+"""
+
+
+def test_stack_signature():
+    "Test identifying crashes by their stack"
+
+    assert stack_functions(BACKTRACE) == [
+        'bgp_process_main_one', 'thread_call', 'frr_run', 'main']
+
+    signature = stack_signature('bgpd', BACKTRACE)
+    assert signature.startswith('bgpd-')
+    # Addresses and arguments change between runs, the signature doesn't.
+    other = BACKTRACE.replace('0x000056250b1c1c2d', '0x000055550b1c1c2d')
+    other = other.replace('dest=0x5625', 'dest=0x7777')
+    assert stack_signature('bgpd', other) == signature
+    assert stack_signature('zebra', BACKTRACE) != signature
+    assert stack_signature('bgpd', BACKTRACE.replace(
+        'bgp_process_main_one', 'bgp_update')) != signature
+
+    # Nothing to identify the crash with.
+    assert stack_signature('bgpd', 'failed to run gdb') is None
+
+
+def test_unidentified_cores(tmpdir):
+    "Test the cores are kept and the unidentified crashes not grouped"
+
+    analyzer = CoreAnalyzer(processes=1)
+    corefiles = []
+    for index in range(2):
+        corefile = tmpdir.join('bgpd_core-{}.dmp'.format(index))
+        corefile.write('core')
+        corefiles.append(str(corefile))
+        analyzer.submit('r1', 'bgpd', '/nonexistent/bgpd', str(corefile))
+    # Routers restarts remove their old cores.
+    for corefile in corefiles:
+        os.remove(corefile)
+    kept = [core['kept'] for core in analyzer.cores]
+    assert all(os.path.isfile(path) for path in kept)
+
+    crashes = analyzer.analyse()
+    assert len(crashes) == 2
+    assert all(len(crash['cores']) == 1 for crash in crashes)
+    assert not any(os.path.exists(path) for path in kept)
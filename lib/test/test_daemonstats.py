@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+#
+# test_daemonstats.py
+# Tests for library functions: DaemonSampler and its parsers.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the daemon CPU/RSS sampler.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib import daemonstats
+from lib.daemonstats import (DaemonSampler, parse_proc_stat,
+                             parse_proc_status, rss_growth)
+
+PROC_STAT = ('1234 (bgpd (x)) S 1 1234 1234 0 -1 4194560 2000 0 0 0 '
+             '250 50 0 0 20 0 3 0 5000 300000000 2500 18446744073709551615')
+
+PROC_STATUS = """\
+Name:\tbgpd
+State:\tS (sleeping)
+VmRSS:\t   10240 kB
+Threads:\t3
+"""
+
+
+def test_parse_proc():
+    "Test the /proc/<pid>/stat and /proc/<pid>/status parsers"
+
+    cpu, threads = parse_proc_stat(PROC_STAT)
+    assert cpu == 300 / daemonstats.CLOCK_TICKS
+    assert threads == 3
+    assert parse_proc_status(PROC_STATUS) == (10240, 3)
+    assert parse_proc_status('Name:\tkthreadd\nThreads:\t1\n') == (0, 1)
+
+
+def test_rss_growth():
+    "Test the monotonic RSS growth detection"
+
+    def series(values):
+        return [(i, 'r1', 'bgpd', 10, 0.0, rss, 1)
+                for i, rss in enumerate(values)]
+
+    assert rss_growth(series([100, 100, 120, 130, 130])) == 30
+    assert rss_growth(series([100, 140, 120, 130, 150])) is None
+    assert rss_growth(series([100, 100, 100, 100, 100])) is None
+    assert rss_growth(series([100, 200])) is None
+
+
+def test_sampler(tmpdir):
+    "Test sampling the test process and saving the samples"
+
+    sampler = DaemonSampler()
+    sampler.register('r1', {'zebra': os.getpid()})
+    sampler.register('r2', {'bgpd': os.getpid()})
+    sampler.sample()
+    sampler.unregister('r2')
+    sampler.sample()
+
+    series = sampler.series()
+    assert sorted(series) == [('r1', 'zebra', os.getpid()),
+                              ('r2', 'bgpd', os.getpid())]
+    assert len(series[('r1', 'zebra', os.getpid())]) == 2
+    assert 'zebra' in sampler.summary()
+
+    csvpath = str(tmpdir.join('daemonstats.csv'))
+    sampler.write(csvpath)
+    with open(csvpath, 'r') as csvfile:
+        lines = csvfile.read().splitlines()
+    assert lines[0] == daemonstats.CSV_HEADER
+    assert len(lines) == 4
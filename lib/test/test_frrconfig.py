@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+#
+# test_frrconfig.py
+# Tests for library functions: FRR configuration differ.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the in-process FRR configuration parser and differ.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.frrconfig import Config, config_delta, daemon_configs
+
+RUNNING = """\
+Building configuration...
+
+Current configuration:
+!
+frr version 7.1
+frr defaults traditional
+hostname r1
+!
+ip route 10.0.20.1/32 10.0.0.2
+!
+interface lo
+ ip address 1.0.1.17/32
+!
+interface r1-eth0
+ ip address 10.0.0.1/24
+!
+router bgp 100
+ bgp router-id 1.0.1.17
+ no bgp network import-check
+ neighbor 10.0.0.2 remote-as 200
+ neighbor 10.0.0.2 timers 3 10
+ neighbor 10.0.0.3 remote-as 300
+ neighbor 10.0.0.3 timers 3 10
+ !
+ address-family ipv4 unicast
+  network 10.0.20.1/32
+  neighbor 10.0.0.3 route-map rmap out
+ exit-address-family
+!
+route-map rmap permit 10
+ match ip address prefix-list pf_list_1
+!
+line vty
+!
+end
+"""
+
+# Configuration files built by the test library have no indentation.
+TARGET = """\
+! FRR General Config
+hostname r1
+! Interfaces Config
+interface lo
+ip address 1.0.1.17/32
+interface r1-eth0
+ip address 10.0.0.1/24
+! Static Route Config
+ip route 10.0.30.1/32 10.0.0.2
+! Prefix List Config
+ip prefix-list pf_list_1 seq 10 permit 10.0.20.1/32
+! BGP Config
+router bgp 100
+bgp router-id 1.0.1.17
+no bgp network import-check
+neighbor 10.0.0.2 remote-as 200
+neighbor 10.0.0.2 timers 1 3
+address-family ipv4 unicast
+network 10.0.20.1/32
+network 10.0.30.1/32
+exit-address-family
+address-family ipv6 unicast
+neighbor 10.0.0.2 activate
+exit-address-family
+line vty
+"""
+
+
+def test_parse():
+    "Test splitting configurations in contexts"
+
+    config = Config(RUNNING)
+    assert list(config.contexts.keys()) == [
+        ('hostname r1',),
+        ('ip route 10.0.20.1/32 10.0.0.2',),
+        ('interface lo',), ('interface r1-eth0',),
+        ('router bgp 100',),
+        ('router bgp 100', 'address-family ipv4 unicast'),
+        ('route-map rmap permit 10',), ('line vty',),
+    ]
+    assert config.contexts[('router bgp 100', 'address-family ipv4 unicast')] == [
+        'network 10.0.20.1/32', 'neighbor 10.0.0.3 route-map rmap out']
+
+    target = Config(TARGET)
+    assert target.contexts[('interface lo',)] == ['ip address 1.0.1.17/32']
+    assert ('ip route 10.0.30.1/32 10.0.0.2',) in target.contexts
+    assert target.contexts[('router bgp 100', 'address-family ipv6 unicast')] == [
+        'neighbor 10.0.0.2 activate']
+
+    # Rendered configurations parse back to the same contexts.
+    assert Config(config.text()) == config
+    assert Config(target.text()) == target
+    assert config.section('interface r1-eth0') == (
+        'interface r1-eth0\n ip address 10.0.0.1/24\n!\n')
+
+
+# `show running-config` of a BGP router with address families and VNC
+RFAPI_RUNNING = """\
+Building configuration...
+
+Current configuration:
+!
+frr version 7.1
+frr defaults traditional
+hostname r1
+!
+router bgp 5226
+ bgp router-id 1.1.1.1
+ neighbor 2.2.2.2 remote-as 5226
+ !
+ address-family ipv4 unicast
+  redistribute vnc-direct
+  no neighbor 2.2.2.2 activate
+ exit-address-family
+ !
+ address-family ipv4 vpn
+  neighbor 2.2.2.2 activate
+ exit-address-family
+ !
+ rfp holddown-factor 0
+ !
+ vnc defaults
+  rd auto:vn:123
+  response-lifetime 45
+ exit-vnc
+!
+ip prefix-list pl seq 5 permit any
+!
+line vty
+!
+end
+"""
+
+
+def test_parse_indented():
+    "Test the indented '!' lines don't close the address families context"
+
+    config = Config(RFAPI_RUNNING)
+    assert list(config.contexts.keys()) == [
+        ('hostname r1',),
+        ('router bgp 5226',),
+        ('router bgp 5226', 'address-family ipv4 unicast'),
+        ('router bgp 5226', 'address-family ipv4 vpn'),
+        ('router bgp 5226', 'vnc defaults'),
+        ('ip prefix-list pl seq 5 permit any',),
+        ('line vty',),
+    ]
+    assert config.contexts[('router bgp 5226',)] == [
+        'bgp router-id 1.1.1.1', 'neighbor 2.2.2.2 remote-as 5226',
+        'rfp holddown-factor 0']
+    assert config.contexts[
+        ('router bgp 5226', 'address-family ipv4 unicast')] == [
+            'redistribute vnc-direct', 'no neighbor 2.2.2.2 activate']
+    assert config_delta(config, Config(config.text())) == []
+
+
+def test_section():
+    "Test rendering the contexts of a section"
+
+    config = Config(RFAPI_RUNNING)
+    section = config.section('router bgp')
+    assert section.splitlines() == [
+        'router bgp 5226',
+        ' bgp router-id 1.1.1.1',
+        ' neighbor 2.2.2.2 remote-as 5226',
+        ' rfp holddown-factor 0',
+        ' address-family ipv4 unicast',
+        '  redistribute vnc-direct',
+        '  no neighbor 2.2.2.2 activate',
+        ' exit-address-family',
+        ' address-family ipv4 vpn',
+        '  neighbor 2.2.2.2 activate',
+        ' exit-address-family',
+        ' vnc defaults',
+        '  rd auto:vn:123',
+        '  response-lifetime 45',
+        ' exit-vnc',
+        '!',
+    ]
+    assert config.section('ip prefix-list') == (
+        'ip prefix-list pl seq 5 permit any\n!\n')
+    assert config.section('route-map') == ''
+
+
+def test_config_delta():
+    "Test computing the commands between two configurations"
+
+    delta = config_delta(Config(RUNNING), Config(TARGET))
+    assert delta == [
+        'no ip route 10.0.20.1/32 10.0.0.2',
+        # The neighbor lines go away with the neighbor.
+        'router bgp 100',
+        'no neighbor 10.0.0.2 timers 3 10',
+        'no neighbor 10.0.0.3 remote-as 300',
+        'no route-map rmap permit 10',
+        'ip route 10.0.30.1/32 10.0.0.2',
+        'ip prefix-list pf_list_1 seq 10 permit 10.0.20.1/32',
+        'router bgp 100',
+        'neighbor 10.0.0.2 timers 1 3',
+        'router bgp 100',
+        'address-family ipv4 unicast',
+        'network 10.0.30.1/32',
+        'router bgp 100',
+        'address-family ipv6 unicast',
+        'neighbor 10.0.0.2 activate',
+    ]
+    assert config_delta(Config(RUNNING), Config(RUNNING)) == []
+
+
+def test_config_delta_unconfigurable():
+    "Test the lines frr-reload.py doesn't configure are left alone"
+
+    running = """\
+Building configuration...
+
+Current configuration:
+!
+frr version 7.1
+frr defaults traditional
+hostname r1
+log file zebra.log
+no service integrated-vtysh-config
+password zebra
+!
+ip route 10.0.20.1/32 10.0.0.2
+!
+line vty
+!
+end
+"""
+    target = """\
+hostname r1
+service integrated-vtysh-config
+password secret
+!
+ip route 10.0.20.1/32 10.0.0.2
+ip route 10.0.30.1/32 10.0.0.2
+!
+"""
+    assert config_delta(Config(running), Config(target)) == [
+        'no log file zebra.log',
+        'ip route 10.0.30.1/32 10.0.0.2',
+    ]
+
+
+def test_daemon_configs():
+    "Test splitting a configuration in daemons startup configurations"
+
+    configs = daemon_configs(Config(TARGET), ['zebra', 'staticd', 'bgpd'])
+    assert configs['staticd'] == (
+        'hostname r1\n!\nip route 10.0.30.1/32 10.0.0.2\n!\n'
+        'ip prefix-list pf_list_1 seq 10 permit 10.0.20.1/32\n!\nline vty\n!\n')
+    zebra = Config(configs['zebra'])
+    assert ('interface r1-eth0',) in zebra.contexts
+    assert ('router bgp 100',) not in zebra.contexts
+    bgpd = Config(configs['bgpd'])
+    assert ('interface r1-eth0',) not in bgpd.contexts
+    assert ('ip prefix-list pf_list_1 seq 10 permit 10.0.20.1/32',) in bgpd.contexts
+    assert bgpd.contexts[('router bgp 100', 'address-family ipv6 unicast')] == [
+        'neighbor 10.0.0.2 activate']
+
+    # Without staticd the static routes are zebra ones.
+    configs = daemon_configs(Config(TARGET), ['zebra', 'bgpd'])
+    assert 'ip route 10.0.30.1/32 10.0.0.2' in configs['zebra']
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+#
+# test_frrstats.py
+# Tests for library functions: FRR statistics parsers.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the FRR thread CPU and memory statistics.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.frrstats import parse_stats, stats_delta
+
+BEFORE = """\
+Thread statistics for zebra:
+
+Showing statistics for pthread main
+-----------------------------------
+                      CPU (user+system): Real (wall-clock):
+Active   Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+    0          1.462         7      208       383      210       385    T    zebra_main_router_id_update
+    1          0.345         2      172       174      173       175   R     vtysh_accept
+    0          1.807         9      200       383      201       385 RWTEX    TOTAL
+
+Showing statistics for pthread Zebra dplane thread
+--------------------------------------------------
+                      CPU (user+system): Real (wall-clock):
+Active   Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+    0          0.100         1      100       100      100       100    E    dplane_thread_loop
+
+Thread statistics for bgpd:
+
+Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+      2.000        10      200       300      200       300    T    bgp_start_timer
+Memory statistics for zebra:
+System allocator statistics:
+  Total heap allocated:  4764 KiB
+  Holding block headers: 0 bytes
+--- qmem libfrr ---
+Buffer                        :          3      24
+Hash                          :         10 variable
+--- qmem zebra ---
+Route Entry                   :         20      80
+Memory statistics for bgpd:
+--- qmem bgpd ---
+BGP attribute                 :          5      96
+"""
+
+AFTER = """\
+Thread statistics for zebra:
+
+Showing statistics for pthread main
+-----------------------------------
+Active   Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+    0          3.462        10      208       383      210       385    T    zebra_main_router_id_update
+    1          0.345         2      172       174      173       175   R     vtysh_accept
+    0          1.000         4      250       300      250       300    W    zserv_write
+
+Showing statistics for pthread Zebra dplane thread
+--------------------------------------------------
+Active   Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+    0          0.100         1      100       100      100       100    E    dplane_thread_loop
+
+Thread statistics for bgpd:
+
+Runtime(ms)   Invoked Avg uSec Max uSecs Avg uSec Max uSecs  Type  Thread
+      0.500         2      250       300      250       300    T    bgp_start_timer
+Memory statistics for zebra:
+--- qmem libfrr ---
+Buffer                        :          3      24
+Hash                          :         12 variable
+--- qmem zebra ---
+Route Entry                   :         15      80
+Memory statistics for bgpd:
+--- qmem bgpd ---
+BGP attribute                 :          5      96
+"""
+
+
+def test_parse_stats():
+    "Test parsing the thread CPU and memory statistics"
+
+    stats = parse_stats(BEFORE)
+    assert sorted(stats) == ['bgpd', 'zebra']
+    assert stats['zebra']['cpu'] == {
+        'main/zebra_main_router_id_update': {'runtime': 1.462, 'invoked': 7},
+        'main/vtysh_accept': {'runtime': 0.345, 'invoked': 2},
+        'Zebra dplane thread/dplane_thread_loop': {'runtime': 0.1,
+                                                   'invoked': 1},
+    }
+    assert stats['bgpd']['cpu'] == {
+        'main/bgp_start_timer': {'runtime': 2.0, 'invoked': 10},
+    }
+    assert stats['zebra']['memory'] == {
+        'libfrr/Buffer': 3,
+        'libfrr/Hash': 10,
+        'zebra/Route Entry': 20,
+    }
+    assert stats['bgpd']['memory'] == {'bgpd/BGP attribute': 5}
+
+
+def test_stats_delta():
+    "Test the statistics differences"
+
+    delta = stats_delta(parse_stats(BEFORE), parse_stats(AFTER))
+    assert delta['zebra']['cpu'] == [
+        {'handler': 'main/zebra_main_router_id_update', 'runtime': 2.0,
+         'invoked': 3},
+        {'handler': 'main/zserv_write', 'runtime': 1.0, 'invoked': 4},
+    ]
+    assert delta['zebra']['memory'] == [
+        {'type': 'libfrr/Hash', 'before': 10, 'after': 12, 'delta': 2},
+        {'type': 'zebra/Route Entry', 'before': 20, 'after': 15,
+         'delta': -5},
+    ]
+    # bgpd restarted: its counters started over.
+    assert delta['bgpd'] == {
+        'cpu': [{'handler': 'main/bgp_start_timer', 'runtime': 0.5,
+                 'invoked': 2}],
+        'memory': [],
+    }
+    assert stats_delta(parse_stats(AFTER), parse_stats(AFTER)) == {}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+#
+# test_logscan.py
+# Tests for library functions: LogScanner.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the incremental log scanner.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib import logscan
+from lib.logscan import LogScanner
+
+ASAN_ERROR = """\
+=================================================================
+==1234==ERROR: AddressSanitizer: heap-use-after-free on address 0x6020
+    #0 0x7f in bgp_process bgpd/bgp_route.c:2400
+==1234==ABORTING
+"""
+
+
+def append(path, text):
+    with open(path, 'a') as logfile:
+        logfile.write(text)
+
+
+def test_incremental_scan(tmpdir):
+    "Test reading and scanning only the appended lines"
+
+    path = str(tmpdir.join('bgpd.err'))
+    scanner = LogScanner(path)
+    assert scanner.update() == []
+    assert scanner.text == ''
+
+    append(path, 'bgpd starting\nmemsta')
+    assert scanner.update() == []
+    assert scanner.text == 'bgpd starting\nmemsta'
+
+    # The partial line is scanned once complete.
+    append(path, 'ts:  showing active allocations\n')
+    findings = scanner.update()
+    assert findings == [
+        ('memstats', 14, 'memstats:  showing active allocations')]
+    assert scanner.has('memstats')
+    assert not scanner.has('asan')
+
+    append(path, ASAN_ERROR)
+    assert [finding[0] for finding in scanner.update()] == ['asan']
+    assert scanner.text_from('asan').startswith(
+        '==1234==ERROR: AddressSanitizer: heap-use-after-free')
+    assert scanner.update() == []
+
+
+def test_truncation(tmpdir):
+    "Test reading again truncated and replaced files"
+
+    path = str(tmpdir.join('zebra.err'))
+    append(path, 'first line\nmemstats: leak\n')
+    scanner = LogScanner(path)
+    scanner.update()
+    assert scanner.has('memstats')
+
+    with open(path, 'w') as logfile:
+        logfile.write('new\n')
+    scanner.update()
+    assert scanner.text == 'new\n'
+    assert not scanner.has('memstats')
+
+    tmpdir.join('zebra.err').remove()
+    scanner.update()
+    assert scanner.text == ''
+
+
+def test_mmap_read(tmpdir, monkeypatch):
+    "Test reading big appends with mmap"
+
+    monkeypatch.setattr(logscan, 'MMAP_THRESHOLD', 16)
+    path = str(tmpdir.join('ospfd.log'))
+    lines = ''.join('line {}\n'.format(i) for i in range(100))
+    append(path, lines)
+    scanner = LogScanner(path)
+    assert scanner.read() == lines
+    append(path, 'Received signal 11 at 1560000000\n')
+    assert scanner.read().endswith('Received signal 11 at 1560000000\n')
+    assert scanner.has('crash')
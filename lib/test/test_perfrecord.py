@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+#
+# test_perfrecord.py
+# Tests for library functions: perf script stacks folding.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the perf recording helpers.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.perfrecord import collapse_perf_script
+
+PERF_SCRIPT = """\
+# ========
+# captured on: Thu Jan  1 00:00:00 2019
+# ========
+bgpd  1234 12345.678901:   10101010 cpu-clock:pppH:
+\t    7f0000001234 bgp_process_main_one+0x12 (/usr/lib/frr/bgpd)
+\t    7f0000005678 thread_call+0x50 (/usr/lib/libfrr.so.0.0.0)
+\t    7f0000009abc main+0x10 (/usr/lib/frr/bgpd)
+
+bgpd  1234 12345.688901:   10101010 cpu-clock:pppH:
+\t    7f0000001234 bgp_process_main_one+0x20 (/usr/lib/frr/bgpd)
+\t    7f0000005678 thread_call+0x50 (/usr/lib/libfrr.so.0.0.0)
+\t    7f0000009abc main+0x10 (/usr/lib/frr/bgpd)
+
+Zebra dplane 1240/1243 [001] 12345.698901:   10101010 cpu-clock:pppH:
+\t    7f000000dead [unknown] (/lib/x86_64-linux-gnu/libc-2.27.so)
+\t    7f000000beef dplane_thread_loop+0x4 (/usr/lib/frr/zebra)
+"""
+
+
+def test_collapse_perf_script():
+    "Test folding the perf script stacks"
+
+    stacks = collapse_perf_script(PERF_SCRIPT.splitlines())
+    assert stacks == {
+        'bgpd;main;thread_call;bgp_process_main_one': 2,
+        'Zebra_dplane;dplane_thread_loop;[libc-2.27.so]': 1,
+    }
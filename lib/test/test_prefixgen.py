@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+#
+# test_prefixgen.py
+# Tests for library functions: prefix range generation.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the prefix range generation.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+import random
+import ipaddress
+
+import pytest
+
+from lib.prefixgen import format_ipv6, prefix_ints, prefix_range
+
+
+def test_prefix_range():
+    "Test generating prefix ranges"
+
+    assert list(prefix_range('10.0.20.1/32', 3)) == [
+        '10.0.20.1/32', '10.0.20.2/32', '10.0.20.3/32']
+    assert list(prefix_range('10.0.255.0/24', 2, step=2)) == [
+        '10.0.255.0/24', '10.1.1.0/24']
+    # Host bits are cleared, addresses without length are host prefixes.
+    assert list(prefix_range('10.0.0.1/24', 1)) == ['10.0.0.0/24']
+    assert list(prefix_range('2001:db8::ffff', 2)) == [
+        '2001:db8::ffff/128', '2001:db8::1:0/128']
+    assert list(prefix_range('2001:db8::/64', 2)) == [
+        '2001:db8::/64', '2001:db8:0:1::/64']
+    assert list(prefix_range('10.0.0.0/8', 0)) == []
+
+    with pytest.raises(ValueError):
+        list(prefix_ints('255.255.255.0/24', 2))
+
+
+def test_format_ipv6():
+    "Test formatting IPv6 addresses like ipaddress"
+
+    values = [0, 1, 0xffff << 32, 0x20010db8 << 96]
+    for _ in range(1000):
+        value = 0
+        for _ in range(8):
+            value = (value << 16) | random.choice([0, 0, random.getrandbits(16)])
+        values.append(value)
+    for value in values:
+        assert format_ipv6(value) == str(ipaddress.IPv6Address(value))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+#
+# test_provision.py
+# Tests for library functions: provision_node() and its parsers.
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Tests for the batched node provisioning.
+"""
+
+import os
+import sys
+
+# Save the Current Working Directory to find lib files.
+CWD = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(CWD, '../../'))
+
+# pylint: disable=C0413
+from lib.provision import (link_local_address, parse_links, parse_addresses,
+                           provision_node)
+
+IP_LINK = """\
+1: lo: <LOOPBACK,UP,LOWER_UP> mtu 65536 qdisc noqueue state UNKNOWN mode DEFAULT group default qlen 1000\\    link/loopback 00:00:00:00:00:00 brd 00:00:00:00:00:00
+2: r1-eth0@if3: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP mode DEFAULT group default qlen 1000\\    link/ether 9a:0b:1c:2d:3e:4f brd ff:ff:ff:ff:ff:ff link-netnsid 0
+4: r1-eth1@if5: <BROADCAST,MULTICAST> mtu 1500 qdisc noop state DOWN mode DEFAULT group default qlen 1000\\    link/ether 02:00:00:00:00:01 brd ff:ff:ff:ff:ff:ff link-netnsid 0
+"""
+
+IP_ADDR = """\
+1: lo    inet 127.0.0.1/8 scope host lo\\       valid_lft forever preferred_lft forever
+2: r1-eth0    inet 10.0.1.1/24 brd 10.0.1.255 scope global r1-eth0\\       valid_lft forever preferred_lft forever
+2: r1-eth0    inet6 fe80::980b:1cff:fe2d:3e4f/64 scope link \\       valid_lft forever preferred_lft forever
+"""
+
+
+class FakeNode(object):
+    "Node shell replacement that answers the provisioning commands."
+
+    def __init__(self, name, outputs):
+        self.name = name
+        self.outputs = list(outputs)
+        self.commands = []
+        self.batches = []
+
+    def sendCmd(self, cmd):
+        self.commands.append(cmd)
+        for word in cmd.split():
+            if word.startswith('/tmp') and os.path.isfile(word):
+                with open(word) as fde:
+                    self.batches.append(fde.read())
+
+    def waitOutput(self):
+        return self.outputs.pop(0)
+
+
+def test_link_local_address():
+    "Test the EUI-64 link-local address generation"
+
+    assert link_local_address('9a:0b:1c:2d:3e:4f') == 'fe80::980b:1cff:fe2d:3e4f/64'
+    assert link_local_address('02:00:00:00:00:01') == 'fe80::ff:fe00:1/64'
+    assert link_local_address('00:00:00:00:00:00') == 'fe80::200:ff:fe00:0/64'
+
+
+def test_parsers():
+    "Test the 'ip -o' output parsers"
+
+    links = parse_links(IP_LINK)
+    assert sorted(links.keys()) == ['lo', 'r1-eth0', 'r1-eth1']
+    assert links['r1-eth0'] == {'up': True, 'mac': '9a:0b:1c:2d:3e:4f'}
+    assert links['r1-eth1']['up'] is False
+
+    addresses = parse_addresses(IP_ADDR)
+    assert addresses['r1-eth0'] == ['10.0.1.1/24', 'fe80::980b:1cff:fe2d:3e4f/64']
+    assert 'r1-eth1' not in addresses
+
+
+def test_provision_node():
+    "Test that only the missing changes are applied and then verified"
+
+    state = '@@links\n{}@@addrs\n{}@@sysctl:net.ipv4.ip_forward\n0\n'.format(
+        IP_LINK, IP_ADDR)
+    applied = '@@batch\n@@sysctl:net.ipv4.ip_forward\n1\n'
+    node = FakeNode('r1', [state, applied])
+
+    report = provision_node(node, sysctls=[('net.ipv4.ip_forward', 1)],
+                            flush=['r1-eth0', 'r1-eth1'], link_local=True,
+                            link_state={'r1-eth1': True})
+    assert report.ok, str(report)
+    assert len(node.commands) == 2
+    assert node.batches == [
+        'link set dev r1-eth1 up\n'
+        'address flush dev r1-eth0\n'
+        'address add fe80::200:ff:fe00:0/64 dev lo scope link\n'
+        'address add fe80::980b:1cff:fe2d:3e4f/64 dev r1-eth0 scope link\n'
+        'address add fe80::ff:fe00:1/64 dev r1-eth1 scope link\n'
+    ]
+    assert len(report.changes) == 6
+
+
+def test_provision_node_nothing_to_do():
+    "Test that nothing is applied when the node is already provisioned"
+
+    node = FakeNode('r1', ['@@sysctl:net.ipv4.ip_forward\n1\n'])
+    report = provision_node(node, sysctls=[('net.ipv4.ip_forward', 1)])
+    assert report.ok
+    assert report.changes == []
+    assert len(node.commands) == 1
+
+
+def test_provision_node_errors():
+    "Test that failed changes are reported"
+
+    node = FakeNode('r1', ['@@sysctl:fs.suid_dumpable\n0\n',
+                           '@@sysctl:fs.suid_dumpable\n0\n'])
+    report = provision_node(node, sysctls=[('fs.suid_dumpable', 1)])
+    assert not report.ok
+    assert 'fs.suid_dumpable' in report.errors[0]
@@ -47,7 +47,7 @@ import glob
 import grp
 import platform
 import pwd
-import subprocess
+import time
 import pytest
 
 from mininet.net import Mininet
@@ -55,6 +55,19 @@ from mininet.log import setLogLevel
 from mininet.cli import CLI
 
 from lib import topotest
+from lib import provision
+from lib.capabilities import get_capabilities
+from lib import topotrace
+from lib.apistats import instrument_api
+from lib import cmdbudget
+from lib.daemonstats import DaemonSampler
+from lib import frrstats
+from lib.perfrecord import PerfRecording
+from lib import logscan
+from lib import cfgcache
+from lib import frrconfig
+from lib import cfgpush
+from lib.prefixgen import prefix_range
 from lib.topolog import logger, logger_config
 
 CWD = os.path.dirname(os.path.realpath(__file__))
@@ -79,6 +92,18 @@ def set_topogen(tgen):
     global global_tgen
     global_tgen = tgen
 
+# Configuration checkpoint hooks, see register_checkpoint_hook().
+checkpoint_hooks = {}
+
+def register_checkpoint_hook(name, save, restore):
+    """
+    Registers functions to save and restore test library state together with
+    the routers configuration (see Topogen.config_checkpoint()):
+    * `save()`: returns a copy of the state
+    * `restore(state)`: restores the state returned by `save()`
+    """
+    checkpoint_hooks[name] = (save, restore)
+
 #
 # Main class: topology builder
 #
@@ -90,6 +115,30 @@ tgen_defaults = {
     'quaggadir': '/usr/lib/quagga',
     'routertype': 'frr',
     'memleak_path': None,
+    'switch_backend': 'ovs',
+    'config_rollback': 'false',
+    'trace': 'false',
+    'vtysh_budget_commands': None,
+    'vtysh_budget_vtysh': None,
+    'vtysh_budget_bytes': None,
+    'vtysh_budget_time': None,
+    'vtysh_budget_action': 'warn',
+    'daemon_stats_interval': '0',
+    'frr_stats': 'false',
+    'config_engine': 'python',
+    'config_coalesce': 'true',
+    'startup_config': 'false',
+    'config_cache': 'true',
+    'config_check': 'true',
+}
+
+# Switch backends: the switch class used by add_switch() when none is given.
+# The 'veth' backend uses Linux bridges, but segments with exactly two
+# members are replaced by a direct veth pair between them.
+SWITCH_BACKENDS = {
+    'ovs': topotest.LegacySwitch,
+    'bridge': topotest.LinuxBridge,
+    'veth': topotest.LinuxBridge,
 }
 
 class Topogen(object):
@@ -110,15 +159,32 @@ class Topogen(object):
         self.routern = 1
         self.switchn = 1
         self.modname = modname
+        # pytest-xdist support: each worker uses its own log tree and
+        # prefixes root namespace names (switches and their interfaces).
+        self.worker = topotest.get_worker_id()
+        self.prefix = topotest.get_worker_prefix()
+        self.logdir = os.path.join(topotest.get_topotests_dir(), modname)
         self.errorsd = {}
         self.errors = ''
         self.peern = 1
-        self._init_topo(cls)
+        self.switch_backend = None
+        self.checkpoints = {}
+        self.sampler = None
+        # Load the default topology configurations
+        self._load_config()
+        if self.is_trace_enabled():
+            topotrace.start_trace(modname)
+        with topotrace.span('Topogen.__init__'):
+            self._init_topo(cls)
         logger.info('loading topology: {}'.format(self.modname))
 
-    @staticmethod
-    def _mininet_reset():
+    def _mininet_reset(self):
         "Reset the mininet environment"
+        # 'mn -c' removes every mininet resource on the host, including the
+        # ones owned by topologies running in other pytest-xdist workers.
+        if self.worker is not None:
+            return
+
         # Clean up the mininet environment
         os.system('mn -c > /dev/null 2>&1')
 
@@ -138,13 +204,17 @@ class Topogen(object):
             logger.info('MPLS tests will not run (missing mpls-iptunnel kernel module)')
         else:
             self.hasmpls = True
-        # Load the default topology configurations
-        self._load_config()
+        self.set_switch_backend(
+            os.environ.get('TOPOTESTS_SWITCH_BACKEND') or
+            self.config.get(self.CONFIG_SECTION, 'switch_backend'))
 
         # Initialize the API
         self._mininet_reset()
-        cls()
-        self.net = Mininet(controller=None, topo=self.topo)
+        with topotrace.span('topology build'):
+            cls()
+            self._build_switches()
+        with topotrace.span('Mininet()'):
+            self.net = Mininet(controller=None, topo=self.topo)
         for gear in self.gears.values():
             gear.net = self.net
 
@@ -181,11 +251,30 @@ class Topogen(object):
         self.routern += 1
         return self.gears[name]
 
-    def add_switch(self, name=None, cls=topotest.LegacySwitch):
+    def set_switch_backend(self, backend):
+        """
+        Selects the switch implementation used by add_switch() when no switch
+        class is specified. Possible `backend` values are:
+        * 'ovs': Open vSwitch in standalone mode (default)
+        * 'bridge': kernel Linux bridges
+        * 'veth': kernel Linux bridges, except for segments with exactly two
+          members which become a direct veth pair
+
+        Must be called before the switches are added (e.g. at the beginning
+        of the topology build() method).
+        """
+        if backend not in SWITCH_BACKENDS:
+            raise ValueError('unknown switch backend "{}"'.format(backend))
+        if self.switch_backend != backend:
+            logger.info('using switch backend: {}'.format(backend))
+        self.switch_backend = backend
+
+    def add_switch(self, name=None, cls=None):
         """
         Adds a new switch to the topology. This function has the following
         options:
         name: (optional) select the switch name
+        cls: (optional) switch class, defaults to the switch backend class
         Returns the switch name and number.
         """
         if name is None:
@@ -193,7 +282,12 @@ class Topogen(object):
         if name in self.gears:
             raise KeyError('switch already exists')
 
-        self.gears[name] = TopoSwitch(self, cls, name)
+        collapsible = False
+        if cls is None:
+            cls = SWITCH_BACKENDS[self.switch_backend]
+            collapsible = self.switch_backend == 'veth'
+
+        self.gears[name] = TopoSwitch(self, cls, name, collapsible)
         self.switchn += 1
         return self.gears[name]
 
@@ -233,9 +327,50 @@ class Topogen(object):
 
         node1.register_link(ifname1, node2, ifname2)
         node2.register_link(ifname2, node1, ifname1)
-        self.topo.addLink(node1.name, node2.name,
+
+        # Switch links are created once we know all the switch members, see
+        # _build_switches().
+        if isinstance(node1, TopoSwitch) or isinstance(node2, TopoSwitch):
+            return
+
+        self.topo.addLink(node1.mnname, node2.mnname,
                           intfName1=ifname1, intfName2=ifname2)
 
+    def _build_switches(self):
+        """
+        Adds the switches and their links to the mininet topology. Switches
+        using the 'veth' backend with exactly two members are not created,
+        their members get linked to each other with a veth pair instead.
+        """
+        done = set()
+        for name in sorted(self.switches()):
+            switch = self.gears[name]
+            members = [(node, nodeif) for node, nodeif in switch.links.values()
+                       if not isinstance(node, TopoSwitch)]
+            if (switch.collapsible and len(switch.links) == 2 and
+                    len(members) == 2):
+                (node1, ifname1), (node2, ifname2) = members
+                logger.debug('switch "{}" replaced by veth pair {}<->{}'.format(
+                    name, ifname1, ifname2))
+                switch.collapsed = True
+                self.topo.addLink(node1.mnname, node2.mnname,
+                                  intfName1=ifname1, intfName2=ifname2)
+                continue
+
+            self.topo.addSwitch(switch.mnname, cls=switch.cls)
+
+        for name in sorted(self.switches()):
+            switch = self.gears[name]
+            if switch.collapsed:
+                continue
+            for myif, (node, nodeif) in sorted(switch.links.iteritems()):
+                # Switch to switch links are seen from both sides
+                if (node.name, nodeif) in done:
+                    continue
+                done.add((name, myif))
+                self.topo.addLink(switch.mnname, node.mnname,
+                                  intfName1=myif, intfName2=nodeif)
+
     def get_gears(self, geartype):
         """
         Returns a dictionary of all gears of type `geartype`.
@@ -266,6 +401,13 @@ class Topogen(object):
         """
         return self.get_gears(TopoRouter)
 
+    def switches(self):
+        """
+        Returns the switch dictionary (key is the switch name and value is the
+        switch object itself).
+        """
+        return self.get_gears(TopoSwitch)
+
     def exabgp_peers(self):
         """
         Returns the exabgp peer dictionary (key is the peer name and value is
@@ -295,22 +437,34 @@ class Topogen(object):
             setLogLevel(log_level)
 
         logger.info('starting topology: {}'.format(self.modname))
-        self.net.start()
+        with topotrace.span('net.start()'):
+            self.net.start()
 
     def start_router(self, router=None):
         """
         Call the router startRouter method.
         If no router is specified it is called for all registred routers.
         """
-        if router is None:
-            # pylint: disable=r1704
-            for _, router in self.routers().iteritems():
-                router.start()
-        else:
-            if isinstance(router, str):
-                router = self.gears[router]
+        with topotrace.span('start_router'):
+            if router is None:
+                # Remove the interfaces addresses of all routers at once, the
+                # routers will find nothing left to do when starting.
+                nrouters = [self.net[rname] for rname in sorted(self.routers())]
+                for report in provision.provision_nodes(
+                        nrouters,
+                        flush=dict((nrouter.name, nrouter.intfNames())
+                                   for nrouter in nrouters)).values():
+                    if not report.ok:
+                        logger.error(str(report))
+
+                # pylint: disable=r1704
+                for _, router in self.routers().iteritems():
+                    router.start()
+            else:
+                if isinstance(router, str):
+                    router = self.gears[router]
 
-            router.start()
+                router.start()
 
     def stop_topology(self):
         """
@@ -321,15 +475,27 @@ class Topogen(object):
         killed and try with a different signal.
         """
         logger.info('stopping topology: {}'.format(self.modname))
-        errors = ""
-        for gear in self.gears.values():
-            gear.stop(False, False)
-        for gear in self.gears.values():
-            errors += gear.stop(True, False)
-        if len(errors) > 0:
-            assert "Errors found post shutdown - details follow:" == 0, errors
-
-        self.net.stop()
+        try:
+            self._stop_daemon_sampler()
+            with topotrace.span('stop_topology'):
+                errors = ""
+                for gear in self.gears.values():
+                    gear.stop(False, False)
+                for gear in self.gears.values():
+                    errors += gear.stop(True, False)
+                if len(errors) > 0:
+                    assert "Errors found post shutdown - details follow:" == 0, errors
+
+                self.net.stop()
+        finally:
+            tracefile = topotrace.stop_trace(os.path.join(self.logdir, 'trace.json'))
+            if tracefile is not None:
+                logger.info('lifecycle trace saved to {}'.format(tracefile))
+            logscan.forget(self.logdir)
+
+            # Don't leak this topology into the next module run by this process.
+            if get_topogen() is self:
+                set_topogen(None)
 
     def mininet_cli(self):
         """
@@ -342,6 +508,239 @@ class Topogen(object):
 
         CLI(self.net)
 
+    def run_parallel(self, commands):
+        """
+        Runs shell commands in several gears at once. `commands` is a
+        dictionary of gear name to the command string. Returns a dictionary
+        of gear name to the command output.
+        """
+        nodes = []
+        for name, command in sorted(commands.iteritems()):
+            node = self.net[self.gears[name].mnname]
+            node.sendCmd(command)
+            nodes.append((name, node))
+
+        outputs = {}
+        for name, node in nodes:
+            start = time.time()
+            outputs[name] = node.waitOutput()
+            cmdbudget.record_command(name, outputs[name], time.time() - start)
+        return outputs
+
+    def get_running_configs(self, routers=None):
+        """
+        Returns a dictionary of router name to its running configuration text.
+        All routers are queried at once. `routers` optionally selects the list
+        of routers, otherwise all routers are used.
+        """
+        if routers is None:
+            routers = self.routers().keys()
+        outputs = self.run_parallel(dict(
+            (rname, 'vtysh -c "show running-config" 2>/dev/null')
+            for rname in routers))
+        return dict((rname, topotest.clean_running_config(output))
+                    for rname, output in outputs.iteritems())
+
+    def get_frr_stats(self, routers=None):
+        """
+        Returns a dictionary of router name to its daemons thread CPU and
+        memory statistics (see lib/frrstats.py). All routers are queried at
+        once. `routers` optionally selects the list of routers, otherwise
+        all routers are used.
+        """
+        if routers is None:
+            routers = self.routers().keys()
+        outputs = self.run_parallel(dict(
+            (rname, frrstats.STATS_COMMAND) for rname in routers))
+        return dict((rname, frrstats.parse_stats(output))
+                    for rname, output in outputs.iteritems())
+
+    def config_checkpoint(self, name):
+        """
+        Saves the running configuration of all routers, and the test library
+        state registered with register_checkpoint_hook(), as checkpoint `name`.
+        See config_rollback().
+        """
+        logger.info('saving configuration checkpoint "{}"'.format(name))
+        self.checkpoints[name] = {
+            'configs': self.get_running_configs(),
+            'state': dict((hook, save()) for hook, (save, _)
+                          in checkpoint_hooks.iteritems()),
+        }
+
+    def config_rollback(self, name):
+        """
+        Restores all routers configuration to the checkpoint `name` without
+        restarting the daemons: only the commands that revert the changes
+        made since the checkpoint are sent to the routers, in parallel.
+
+        Returns a string with the errors found or an empty string.
+        """
+        if name not in self.checkpoints:
+            raise KeyError('configuration checkpoint "{}" does not exist'.format(name))
+        checkpoint = self.checkpoints[name]
+
+        for hook, state in checkpoint['state'].iteritems():
+            if hook in checkpoint_hooks:
+                checkpoint_hooks[hook][1](state)
+
+        configs = checkpoint['configs']
+        if not configs:
+            return ''
+
+        running = self.get_running_configs(configs.keys())
+        for rname, config in running.items():
+            # vtysh has no output when the router daemons are not running.
+            if not config.strip():
+                logger.warning('{}: not running, skipping rollback'.format(rname))
+                del running[rname]
+
+        nrouter = self.net[self.gears[sorted(configs.keys())[0]].mnname]
+        reload_path = os.path.join(nrouter.daemondir, 'frr-reload.py')
+        deltas = topotest.get_config_deltas(
+            dict((rname, (running[rname], configs[rname]))
+                 for rname in running), reload_path, self.get_config_engine(),
+            self.get_config_cache())
+
+        fnames = {}
+        for rname, delta in deltas.iteritems():
+            if not delta:
+                continue
+            logger.info('{}: rolling back {} configuration lines to "{}"'.format(
+                rname, len(delta), name))
+            fnames[rname] = topotest.get_file(
+                'configure terminal\n{}\nend\n'.format('\n'.join(delta)))
+
+        outputs = self.run_parallel(dict(
+            (rname, 'vtysh < {}'.format(fname))
+            for rname, fname in fnames.iteritems()))
+        map(os.unlink, fnames.values())
+        for rname in fnames:
+            self.gears[rname].running_config = None
+
+        errors = ''
+        for rname, output in sorted(outputs.iteritems()):
+            failed = [line for line in output.splitlines()
+                      if line.startswith('%')]
+            if failed:
+                errors += '{}: rollback to "{}" failed:\n{}\n'.format(
+                    rname, name, '\n'.join(failed))
+        if errors:
+            logger.error(errors)
+        return errors
+
+    def _get_bool_option(self, env, option):
+        """
+        Returns the boolean value of the `pytest.ini` `option`, overridden by
+        the `env` environment variable when it is set (e.g. `0` or `off`
+        disable an option enabled in `pytest.ini`).
+        """
+        value = os.environ.get(env) or self.config.get(self.CONFIG_SECTION, option)
+        return value.strip().lower() in ['1', 'true', 'yes', 'on']
+
+    def is_config_rollback_enabled(self):
+        """
+        Returns `True` if the routers configuration must be rolled back after
+        each test, otherwise `False`.
+        """
+        return self._get_bool_option('TOPOTESTS_CONFIG_ROLLBACK', 'config_rollback')
+
+    def get_config_engine(self):
+        """
+        Returns the engine computing the configuration deltas: 'python' (the
+        in-process differ, see lib/frrconfig.py) or 'frr-reload'.
+        """
+        engine = (os.environ.get('TOPOTESTS_CONFIG_ENGINE') or
+                  self.config.get(self.CONFIG_SECTION, 'config_engine'))
+        if engine not in ['python', 'frr-reload']:
+            raise ValueError('invalid config_engine "{}"'.format(engine))
+        return engine
+
+    def is_config_coalesce_enabled(self):
+        """
+        Returns `True` if the JSON topologies configuration must be pushed
+        once per router, all routers at once, otherwise `False`.
+        """
+        return self._get_bool_option('TOPOTESTS_CONFIG_COALESCE', 'config_coalesce')
+
+    def is_startup_config_enabled(self):
+        """
+        Returns `True` if the JSON topologies routers must be started with
+        their complete configuration, otherwise `False`.
+        """
+        return self._get_bool_option('TOPOTESTS_STARTUP_CONFIG', 'startup_config')
+
+    def is_config_check_enabled(self):
+        """
+        Returns `True` if the JSON topologies configuration must be checked
+        with `vtysh -C` before it is pushed, otherwise `False`.
+        """
+        return self._get_bool_option('TOPOTESTS_CONFIG_CHECK', 'config_check')
+
+    def get_config_cache(self):
+        """
+        Returns the configuration builds and deltas cache (see
+        lib/cfgcache.py) or `None` when it is disabled.
+        """
+        if not self._get_bool_option('TOPOTESTS_CONFIG_CACHE', 'config_cache'):
+            return None
+        return cfgcache.get_cache()
+
+    def get_vtysh_budget(self):
+        """
+        Returns the tests default command budget configured in `pytest.ini`,
+        see lib/cmdbudget.py.
+        """
+        values = dict((key, self.config.get(self.CONFIG_SECTION,
+                                            'vtysh_budget_{}'.format(key)))
+                      for key in cmdbudget.BUDGET_KEYS + ['action'])
+        return cmdbudget.parse_budget(values)
+
+    def get_daemon_sampler(self):
+        """
+        Returns the daemon CPU/RSS sampler (started on first use) or `None`
+        if sampling is disabled. See lib/daemonstats.py.
+        """
+        if self.sampler is None:
+            interval = float(
+                os.environ.get('TOPOTESTS_DAEMON_STATS_INTERVAL') or
+                self.config.get(self.CONFIG_SECTION, 'daemon_stats_interval'))
+            if interval <= 0:
+                return None
+            self.sampler = DaemonSampler(interval)
+            self.sampler.start()
+        return self.sampler
+
+    def _stop_daemon_sampler(self):
+        "Stops the daemon sampler, saves its samples and reports RSS growths."
+        if self.sampler is None:
+            return
+        sampler = self.sampler
+        self.sampler = None
+        sampler.stop()
+
+        csvpath = os.path.join(self.logdir, 'daemonstats.csv')
+        sampler.write(csvpath)
+        logger.info('daemon statistics saved to {}:\n{}'.format(
+            csvpath, sampler.summary()))
+        for rname, daemon, pid, growth in sampler.growing():
+            logger.warning('{}: {} (pid {}) RSS grew monotonically by {} kB'.format(
+                rname, daemon, pid, growth))
+
+    def is_frr_stats_enabled(self):
+        """
+        Returns `True` if the daemons thread CPU and memory statistics must
+        be collected around each test, otherwise `False`.
+        """
+        return self._get_bool_option('TOPOTESTS_FRR_STATS', 'frr_stats')
+
+    def is_trace_enabled(self):
+        """
+        Returns `True` if the lifecycle trace must be recorded, otherwise
+        `False`. See lib/topotrace.py.
+        """
+        return self._get_bool_option('TOPOTESTS_TRACE', 'trace')
+
     def is_memleak_enabled(self):
         "Returns `True` if memory leak report is enable, otherwise `False`."
         # On router failure we can't run the memory leak test
@@ -387,6 +786,16 @@ class Topogen(object):
         if self.has_errors():
             return True
 
+        # Read the pidfiles of the routers whose daemons aren't watched yet
+        # at once, the daemons liveness is then checked without commands.
+        nrouters = dict((rname, self.net[rname]) for rname in self.routers())
+        outputs = self.run_parallel(dict(
+            (rname, nrouter.daemonPidsCommand())
+            for rname, nrouter in nrouters.iteritems()
+            if nrouter.needsDaemonPids()))
+        for rname, output in outputs.iteritems():
+            nrouters[rname].watchDaemons(nrouters[rname].parseDaemonPids(output))
+
         errors = ''
         router_list = self.routers().values()
         for router in router_list:
@@ -410,6 +819,9 @@ class TopoGear(object):
     def __init__(self):
         self.tgen = None
         self.name = None
+        # Name used by mininet, only differs from `name` for gears living
+        # in the root namespace (see `Topogen.prefix`).
+        self.mnname = None
         self.cls = None
         self.links = {}
         self.linkn = 0
@@ -438,7 +850,10 @@ class TopoGear(object):
         Runs the provided command string in the router and returns a string
         with the response.
         """
-        return self.tgen.net[self.name].cmd(command)
+        start = time.time()
+        output = self.tgen.net[self.mnname].cmd(command)
+        cmdbudget.record_command(self.name, output, time.time() - start)
+        return output
 
     def add_link(self, node, myif=None, nodeif=None):
         """
@@ -492,7 +907,7 @@ class TopoGear(object):
 
         NOTE: This function should only be called by Topogen.
         """
-        ifname = '{}-eth{}'.format(self.name, self.linkn)
+        ifname = '{}-eth{}'.format(self.mnname, self.linkn)
         self.linkn += 1
         return ifname
 
@@ -507,6 +922,12 @@ class TopoGear(object):
 
         self.links[myif] = (node, nodeif)
 
+# Maximum vtysh command text size recorded in the lifecycle trace
+TRACE_COMMAND_SIZE = 512
+
+# Seconds between the FIB route count checks of the sharpd route injection
+SHARP_POLL_INTERVAL = 0.5
+
 class TopoRouter(TopoGear):
     """
     Router abstraction.
@@ -534,6 +955,7 @@ class TopoRouter(TopoGear):
     RD_EIGRP = 10
     RD_NHRP = 11
     RD_STATIC = 12
+    RD_SHARP = 13
     RD = {
         RD_ZEBRA: 'zebra',
         RD_RIP: 'ripd',
@@ -547,6 +969,7 @@ class TopoRouter(TopoGear):
         RD_EIGRP: 'eigrpd',
         RD_NHRP: 'nhrpd',
         RD_STATIC: 'staticd',
+        RD_SHARP: 'sharpd',
     }
 
     def __init__(self, tgen, cls, name, **params):
@@ -562,6 +985,7 @@ class TopoRouter(TopoGear):
         self.tgen = tgen
         self.net = None
         self.name = name
+        self.mnname = name
         self.cls = cls
         self.options = {}
         self.routertype = params.get('routertype', 'frr')
@@ -569,9 +993,15 @@ class TopoRouter(TopoGear):
             params['privateDirs'] = self.PRIVATE_DIRS
 
         self.options['memleak_path'] = params.get('memleak_path', None)
+        # Last known running configuration (lib/frrconfig.py Config), kept
+        # by the configuration loading API. `None` when unknown.
+        self.running_config = None
+        # Configuration the daemons were started with when it was rendered
+        # from a JSON topology (see topojson.build_startup_config_from_json)
+        self.startup_config = None
 
         # Create new log directory
-        self.logdir = '/tmp/topotests/{}'.format(self.tgen.modname)
+        self.logdir = self.tgen.logdir
         # Clean up before starting new log files: avoids removing just created
         # log files.
         self._prepare_tmpfiles()
@@ -581,7 +1011,7 @@ class TopoRouter(TopoGear):
         #setup the per node directory
         dir = '{}/{}'.format(self.logdir, self.name)
         os.system('mkdir -p ' + dir)
-        os.system('chmod -R go+rw /tmp/topotests')
+        os.system('chmod -R go+rw {}'.format(topotest.get_topotests_dir()))
 
         # Open router log file
         logfile = '{0}/{1}.log'.format(dir, name)
@@ -631,7 +1061,7 @@ class TopoRouter(TopoGear):
         Possible daemon values are: TopoRouter.RD_ZEBRA, TopoRouter.RD_RIP,
         TopoRouter.RD_RIPNG, TopoRouter.RD_OSPF, TopoRouter.RD_OSPF6,
         TopoRouter.RD_ISIS, TopoRouter.RD_BGP, TopoRouter.RD_LDP,
-        TopoRouter.RD_PIM.
+        TopoRouter.RD_PIM, TopoRouter.RD_STATIC, TopoRouter.RD_SHARP.
         """
         daemonstr = self.RD.get(daemon)
         self.logger.info('loading "{}" configuration: {}'.format(daemonstr, source))
@@ -654,16 +1084,22 @@ class TopoRouter(TopoGear):
         * Configure daemon logging files
         """
         self.logger.debug('starting')
+        self.running_config = None
         nrouter = self.tgen.net[self.name]
-        result = nrouter.startRouter(self.tgen)
+        with topotrace.span('start', track=self.name):
+            result = nrouter.startRouter(self.tgen)
 
-        # Enable all daemon command logging, logging files
-        # and set them to the start dir.
-        for daemon, enabled in nrouter.daemons.iteritems():
-            if enabled == 0:
-                continue
-            self.vtysh_cmd('configure terminal\nlog commands\nlog file {}.log'.format(
-                daemon), daemon=daemon)
+            # Enable all daemon command logging, logging files
+            # and set them to the start dir.
+            for daemon, enabled in nrouter.daemons.iteritems():
+                if enabled == 0:
+                    continue
+                self.vtysh_cmd('configure terminal\nlog commands\nlog file {}.log'.format(
+                    daemon), daemon=daemon)
+
+        sampler = self.tgen.get_daemon_sampler()
+        if sampler is not None:
+            sampler.register(self.name, nrouter.get_daemon_pids())
 
         if result != '':
             self.tgen.set_error(result)
@@ -676,6 +1112,9 @@ class TopoRouter(TopoGear):
         * Kill daemons
         """
         self.logger.debug('stopping')
+        self.running_config = None
+        if self.tgen.sampler is not None:
+            self.tgen.sampler.unregister(self.name)
         return self.tgen.net[self.name].stopRouter(wait, assertOnError)
 
     def sendSigTerm(self, wait=True, assertOnError=True):
@@ -684,8 +1123,34 @@ class TopoRouter(TopoGear):
         * Kill daemons forcefully by sigterm
         """
         self.logger.debug('stopping by sigterm')
+        self.running_config = None
         return self.tgen.net[self.name].sendSigTermToRouter(wait, assertOnError)
 
+    def get_running_config_tree(self, refresh=False):
+        """
+        Returns the parsed running configuration (lib/frrconfig.py Config).
+        It is only read from the router when unknown (the router restarted or
+        was configured outside of the configuration API) or when `refresh`
+        is `True`, and is kept up to date by the configuration API.
+        """
+        if refresh or self.running_config is None:
+            output = self.run('vtysh -c "show running-config" 2>/dev/null')
+            self.running_config = frrconfig.Config(
+                topotest.clean_running_config(output))
+        return self.running_config
+
+    def get_running_config(self, section=None, refresh=False):
+        """
+        Returns the running configuration text, or only the text of the
+        contexts whose first line starts with `section` (e.g. 'router bgp',
+        'interface r1-eth0', 'route-map'). See get_running_config_tree().
+        """
+        config = self.get_running_config_tree(refresh)
+        if section is None:
+            return config.text()
+        return config.section(section)
+
+    @instrument_api(router=lambda self, *args, **kwargs: self.name)
     def vtysh_cmd(self, command, isjson=False, daemon=None):
         """
         Runs the provided command string in the vty shell and returns a string
@@ -703,8 +1168,11 @@ class TopoRouter(TopoGear):
             dparam += '-d {}'.format(daemon)
 
         vtysh_command = 'vtysh {} -c "{}" 2>/dev/null'.format(dparam, command)
+        cmdbudget.record_vtysh(self.name, daemon)
 
-        output = self.run(vtysh_command)
+        with topotrace.span('vtysh', track=self.name,
+                            command=command[:TRACE_COMMAND_SIZE]):
+            output = self.run(vtysh_command)
         self.logger.info('\nvtysh command => {}\nvtysh output <= {}'.format(
             command, output))
         if isjson is False:
@@ -716,6 +1184,7 @@ class TopoRouter(TopoGear):
             logger.warning('vtysh_cmd: failed to convert json output')
             return {}
 
+    @instrument_api(router=lambda self, *args, **kwargs: self.name)
     def vtysh_multicmd(self, commands, pretty_output=True, daemon=None):
         """
         Runs the provided commands in the vty shell and return the result of
@@ -725,6 +1194,11 @@ class TopoRouter(TopoGear):
         True it will show the command as they were executed in the vty shell,
         otherwise it will only show lines that failed.
         """
+        # Configuration changes made outside of the configuration loading
+        # API make the known running configuration stale.
+        if any(line.strip().startswith('conf') for line in commands.splitlines()):
+            self.running_config = None
+
         # Prepare the temporary file that will hold the commands
         fname = topotest.get_file(commands)
 
@@ -739,7 +1213,10 @@ class TopoRouter(TopoGear):
             vtysh_command = 'vtysh {} -f {}'.format(dparam, fname)
 
 	    print("vtysh_command...", vtysh_command)
-        res = self.run(vtysh_command)
+        cmdbudget.record_vtysh(self.name, daemon)
+        with topotrace.span('vtysh', track=self.name,
+                            command=commands[:TRACE_COMMAND_SIZE]):
+            res = self.run(vtysh_command)
         os.unlink(fname)
 
         self.logger.info('\nvtysh command => "{}"\nvtysh output <= "{}"'.format(
@@ -747,6 +1224,190 @@ class TopoRouter(TopoGear):
 
         return res
 
+    @instrument_api(router=lambda self, *args, **kwargs: self.name)
+    def vtysh_push(self, lines, chunk_lines=cfgpush.CHUNK_LINES):
+        """
+        Applies the configuration `lines` (commands to run in the
+        configuration mode, without 'configure terminal') with `vtysh -f`,
+        in chunks of `chunk_lines` commands. Only the failures are logged,
+        see lib/cfgpush.py.
+
+        Returns a dictionary with the number of 'lines' pushed, the
+        'seconds' it took, the 'rate' (lines per second) and the 'errors'
+        list of (line number, command, message) tuples.
+        """
+        self.running_config = None
+        chunks = cfgpush.split_chunks(lines, chunk_lines)
+        total = sum(len(chunk) for chunk in chunks)
+        errors = []
+        pushed = 0
+        start = time.time()
+        for chunk in chunks:
+            fname = topotest.get_file(cfgpush.chunk_text(chunk))
+            cmdbudget.record_vtysh(self.name, None)
+            with topotrace.span('vtysh', track=self.name,
+                                command='vtysh -f ({} lines)'.format(len(chunk))):
+                output = self.run('vtysh -f {} 2>&1'.format(fname))
+            os.unlink(fname)
+
+            chunk_errors = cfgpush.parse_errors(output, chunk)
+            for lineno, command, message in chunk_errors:
+                self.logger.warning('vtysh push line {}: {}: {}'.format(
+                    lineno, command, message))
+            errors.extend(chunk_errors)
+
+            pushed += len(chunk)
+            elapsed = time.time() - start
+            self.logger.info('vtysh push: {}/{} lines ({:.0f} lines/s)'.format(
+                pushed, total, pushed / elapsed if elapsed > 0 else pushed))
+
+        elapsed = time.time() - start
+        return {
+            'lines': total,
+            'seconds': elapsed,
+            'rate': total / elapsed if elapsed > 0 else float(total),
+            'errors': errors,
+        }
+
+    def profile(self, daemons=None, duration=None, name='perf'):
+        """
+        Records the router daemons with `perf record -g` and saves the
+        `perf.data` and folded stacks files in the router log directory as
+        `<name>.data` and `<name>.folded`. See lib/perfrecord.py.
+        * `daemons`: daemon name or list of daemon names, defaults to all
+        * `duration`: when specified, records for `duration` seconds,
+          otherwise returns a context manager recording its execution
+
+        Usage example:
+
+            with router.profile('bgpd', name='clear-bgp'):
+                router.vtysh_cmd('clear bgp *')
+        """
+        pids = self.tgen.net[self.name].get_daemon_pids()
+        if daemons is not None:
+            if isinstance(daemons, str):
+                daemons = [daemons]
+            pids = dict((daemon, pid) for daemon, pid in pids.iteritems()
+                        if daemon in daemons)
+
+        recording = PerfRecording(
+            self.name, pids, os.path.join(self.logdir, self.name, name))
+        if duration is None:
+            return recording
+
+        with recording:
+            topotest.sleep(duration, '{}: recording with perf'.format(self.name))
+        return recording
+
+    def sharp_route_count(self, ipv6=False):
+        "Returns the number of sharpd routes installed in the FIB."
+        summary = self.vtysh_cmd('show {} route summary json'.format(
+            'ipv6' if ipv6 else 'ip'), isjson=True)
+        for route in summary.get('routes', []):
+            if route.get('type') == 'sharp':
+                return route.get('fib', 0)
+        return 0
+
+    def sharp_route_installed(self, prefix):
+        "Returns whether the sharpd route `prefix` is installed in the FIB."
+        routes = self.vtysh_cmd('show {} route {} json'.format(
+            'ipv6' if ':' in prefix else 'ip', prefix), isjson=True)
+        return any(route.get('protocol') == 'sharp' and route.get('installed')
+                   for route in routes.get(prefix, []))
+
+    def _sharp_routes(self, command, prefix_start, count, timeout):
+        """
+        Runs the sharpd `command` installing or removing the `count` routes
+        starting at `prefix_start` and waits for the FIB to reflect it.
+        Returns the rate measurement.
+
+        The FIB sharpd routes count tells when the command is done, unless
+        the range overlaps routes installed before: zebra processes the
+        routes in order, so the command is also done when the last route of
+        the range is installed (or removed).
+        """
+        ipv6 = ':' in prefix_start
+        # Last route of the range: the second prefix `count - 1` apart.
+        last = list(prefix_range('{}/{}'.format(
+            prefix_start, 128 if ipv6 else 32), 2, count - 1))[-1]
+        install = command.startswith('sharp install')
+        before = self.sharp_route_count(ipv6)
+        if install:
+            expected = before + count
+        else:
+            expected = max(before - count, 0)
+
+        start = time.time()
+        output = self.vtysh_cmd(command)
+        errors = [line.strip() for line in output.splitlines()
+                  if line.strip().startswith('%')]
+        if errors:
+            assert False, '{}: "{}" failed: {}'.format(
+                self.name, command, ' '.join(errors))
+        while True:
+            installed = self.sharp_route_count(ipv6)
+            elapsed = time.time() - start
+            if installed >= expected if install else installed <= expected:
+                break
+            if self.sharp_route_installed(last) == install:
+                break
+            if elapsed > timeout:
+                assert False, '{}: {} sharpd routes in the FIB after {:.1f} seconds (expected {})'.format(
+                    self.name, installed, elapsed, expected)
+            time.sleep(SHARP_POLL_INTERVAL)
+
+        result = {
+            'routes': count,
+            'seconds': elapsed,
+            'rate': count / elapsed if elapsed > 0 else float(count),
+        }
+        self.logger.info('{}: "{}" took {:.2f} seconds ({:.0f} routes/s)'.format(
+            self.name, command, elapsed, result['rate']))
+        return result
+
+    def install_routes(self, prefix_start, count, nexthop=None,
+                       nexthop_group=None, instance=None, timeout=300):
+        """
+        Installs `count` host routes starting at `prefix_start` with sharpd
+        (which must be running, see TopoRouter.RD_SHARP) and waits for zebra
+        to install them in the FIB. The routes use the `nexthop` address or
+        the `nexthop_group` nexthop-group name.
+
+        Returns a dictionary with the number of 'routes', the 'seconds' it
+        took and the install 'rate' (routes per second).
+
+        Usage example:
+
+            result = router.install_routes('10.0.0.1', 100000, '192.168.1.2')
+            logger.info('installed {rate:.0f} routes/s'.format(**result))
+        """
+        if (nexthop is None) == (nexthop_group is None):
+            raise ValueError('either nexthop or nexthop_group must be specified')
+
+        prefix_start = prefix_start.split('/')[0]
+        command = 'sharp install routes {} '.format(prefix_start)
+        if nexthop is not None:
+            command += 'nexthop {}'.format(nexthop)
+        else:
+            command += 'nexthop-group {}'.format(nexthop_group)
+        if instance is not None:
+            command += ' instance {}'.format(instance)
+        command += ' {}'.format(count)
+        return self._sharp_routes(command, prefix_start, count, timeout)
+
+    def remove_routes(self, prefix_start, count, instance=None, timeout=300):
+        """
+        Removes `count` sharpd routes starting at `prefix_start` and waits
+        for zebra to remove them from the FIB. Returns the same measurement
+        as `install_routes` with the removal rate.
+        """
+        prefix_start = prefix_start.split('/')[0]
+        command = 'sharp remove routes '
+        if instance is not None:
+            command += 'instance {} '.format(instance)
+        command += '{} {}'.format(prefix_start, count)
+        return self._sharp_routes(command, prefix_start, count, timeout)
+
     def report_memory_leaks(self, testname):
         """
         Runs the router memory leak check test. Has the following parameter:
@@ -809,22 +1470,48 @@ class TopoSwitch(TopoGear):
     Switch abstraction. Has the following properties:
     * cls: switch class that will be used to instantiate
     * name: switch name
+    * collapsible: whether the switch may be replaced by a veth pair when it
+      has exactly two members
     """
     # pylint: disable=too-few-public-methods
 
-    def __init__(self, tgen, cls, name):
+    def __init__(self, tgen, cls, name, collapsible=False):
         super(TopoSwitch, self).__init__()
         self.tgen = tgen
         self.net = None
         self.name = name
+        self.mnname = '{}{}'.format(tgen.prefix, name)
         self.cls = cls
-        self.tgen.topo.addSwitch(name, cls=self.cls)
+        self.collapsible = collapsible
+        self.collapsed = False
 
     def __str__(self):
         gear = super(TopoSwitch, self).__str__()
-        gear += ' TopoSwitch<>'
+        gear += ' TopoSwitch<collapsed="{}">'.format(self.collapsed)
         return gear
 
+    def run(self, command):
+        if self.collapsed:
+            raise EnvironmentError(
+                'switch "{}" was replaced by a veth pair'.format(self.name))
+        return super(TopoSwitch, self).run(command)
+
+    def link_enable(self, myif, enabled=True, netns=None):
+        """
+        Set this switch port administrative state. When the switch was replaced
+        by a veth pair, the interface of the other segment member is used
+        instead: the member attached to `myif` loses carrier the same way.
+        """
+        if not self.collapsed:
+            return super(TopoSwitch, self).link_enable(myif, enabled, netns)
+
+        if myif not in self.links.keys():
+            raise KeyError('interface doesn\'t exists')
+
+        for ifname, (node, nodeif) in self.links.iteritems():
+            if ifname != myif:
+                return node.link_enable(nodeif, enabled, netns)
+
 class TopoHost(TopoGear):
     "Host abstraction."
     # pylint: disable=too-few-public-methods
@@ -842,6 +1529,7 @@ class TopoHost(TopoGear):
         self.tgen = tgen
         self.net = None
         self.name = name
+        self.mnname = name
         self.options = params
         self.tgen.topo.addHost(name, **params)
 
@@ -923,12 +1611,14 @@ def diagnose_env():
     ret = True
 
     # Test log path exists before installing handler.
+    topotests_dir = topotest.get_topotests_dir()
     if not os.path.isdir('/tmp'):
         logger.warning('could not find /tmp for logs')
     else:
-        os.system('mkdir /tmp/topotests')
+        os.system('mkdir -p {}'.format(topotests_dir))
         # Log diagnostics to file so it can be examined later.
-        fhandler = logging.FileHandler(filename='/tmp/topotests/diagnostics.txt')
+        fhandler = logging.FileHandler(
+            filename='{}/diagnostics.txt'.format(topotests_dir))
         fhandler.setLevel(logging.DEBUG)
         fhandler.setFormatter(
             logging.Formatter(fmt='%(asctime)s %(levelname)s: %(message)s')
@@ -947,18 +1637,20 @@ def diagnose_env():
         logger.error('you must run topotest as root')
         ret = False
 
+    caps = get_capabilities()
+
     # Assert that we have mininet
-    if os.system('which mn >/dev/null 2>/dev/null') != 0:
+    if caps.which('mn') is None:
         logger.error('could not find mininet binary (mininet is not installed)')
         ret = False
 
     # Assert that we have iproute installed
-    if os.system('which ip >/dev/null 2>/dev/null') != 0:
+    if caps.which('ip') is None:
         logger.error('could not find ip binary (iproute is not installed)')
         ret = False
 
     # Assert that we have gdb installed
-    if os.system('which gdb >/dev/null 2>/dev/null') != 0:
+    if caps.which('gdb') is None:
         logger.error('could not find gdb binary (gdb is not installed)')
         ret = False
 
@@ -1002,9 +1694,8 @@ def diagnose_env():
                 if fname != 'zebra':
                     continue
 
-                os.system(
-                    '{} -v 2>&1 >/tmp/topotests/frr_zebra.txt'.format(path)
-                )
+                with open('{}/frr_zebra.txt'.format(topotests_dir), 'w') as vfile:
+                    vfile.write(caps.version(path))
 
     # Assert that Quagga utilities exist
     quaggadir = config.get('topogen', 'quaggadir')
@@ -1041,9 +1732,8 @@ def diagnose_env():
                 if fname != 'zebra':
                     continue
 
-                os.system(
-                    '{} -v 2>&1 >/tmp/topotests/quagga_zebra.txt'.format(path)
-                )
+                with open('{}/quagga_zebra.txt'.format(topotests_dir), 'w') as vfile:
+                    vfile.write(caps.version(path))
 
     # Test MPLS availability
     krel = platform.release()
@@ -1058,7 +1748,7 @@ def diagnose_env():
 
     # TODO remove me when we start supporting exabgp >= 4
     try:
-        output = subprocess.check_output(['exabgp', '-v'])
+        output = caps.version(caps.which('exabgp'))
         line = output.split('\n')[0]
         version = line.split(' ')[2]
         if topotest.version_cmp(version, '4') >= 0:
@@ -22,11 +22,17 @@ import sys
 import json
 import ipaddress
 from lib.topolog import logger, logger_config
+from lib.topotrace import traced
 
 # Required to instantiate the topology builder class.
 from mininet.topo import Topo
 
 from lib.bgp import *
+from lib import frrconfig
+from lib import cfgcache
+
+# TopoRouter deamon constants by deamon name
+RD_BY_NAME = dict((name, rd) for rd, name in TopoRouter.RD.items())
 
 def build_topo_from_json(tgen, topo):
     """ 
@@ -37,6 +43,9 @@ def build_topo_from_json(tgen, topo):
     """
 
     logger.info("Testing flow - Building topo####################")
+    if 'switch_backend' in topo:
+        tgen.set_switch_backend(topo['switch_backend'])
+
     listRouters = []
     for routerN in sorted(topo['routers'].iteritems()):
         logger.info('Topo: Add router {}'.format(routerN[0]))
@@ -126,17 +135,58 @@ def build_topo_from_json(tgen, topo):
 		format(topo['lo_prefix']['ipv6'], number_to_row(curRouter),\
 		number_to_column(curRouter), topo['lo_prefix']['v6mask'])
 
-def build_config_from_json(tgen, topo, CWD):
+@traced()
+def build_config_from_json(tgen, topo, CWD, coalesce=None):
     """ 
     Builds configuration from json 
 
     * `tgen`: Topogen object
     * `topo`: json file data
     * `CWD`: caller's current working directory
+    * `coalesce`: push each router configuration once, all routers
+      concurrently, after the whole configuration was built. Defaults to the
+      `config_coalesce` option of `pytest.ini`.
     """
 
     logger.info("######## Testing flow - Building configuration ########")
 
+    # The routers were started with this configuration, it was built by
+    # build_startup_config_from_json().
+    started = [router for router in tgen.routers().values()
+               if router.startup_config is not None]
+    if started and len(started) == len(tgen.routers()):
+        logger.info('Routers started with their configuration, not loading it')
+        for router in started:
+            router.startup_config = None
+        return
+
+    if coalesce is None:
+        coalesce = tgen.is_config_coalesce_enabled()
+
+    # Start from a clean slate, configuration is rebuilt for every router
+    reset_frr_cfg()
+    reset_bgp_cfg()
+
+    # The same topology built by the same library gives the same
+    # configuration: reuse the one of a previous build.
+    cache = tgen.get_config_cache()
+    if cache is not None:
+        key = cfgcache.content_key('build_config_from_json', CWD, topo)
+        state = cache.load('build', key)
+        if state is not None:
+            logger.info('Configuration built from cache')
+            restore_build_state(state)
+            routers = sorted(set(state['frr_cfg']) | set(state['bgp_cfg']))
+            if coalesce:
+                result = load_config_to_routers(tgen, CWD, routers)
+                assert result is True, result
+            else:
+                for router in routers:
+                    result = load_config_to_router(tgen, CWD, router)
+                    assert result is True, \
+                        "load_config_to_router({}) :Failed".format(router)
+            return
+
     listRouters = []
     for routerN in sorted(topo['routers'].iteritems()):
         listRouters.append(routerN[0])
@@ -144,6 +194,108 @@ def build_config_from_json(tgen, topo, CWD):
     listRouters.sort()
     listRouters.reverse()
 
+    if coalesce:
+        with deferred_config_load(tgen, CWD):
+            build_routers_config(tgen, topo, CWD, listRouters)
+    else:
+        build_routers_config(tgen, topo, CWD, listRouters)
+
+    if cache is not None:
+        cache.store('build', key, save_build_state())
+
+def save_build_state():
+    """
+    Returns the routers configuration objects state and configuration files
+    built by the configuration APIs.
+    """
+
+    return {
+        'frr_cfg': save_cfg_state(frr_cfg, FRRCFG_CHECKPOINT_ATTRS,
+                                  'frrcfg_file'),
+        'bgp_cfg': save_cfg_state(bgp_cfg, BGPCFG_CHECKPOINT_ATTRS,
+                                  'bgpcfg_file'),
+    }
+
+def restore_build_state(state):
+    """
+    Restores the routers configuration objects and files saved by
+    save_build_state().
+    """
+
+    restore_cfg_state(
+        frr_cfg, state['frr_cfg'],
+        lambda router, fname: FRRConfig(router, RoutingPB(), fname))
+    restore_cfg_state(
+        bgp_cfg, state['bgp_cfg'],
+        lambda router, fname: BGPConfig(router, BGPRoutingPB(None), fname))
+
+@traced()
+def build_startup_config_from_json(tgen, topo, CWD):
+    """
+    Builds configuration from json before the routers start: the complete
+    configuration of every router is split in its deamons startup
+    configuration files (zebra.conf, bgpd.conf...) and loaded to the router.
+    The next build_config_from_json() call has nothing left to load.
+
+    * `tgen`: Topogen object
+    * `topo`: json file data
+    * `CWD`: caller's current working directory
+    """
+
+    logger.info("######## Testing flow - Building startup configuration ########")
+
+    for router in tgen.routers().values():
+        router.startup_config = None
+    with deferred_config_load(tgen, CWD, push=False):
+        build_config_from_json(tgen, topo, CWD, coalesce=True)
+
+    for rname, router in tgen.routers().iteritems():
+        config = frrconfig.Config(router_config_text(CWD, rname))
+        rnode = tgen.net[router.mnname]
+        daemons = [daemon for daemon, enabled in rnode.daemons.items()
+                   if enabled]
+        for daemon, text in frrconfig.daemon_configs(config, daemons).items():
+            fname = '{}/{}/{}.conf'.format(CWD, rname, daemon)
+            with open(fname, 'w') as cfg:
+                cfg.write(text)
+            router.load_config(RD_BY_NAME[daemon], fname)
+        router.startup_config = config
+
+def validate_config_from_json(tgen, topo, CWD):
+    """
+    Builds configuration from json and checks it with `vtysh -C`, without
+    loading it: can be called before the topology and the routers are
+    started to fail fast on invalid commands. Returns `True` when the
+    configuration is valid, otherwise an error message listing the invalid
+    commands by router (see check_config_of_routers()).
+
+    * `tgen`: Topogen object
+    * `topo`: json file data
+    * `CWD`: caller's current working directory
+
+    Usage example:
+
+        result = validate_config_from_json(tgen, topo, CWD)
+        assert result is True, result
+    """
+
+    logger.info("######## Testing flow - Validating configuration ########")
+
+    routers = sorted(topo['routers'])
+    for rname in routers:
+        if not os.path.isdir('{}/{}'.format(CWD, rname)):
+            os.mkdir('{}/{}'.format(CWD, rname))
+
+    with deferred_config_load(tgen, CWD, push=False, check=False):
+        build_config_from_json(tgen, topo, CWD, coalesce=True)
+    return check_config_of_routers(CWD, routers)
+
+def build_routers_config(tgen, topo, CWD, listRouters):
+    """
+    Creates and loads the configuration of the routers `listRouters`, see
+    build_config_from_json()
+    """
+
     while listRouters != []:
         curRouter = listRouters.pop(0)
 
@@ -0,0 +1,151 @@
+#
+# topoprofile.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Python profilers for the test code (see the `--topotest-profile` and
+`--topotest-profiler` options).
+
+Two profilers are available:
+* 'cprofile': deterministic profiler, saves a '.pstats' file that can be
+  examined with the pstats module or tools like snakeviz
+* 'sample': statistical profiler that samples the test thread stack every
+  few milliseconds, with a much lower overhead. Saves the stacks in the
+  collapsed format ('.collapsed') used by flamegraph.pl and speedscope
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+
+if sys.version_info >= (3,):
+    from io import StringIO
+else:
+    from StringIO import StringIO
+
+PROFILERS = ['cprofile', 'sample']
+
+
+class CProfiler(object):
+    "cProfile based profiler."
+
+    extension = 'pstats'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        "Starts profiling the current thread."
+        self.profile.enable()
+
+    def stop(self):
+        "Stops profiling."
+        self.profile.disable()
+
+    def save(self, path):
+        "Saves the profile in `path`."
+        self.profile.dump_stats(path)
+
+    def top(self, count=20):
+        "Returns the `count` functions with the most self time."
+        output = StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.sort_stats('tottime').print_stats(count)
+        return output.getvalue()
+
+
+class SamplingProfiler(object):
+    "Samples the profiled thread stack from a background thread."
+
+    extension = 'collapsed'
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.thread_id = None
+        self.running = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        "Starts sampling the current thread."
+        self.thread_id = threading.current_thread().ident
+        self.running.set()
+        self.sampler = threading.Thread(target=self._run,
+                                        name='topotest-profiler')
+        self.sampler.daemon = True
+        self.sampler.start()
+
+    def stop(self):
+        "Stops sampling."
+        self.running.clear()
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+
+    def _run(self):
+        while self.running.is_set():
+            # pylint: disable=W0212
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}:{}'.format(
+                        os.path.basename(code.co_filename), code.co_name,
+                        code.co_firstlineno))
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def save(self, path):
+        "Saves the collapsed stacks in `path`."
+        with open(path, 'w') as stackfile:
+            for stack, count in sorted(self.stacks.items()):
+                stackfile.write('{} {}\n'.format(stack, count))
+
+    def top(self, count=20):
+        "Returns the `count` functions with the most self samples."
+        selftime = {}
+        for stack, samples in self.stacks.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            selftime[leaf] = selftime.get(leaf, 0) + samples
+
+        lines = ['{} samples every {:.0f}ms'.format(
+            self.samples, self.interval * 1000)]
+        lines.append('{:>8} {:>7}  function'.format('samples', '%'))
+        ordered = sorted(selftime.items(), key=lambda item: -item[1])
+        for leaf, samples in ordered[:count]:
+            lines.append('{:>8} {:>6.1f}%  {}'.format(
+                samples, 100.0 * samples / max(self.samples, 1), leaf))
+        return '\n'.join(lines)
+
+
+def new_profiler(kind):
+    "Returns a new profiler of `kind` (one of PROFILERS)."
+    if kind == 'sample':
+        return SamplingProfiler()
+    return CProfiler()
@@ -35,12 +35,21 @@ import tempfile
 import platform
 import difflib
 import time
+import select
 
 from lib.topolog import logger
+from lib import provision
+from lib.capabilities import get_capabilities
+from lib import topotrace
+from lib.apistats import instrument_api
+from lib.coreanalysis import get_analyzer
+from lib.logscan import get_scanner
+from lib import frrconfig
+from lib import cfgcache
 
 from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node, OVSSwitch, Host
+from mininet.node import Node, OVSSwitch, Host, Switch
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
 from mininet.link import Intf
@@ -60,6 +69,36 @@ class json_cmp_result(object):
         "Returns True if there were errors, otherwise False."
         return len(self.errors) > 0
 
+def get_worker_id():
+    """
+    Returns the pytest-xdist worker name (e.g. 'gw3') when running with
+    `pytest -n <num>`, otherwise `None`.
+    """
+    return os.environ.get('PYTEST_XDIST_WORKER')
+
+def get_worker_prefix():
+    """
+    Returns a short prefix that must be used for every name living in the
+    root namespace (switches, switch interfaces and OVS bridges), so
+    topologies running at the same time on other workers don't collide.
+    Interface names are limited to 15 characters, so 'gw3' becomes 'w3'.
+    Returns an empty string when not running under pytest-xdist.
+    """
+    worker = get_worker_id()
+    if worker is None:
+        return ''
+    return 'w{}'.format(re.sub(r'[^0-9]', '', worker))
+
+def get_topotests_dir():
+    """
+    Returns the base directory for logs and temporary files. Each
+    pytest-xdist worker gets its own '/tmp/topotests/<worker>/' tree.
+    """
+    worker = get_worker_id()
+    if worker is None:
+        return '/tmp/topotests'
+    return os.path.join('/tmp/topotests', worker)
+
 def get_test_logdir(node=None, init=False):
     """
     Return the current test log directory based on PYTEST_CURRENT_TEST
@@ -70,12 +109,13 @@ def get_test_logdir(node=None, init=False):
     """
     cur_test = os.environ['PYTEST_CURRENT_TEST']
 
-    ret = '/tmp/topotests/' + cur_test[0:cur_test.find(".py")].replace('/','.')
+    ret = '{}/{}'.format(get_topotests_dir(),
+                         cur_test[0:cur_test.find(".py")].replace('/','.'))
     if node != None:
         dir = ret + "/" + node
     if init:
         os.system('mkdir -p ' + dir)
-        os.system('chmod -R go+rw /tmp/topotests')
+        os.system('chmod -R go+rw {}'.format(get_topotests_dir()))
     return ret
 
 def json_diff(d1, d2):
@@ -129,6 +169,7 @@ def _json_list_cmp(list1, list2, parent, result):
                 parent, json_diff(list1, list2)))
 
 
+@instrument_api()
 def json_cmp(d1, d2):
     """
     JSON compare function. Receives two parameters:
@@ -217,6 +258,7 @@ def router_json_cmp(router, cmd, data):
     return json_cmp(router.vtysh_cmd(cmd, isjson=True), data)
 
 
+@instrument_api()
 def run_and_expect(func, what, count=20, wait=3):
     """
     Run `func` and compare the result with `what`. Do it for `count` times
@@ -243,8 +285,10 @@ def run_and_expect(func, what, count=20, wait=3):
         "'{}' polling started (interval {} secs, maximum wait {} secs)".format(
             func_name, wait, int(wait * count)))
 
+    tries = 0
     while count > 0:
         result = func()
+        tries += 1
         if result != what:
             time.sleep(wait)
             count -= 1
@@ -253,11 +297,21 @@ def run_and_expect(func, what, count=20, wait=3):
         end_time = time.time()
         logger.info("'{}' succeeded after {:.2f} seconds".format(
             func_name, end_time - start_time))
+        if topotrace.tracer is not None:
+            topotrace.tracer.add('run_and_expect {}'.format(func_name),
+                                 topotrace.MAIN_TRACK, start_time,
+                                 end_time - start_time,
+                                 {'tries': tries, 'success': True})
         return (True, result)
 
     end_time = time.time()
     logger.error("'{}' failed after {:.2f} seconds".format(
         func_name, end_time - start_time))
+    if topotrace.tracer is not None:
+        topotrace.tracer.add('run_and_expect {}'.format(func_name),
+                             topotrace.MAIN_TRACK, start_time,
+                             end_time - start_time,
+                             {'tries': tries, 'success': False})
     return (False, result)
 
 
@@ -294,6 +348,56 @@ def pid_exists(pid):
     else:
         return True
 
+def process_identity(pid):
+    """
+    Returns the (state, start time) tuple of process `pid` read from
+    /proc/<pid>/stat, or `None` if it doesn't exist. The start time tells
+    a process from a later one that reused its pid.
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid), 'r') as statfile:
+            fields = statfile.read().rsplit(')', 1)[1].split()
+    except (IOError, OSError, IndexError):
+        return None
+    # fields[0] is field 3 (state) and fields[19] field 22 (starttime)
+    return fields[0], fields[19]
+
+# Python 3.9+ on Linux 5.3+: a pidfd becomes readable when the process exits.
+pidfd_open = getattr(os, 'pidfd_open', None)
+
+class ProcessWatch(object):
+    "Tracks a process liveness without running any command."
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.identity = process_identity(pid)
+        self.pidfd = None
+        if pidfd_open is not None and self.identity is not None:
+            try:
+                self.pidfd = pidfd_open(pid)
+            except OSError:
+                self.pidfd = None
+
+    def alive(self):
+        "Returns `False` when the process exited (or is a zombie)."
+        if self.identity is None:
+            return False
+        if self.pidfd is not None:
+            poller = select.poll()
+            poller.register(self.pidfd, select.POLLIN)
+            if poller.poll(0):
+                return False
+        identity = process_identity(self.pid)
+        if identity is None or identity[1] != self.identity[1]:
+            return False
+        return identity[0] != 'Z'
+
+    def close(self):
+        "Releases the pidfd."
+        if self.pidfd is not None:
+            os.close(self.pidfd)
+            self.pidfd = None
+
 def get_textdiff(text1, text2, title1="", title2="", **opts):
     "Returns empty string if same or formatted diff"
 
@@ -319,6 +423,83 @@ def get_file(content):
     fde.close()
     return fname
 
+def clean_running_config(output):
+    """
+    Removes the banner and the empty lines from the vtysh 'show running-config'
+    `output` and returns the configuration text. The indentation is kept, it
+    tells the address families '!' lines from the contexts separators.
+    """
+    lines = []
+    for line in output.splitlines():
+        line = line.rstrip()
+        if (not line or line.strip() == 'Building configuration...' or
+                line.strip() == 'Current configuration:'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+def get_config_deltas(configs, reload_path='/usr/lib/frr/frr-reload.py',
+                      engine='python', cache=None):
+    """
+    Computes the vtysh commands that turn configurations into other ones.
+    `configs` is a dictionary of name to a tuple with the (current, target)
+    configuration texts. `engine` is either:
+    * 'python': the in-process differ (see lib/frrconfig.py)
+    * 'frr-reload': frr-reload.py test mode, all frr-reload.py instances
+      run concurrently
+
+    `cache` optionally is a lib/cfgcache.py ConfigCache keeping the
+    frr-reload.py deltas, so deltas between known configurations are not
+    computed again.
+
+    Returns a dictionary of name to the list of commands to run in the
+    configuration mode (empty when nothing changes).
+    """
+    if engine == 'python':
+        return dict((name, frrconfig.config_delta(frrconfig.Config(current),
+                                                  frrconfig.Config(target)))
+                    for name, (current, target) in configs.items())
+
+    deltas = {}
+    procs = {}
+    keys = {}
+    for name, (current, target) in configs.items():
+        deltas[name] = []
+        if current == target:
+            continue
+        if cache is not None:
+            keys[name] = cfgcache.content_key(
+                'frr-reload', cfgcache.file_key(reload_path), current, target)
+            delta = cache.load('delta', keys[name])
+            if delta is not None:
+                deltas[name] = delta
+                continue
+        fnames = (get_file(current), get_file(target))
+        proc = subprocess.Popen(
+            [reload_path, '--input', fnames[0], '--test', fnames[1]],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        procs[name] = (proc, fnames)
+
+    errors = []
+    for name, (proc, fnames) in procs.items():
+        output, errout = proc.communicate()
+        map(os.unlink, fnames)
+        if proc.returncode != 0:
+            errors.append('{}: {}'.format(name, errout.strip()))
+            continue
+        for line in output.splitlines():
+            line = line.strip()
+            if (not line or line in ['Lines To Delete', 'Lines To Add'] or
+                    line.strip('=') == ''):
+                continue
+            deltas[name].append(line)
+        if name in keys:
+            cache.store('delta', keys[name], deltas[name])
+
+    if errors:
+        raise Exception('{} failed:\n{}'.format(reload_path, '\n'.join(errors)))
+    return deltas
+
 def normalize_text(text):
     """
     Strips formating spaces/tabs, carriage returns and trailing whitespace.
@@ -339,15 +520,7 @@ def module_present(module, load=True):
 
     If `load` is true, it will try to load it via modprobe.
     """
-    with open('/proc/modules', 'r') as modules_file:
-        if module.replace('-','_') in modules_file.read():
-            return True
-    cmd = '/sbin/modprobe {}{}'.format('' if load else '-n ',
-                                       module)
-    if os.system(cmd) != 0:
-        return False
-    else:
-        return True
+    return get_capabilities().module_present(module, load)
 
 def version_cmp(v1, v2):
     """
@@ -594,10 +767,12 @@ class Router(Node):
         self.routertype = 'frr'
         self.daemons = {'zebra': 0, 'ripd': 0, 'ripngd': 0, 'ospfd': 0,
                         'ospf6d': 0, 'isisd': 0, 'bgpd': 0, 'pimd': 0,
-                        'ldpd': 0, 'eigrpd': 0, 'nhrpd': 0, 'staticd': 0}
+                        'ldpd': 0, 'eigrpd': 0, 'nhrpd': 0, 'staticd': 0,
+                        'sharpd': 0}
         self.daemons_options = {'zebra': ''}
         self.reportCores = True
         self.version = None
+        self.daemonWatches = None
 
     def _config_frr(self, **params):
         "Configure FRR binaries"
@@ -641,17 +816,9 @@ class Router(Node):
             if params.get('routertype') is not None:
                 self.routertype = self.params.get('routertype')
 
-        # Enable forwarding on the router
-        assert_sysctl(self, 'net.ipv4.ip_forward', 1)
-        assert_sysctl(self, 'net.ipv6.conf.all.forwarding', 1)
-        # Enable coredumps
-        assert_sysctl(self, 'kernel.core_uses_pid', 1)
-        assert_sysctl(self, 'fs.suid_dumpable', 1)
-        #this applies to the kernel not the namespace...
-        #original on ubuntu 17.x, but apport won't save as in namespace
-        # |/usr/share/apport/apport %p %s %c %d %P
-        corefile = '%e_core-sig_%s-pid_%p.dmp'
-        assert_sysctl(self, 'kernel.core_pattern', corefile)
+        # Enable forwarding and coredumps on the router
+        report = self.provision(sysctls=provision.ROUTER_SYSCTLS)
+        assert report.ok, str(report)
         self.cmd('ulimit -c unlimited')
         # Set ownership of config files
         self.cmd('chown {0}:{0}vty /etc/{0}'.format(self.routertype))
@@ -667,10 +834,11 @@ class Router(Node):
         set_sysctl(self, 'net.ipv4.ip_forward', 0)
         set_sysctl(self, 'net.ipv6.conf.all.forwarding', 0)
         super(Router, self).terminate()
-        os.system('chmod -R go+rw /tmp/topotests')
+        os.system('chmod -R go+rw {}'.format(get_topotests_dir()))
 
     def stopRouter(self, wait=True, assertOnError=True, minErrorVersion='5.1'):
         # Stop Running Quagga or FRR Daemons
+        self.forgetDaemons()
         rundaemons = self.cmd('ls -1 /var/run/%s/*.pid' % self.routertype)
         errors = ""
         if re.search(r"No such file or directory", rundaemons):
@@ -754,18 +922,23 @@ class Router(Node):
                     assert "Errors found - details follow:" == 0, errors
         return errors
 
+    def provision(self, **kwargs):
+        """
+        Applies interface and sysctl settings to this router in one batch and
+        returns a report of what changed. See provision.provision_nodes() for
+        the available settings.
+        """
+        return provision.provision_node(self, **kwargs)
+
     def removeIPs(self):
-        for interface in self.intfNames():
-            self.cmd('ip address flush', interface)
+        report = self.provision(flush=self.intfNames())
+        if not report.ok:
+            logger.error(str(report))
 
     def checkCapability(self, daemon, param):
         if param is not None:
             daemon_path = os.path.join(self.daemondir, daemon)
-            daemon_search_option = param.replace('-','')
-            output = self.cmd('{0} -h | grep {1}'.format(
-                daemon_path, daemon_search_option))
-            if daemon_search_option not in output:
-                return False
+            return get_capabilities().has_option(daemon_path, param)
         return True
 
     def loadConf(self, daemon, source=None, param=None):
@@ -846,54 +1019,166 @@ class Router(Node):
 
     def restartRouter(self):
         # Starts actual daemons without init (ie restart)
+        self.forgetDaemons()
         # cd to per node directory
         self.cmd('cd {}/{}'.format(self.logdir, self.name))
         self.cmd('umask 000')
         #Re-enable to allow for report per run
         self.reportCores = True
         if self.version == None:
-            self.version = self.cmd(os.path.join(self.daemondir, 'bgpd')+' -v').split()[2]
+            self.version = get_capabilities().version(
+                os.path.join(self.daemondir, 'bgpd')).split()[2]
             logger.info('{}: running version: {}'.format(self.name,self.version))
         # Start Zebra first
         if self.daemons['zebra'] == 1:
             zebra_path = os.path.join(self.daemondir, 'zebra')
             zebra_option = self.daemons_options['zebra']
-            self.cmd('{0} {1} > zebra.out 2> zebra.err &'.format(
-                 zebra_path, zebra_option, self.logdir, self.name
-            ))
-            self.waitOutput()
-            logger.debug('{}: {} zebra started'.format(self, self.routertype))
-            sleep(1, '{}: waiting for zebra to start'.format(self.name))
+            with topotrace.span('start zebra', track=self.name):
+                self.cmd('{0} {1} > zebra.out 2> zebra.err &'.format(
+                     zebra_path, zebra_option, self.logdir, self.name
+                ))
+                self.waitOutput()
+                logger.debug('{}: {} zebra started'.format(self, self.routertype))
+                sleep(1, '{}: waiting for zebra to start'.format(self.name))
         # Start staticd next if required
         if self.daemons['staticd'] == 1:
             staticd_path = os.path.join(self.daemondir, 'staticd')
             staticd_option = self.daemons_options['staticd']
-            self.cmd('{0} {1} > staticd.out 2> staticd.err &'.format(
-                 staticd_path, staticd_option, self.logdir, self.name
-            ))
-            self.waitOutput()
-            logger.debug('{}: {} staticd started'.format(self, self.routertype))
-            sleep(1, '{}: waiting for staticd to start'.format(self.name))
-       # Fix Link-Local Addresses
+            with topotrace.span('start staticd', track=self.name):
+                self.cmd('{0} {1} > staticd.out 2> staticd.err &'.format(
+                     staticd_path, staticd_option, self.logdir, self.name
+                ))
+                self.waitOutput()
+                logger.debug('{}: {} staticd started'.format(self, self.routertype))
+                sleep(1, '{}: waiting for staticd to start'.format(self.name))
+        # Fix Link-Local Addresses
         # Somehow (on Mininet only), Zebra removes the IPv6 Link-Local addresses on start. Fix this
-        self.cmd('for i in `ls /sys/class/net/` ; do mac=`cat /sys/class/net/$i/address`; IFS=\':\'; set $mac; unset IFS; ip address add dev $i scope link fe80::$(printf %02x $((0x$1 ^ 2)))$2:${3}ff:fe$4:$5$6/64; done')
+        with topotrace.span('link-local addresses', track=self.name):
+            report = self.provision(link_local=True)
+        if not report.ok:
+            logger.error(str(report))
         # Now start all the other daemons
         for daemon in self.daemons:
             # Skip disabled daemons and zebra
             if self.daemons[daemon] == 0 or daemon == 'zebra' or daemon == 'staticd':
                 continue
             daemon_path = os.path.join(self.daemondir, daemon)
-            self.cmd('{0} > {3}.out 2> {3}.err &'.format(
-                daemon_path, self.logdir, self.name, daemon
-            ))
-            self.waitOutput()
+            with topotrace.span('start {}'.format(daemon), track=self.name):
+                self.cmd('{0} > {3}.out 2> {3}.err &'.format(
+                    daemon_path, self.logdir, self.name, daemon
+                ))
+                self.waitOutput()
             logger.debug('{}: {} {} started'.format(self, self.routertype, daemon))
     def getStdErr(self, daemon):
         return self.getLog('err', daemon)
     def getStdOut(self, daemon):
         return self.getLog('out', daemon)
     def getLog(self, log, daemon):
-        return self.cmd('cat {}/{}/{}.{}'.format(self.logdir, self.name, daemon, log))
+        return self.getLogScanner(log, daemon).read()
+    def getLogScanner(self, log, daemon):
+        """
+        Returns the updated incremental scanner of the `daemon` log file
+        (`log` is its extension). See lib/logscan.py.
+        """
+        scanner = get_scanner('{}/{}/{}.{}'.format(self.logdir, self.name, daemon, log))
+        scanner.update()
+        return scanner
+    def getSanitizerLog(self, daemon):
+        """
+        Returns the `daemon` stderr content starting at its first
+        AddressSanitizer error, or an empty string if there is none.
+        """
+        return self.getLogScanner('err', daemon).text_from('asan')
+    def daemonPidsCommand(self):
+        "Returns the shell command printing the router pidfiles content."
+        return 'for f in /var/run/{}/*.pid; do [ -f "$f" ] && echo "$f $(cat "$f")"; done'.format(
+            self.routertype)
+
+    def get_daemon_pids(self):
+        """
+        Returns a dictionary of daemon name to pid of the running daemons
+        (read from the router pidfiles).
+        """
+        return self.parseDaemonPids(self.cmd(self.daemonPidsCommand()))
+
+    def parseDaemonPids(self, output):
+        "Returns the daemon name to pid dictionary of daemonPidsCommand() output."
+        pids = {}
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) != 2 or not fields[1].isdigit():
+                continue
+            daemon = os.path.basename(fields[0]).rsplit('.', 1)[0]
+            if daemon in self.daemons:
+                pids[daemon] = int(fields[1])
+        return pids
+
+    def runningDaemons(self):
+        "Returns the list of daemons that must be running."
+        daemons = []
+        for daemon in self.daemons:
+            if version_cmp(platform.release(), '4.5') < 0 and daemon == 'staticd':
+                continue
+            if self.daemons[daemon] == 1:
+                daemons.append(daemon)
+        return daemons
+
+    def needsDaemonPids(self):
+        "Returns whether the watched daemons pids must be (re)read."
+        if self.daemonWatches is None:
+            return True
+        for daemon in self.runningDaemons():
+            if daemon not in self.daemonWatches:
+                return True
+        return False
+
+    def watchDaemons(self, pids=None):
+        """
+        Starts watching the daemons liveness. `pids` is the daemon name to
+        pid dictionary, read from the pidfiles when not specified.
+        """
+        if pids is None:
+            pids = self.get_daemon_pids()
+        self.forgetDaemons()
+        self.daemonWatches = dict((daemon, ProcessWatch(pid))
+                                  for daemon, pid in pids.items())
+
+    def forgetDaemons(self):
+        "Stops watching the daemons (they are being stopped or restarted)."
+        if self.daemonWatches is not None:
+            for watch in self.daemonWatches.values():
+                watch.close()
+        self.daemonWatches = None
+
+    def daemonsAlive(self):
+        """
+        Returns `True` if all daemons are known to be running, without
+        running any command once the pids were read.
+        """
+        if self.needsDaemonPids():
+            self.watchDaemons()
+        for daemon in self.runningDaemons():
+            watch = self.daemonWatches.get(daemon)
+            if watch is None or not watch.alive():
+                return False
+        return True
+
+    def analyzeCores(self, daemon, corefiles):
+        """
+        Schedules the background analysis of the `daemon` core files, the
+        full analysis is reported at the end of the test session. Returns
+        the short backtrace of the first core, or its path when gdb doesn't
+        give it in time. See lib/coreanalysis.py.
+        """
+        analyzer = get_analyzer()
+        daemon_path = os.path.join(self.daemondir, daemon)
+        for corefile in corefiles:
+            analyzer.submit(self.name, daemon, daemon_path, corefile)
+        backtrace = analyzer.backtrace(corefiles[0])
+        if backtrace is None:
+            return '{} (backtrace pending, see the core dump analysis report)\n'.format(
+                corefiles[0])
+        return backtrace
 
     def checkRouterCores(self, reportLeaks=True, reportOnce=False):
         if reportOnce and not self.reportCores:
@@ -906,17 +1191,15 @@ class Router(Node):
                 corefiles = glob.glob('{}/{}/{}_core*.dmp'.format(
                     self.logdir, self.name, daemon))
                 if (len(corefiles) > 0):
-                    daemon_path = os.path.join(self.daemondir, daemon)
-                    backtrace = subprocess.check_output([
-                        "gdb {} {} --batch -ex bt 2> /dev/null".format(daemon_path, corefiles[0])
-                    ], shell=True)
+                    backtrace = self.analyzeCores(daemon, corefiles)
                     sys.stderr.write("\n%s: %s crashed. Core file found - Backtrace follows:\n" % (self.name, daemon))
                     sys.stderr.write("%s" % backtrace)
-                    traces = traces + "\n%s: %s crashed. Core file found - Backtrace follows:\n%s" % (self.name, daemon, backtrace)
+                    traces = traces + "\n%s: %s crashed. Core file found - Backtrace follows (full analysis in the core dump analysis report):\n%s" % (self.name, daemon, backtrace)
                     reportMade = True
                 elif reportLeaks:
-                    log = self.getStdErr(daemon)
-                    if "memstats" in log:
+                    scanner = self.getLogScanner('err', daemon)
+                    if scanner.has('memstats'):
+                        log = scanner.text
                         sys.stderr.write("%s: %s has memory leaks:\n" % (self.name, daemon))
                         traces = traces + "\n%s: %s has memory leaks:\n" % (self.name, daemon)
                         log = re.sub("core_handler: ", "", log)
@@ -925,7 +1208,7 @@ class Router(Node):
                         sys.stderr.write(log)
                         reportMade = True
                 # Look for AddressSanitizer Errors and append to /tmp/AddressSanitzer.txt if found
-                if checkAddressSanitizerError(self.getStdErr(daemon), self.name, daemon):
+                if checkAddressSanitizerError(self.getSanitizerLog(daemon), self.name, daemon):
                     sys.stderr.write("%s: Daemon %s killed by AddressSanitizer" % (self.name, daemon))
                     traces = traces + "\n%s: Daemon %s killed by AddressSanitizer" % (self.name, daemon)
                     reportMade = True
@@ -938,6 +1221,10 @@ class Router(Node):
 
         global fatal_error
 
+        # Only diagnose when a daemon actually died
+        if self.daemonsAlive():
+            return ""
+
         daemonsRunning = self.cmd('vtysh -c "show log" | grep "Logging configuration for"')
         # Look for AddressSanitizer Errors in vtysh output and append to /tmp/AddressSanitzer.txt if found
         if checkAddressSanitizerError(daemonsRunning, self.name, "vtysh"):
@@ -957,11 +1244,8 @@ class Router(Node):
                 corefiles = glob.glob('{}/{}/{}_core*.dmp'.format(
                     self.logdir, self.name, daemon))
                 if (len(corefiles) > 0):
-                    daemon_path = os.path.join(self.daemondir, daemon)
-                    backtrace = subprocess.check_output([
-                        "gdb {} {} --batch -ex bt 2> /dev/null".format(daemon_path, corefiles[0])
-                    ], shell=True)
-                    sys.stderr.write("\n%s: %s crashed. Core file found - Backtrace follows:\n" % (self.name, daemon))
+                    backtrace = self.analyzeCores(daemon, corefiles)
+                    sys.stderr.write("\n%s: %s crashed. Core file found - Backtrace follows (full analysis in the core dump analysis report):\n" % (self.name, daemon))
                     sys.stderr.write("%s\n" % backtrace)
                 else:
                     # No core found - If we find matching logfile in /tmp, then print last 20 lines from it.
@@ -974,7 +1258,7 @@ class Router(Node):
                         sys.stderr.write("%s\n" % log_tail)
 
                 # Look for AddressSanitizer Errors and append to /tmp/AddressSanitzer.txt if found
-                if checkAddressSanitizerError(self.getStdErr(daemon), self.name, daemon):
+                if checkAddressSanitizerError(self.getSanitizerLog(daemon), self.name, daemon):
                     return "%s: Daemon %s not running - killed by AddressSanitizer" % (self.name, daemon)
 
                 return "%s: Daemon %s not running" % (self.name, daemon)
@@ -1060,8 +1344,9 @@ class Router(Node):
         filename = filename_prefix + re.sub(r"\.py", "", testscript) + ".txt"
         for daemon in self.daemons:
             if (self.daemons[daemon] == 1):
-                log = self.getStdErr(daemon)
-                if "memstats" in log:
+                scanner = self.getLogScanner('err', daemon)
+                if scanner.has('memstats'):
+                    log = scanner.text
                     # Found memory leak
                     logger.info('\nRouter {} {} StdErr Log:\n{}'.format(
                         self.name, daemon, log))
@@ -1090,3 +1375,71 @@ class LegacySwitch(OVSSwitch):
     def __init__(self, name, **params):
         OVSSwitch.__init__(self, name, failMode='standalone', **params)
         self.switchIP = None
+
+def ip_batch(commands):
+    """
+    Runs a list of iproute2 commands (without the leading 'ip') in a single
+    'ip -batch' invocation, so all the netlink requests are issued by one
+    process. Returns `None` on success or the error output.
+    """
+    fname = get_file('\n'.join(commands) + '\n')
+    proc = subprocess.Popen(['ip', '-force', '-batch', fname],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = proc.communicate()[0]
+    os.unlink(fname)
+    if proc.returncode != 0:
+        return output
+    return None
+
+class LinuxBridge(Switch):
+    """
+    A kernel Linux bridge without spanning tree. Lighter than LegacySwitch
+    and doesn't require Open vSwitch to be installed.
+    """
+
+    def __init__(self, name, **params):
+        Switch.__init__(self, name, **params)
+        self.switchIP = None
+
+    def _ports(self):
+        "Returns the interfaces enslaved to this bridge."
+        return [intf for intf in self.intfList() if self.name in intf.name]
+
+    def connected(self):
+        "Without STP the ports start forwarding right away."
+        return True
+
+    def start(self, _controllers):
+        "Start Linux bridge"
+        self.batchStartup([self])
+
+    def stop(self, deleteIntfs=True):
+        "Stop Linux bridge"
+        self.batchShutdown([self])
+        super(LinuxBridge, self).stop(deleteIntfs)
+
+    @classmethod
+    def batchStartup(cls, switches, **_params):
+        "Create all bridges and enslave their ports with one netlink batch."
+        # Remove leftovers from previous runs, failures are expected here.
+        ip_batch(['link del dev {}'.format(switch.name) for switch in switches])
+
+        commands = []
+        for switch in switches:
+            commands.append('link add name {} type bridge stp_state 0 '
+                            'forward_delay 0'.format(switch.name))
+            for intf in switch._ports():
+                commands.append('link set dev {} master {} up'.format(
+                    intf.name, switch.name))
+            commands.append('link set dev {} up'.format(switch.name))
+
+        output = ip_batch(commands)
+        if output is not None:
+            logger.error('failed to create linux bridges:\n{}'.format(output))
+        return switches
+
+    @classmethod
+    def batchShutdown(cls, switches, **_params):
+        "Remove all bridges with one netlink batch."
+        ip_batch(['link del dev {}'.format(switch.name) for switch in switches])
+        return switches
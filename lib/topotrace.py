@@ -0,0 +1,206 @@
+#
+# topotrace.py
+# Library of helper functions for NetDEF Topology Tests
+#
+# Copyright (c) 2019 by
+# Network Device Education Foundation, Inc. ("NetDEF")
+#
+# Permission to use, copy, modify, and/or distribute this software
+# for any purpose with or without fee is hereby granted, provided
+# that the above copyright notice and this permission notice appear
+# in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND NETDEF DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL NETDEF BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY
+# DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS,
+# WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+# OF THIS SOFTWARE.
+#
+
+"""
+Lifecycle timeline tracer.
+
+Records the topology lifecycle phases (topology build, routers start,
+configuration loading, convergence waits, tests, vtysh calls...) as spans
+and writes them in the Chrome trace-event format, which can be opened with
+chrome://tracing or https://ui.perfetto.dev.
+
+Spans are grouped in tracks: the 'main' track holds the topology and test
+phases and each router gets its own track.
+
+Usage example:
+
+    with topotrace.span('load config', track='r1', daemon='bgpd'):
+        ...
+
+When no trace is running (see start_trace()) spans cost nothing.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+
+MAIN_TRACK = 'main'
+
+
+class _NullSpan(object):
+    "Span used when no trace is running."
+    # pylint: disable=too-few-public-methods
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    "Records a complete ('X') event when the context exits."
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, tracer, name, track, args):
+        self.tracer = tracer
+        self.name = name
+        self.track = track
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args['error'] = '{}: {}'.format(exc_type.__name__, exc_value)
+        self.tracer.add(self.name, self.track, self.start,
+                        time.time() - self.start, self.args)
+        return False
+
+
+class Tracer(object):
+    "Trace-event recorder of a test module."
+
+    def __init__(self, name):
+        self.name = name
+        self.pid = os.getpid()
+        self.tracks = {MAIN_TRACK: 1}
+        self.events = []
+        self.lock = threading.Lock()
+
+    def _tid(self, track):
+        "Returns the thread id representing `track`."
+        if track not in self.tracks:
+            self.tracks[track] = len(self.tracks) + 1
+        return self.tracks[track]
+
+    def add(self, name, track, start, duration, args=None):
+        """
+        Adds a complete event. `start` is the epoch time and `duration` is in
+        seconds.
+        """
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': int(start * 1000000),
+            'dur': int(duration * 1000000),
+            'pid': self.pid,
+        }
+        if args:
+            event['args'] = args
+        with self.lock:
+            event['tid'] = self._tid(track)
+            self.events.append(event)
+
+    def span(self, name, track=MAIN_TRACK, **args):
+        "Returns a context manager recording its execution as a span."
+        return _Span(self, name, track, args)
+
+    def write(self, path):
+        "Writes the trace-event JSON file."
+        metadata = [{
+            'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+            'args': {'name': self.name},
+        }]
+        for track, tid in sorted(self.tracks.items(), key=lambda item: item[1]):
+            metadata.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                'args': {'name': track},
+            })
+            metadata.append({
+                'name': 'thread_sort_index', 'ph': 'M', 'pid': self.pid,
+                'tid': tid, 'args': {'sort_index': tid},
+            })
+
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(path, 'w') as tracefile:
+            json.dump({'traceEvents': metadata + self.events,
+                       'displayTimeUnit': 'ms'}, tracefile)
+
+
+# The trace of the running test module
+tracer = None
+
+
+def start_trace(name):
+    "Starts recording a new trace named `name`."
+    # pylint: disable=W0603
+    global tracer
+    tracer = Tracer(name)
+    return tracer
+
+
+def stop_trace(path):
+    """
+    Stops recording and writes the trace to `path`. Returns the file path or
+    `None` when no trace was running.
+    """
+    # pylint: disable=W0603
+    global tracer
+    if tracer is None:
+        return None
+    current = tracer
+    tracer = None
+    current.write(path)
+    return path
+
+
+def span(name, track=MAIN_TRACK, **args):
+    """
+    Returns a context manager recording its execution as a span in the
+    running trace. `args` are shown in the event details.
+    """
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, track, **args)
+
+
+def traced(name=None, track=None):
+    """
+    Function decorator recording the function calls as spans. `track` is an
+    optional function receiving the call arguments and returning the track
+    name.
+    """
+    def decorator(func):
+        spanname = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if tracer is None:
+                return func(*args, **kwargs)
+            spantrack = MAIN_TRACK
+            if track is not None:
+                spantrack = track(*args, **kwargs)
+            with tracer.span(spanname, spantrack):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator